@@ -6,7 +6,7 @@ Endpoints for Master role to manage Admin users.
 from fastapi import APIRouter, HTTPException, status, Depends
 from typing import List
 from app.models.schemas import UserCreate, UserResponse, TokenPayload, UserRole
-from app.core.security import require_master, hash_password
+from app.core.security import require_master, hash_password_async
 from app.db.supabase import get_supabase_client, SupabaseQueries
 import logging
 
@@ -39,7 +39,7 @@ async def create_admin(
                 detail="User with this email already exists"
             )
 
-        hashed_password = hash_password(user_data.password)
+        hashed_password = await hash_password_async(user_data.password)
         
         user_dict = {
             "email": user_data.email,
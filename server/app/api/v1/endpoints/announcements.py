@@ -6,10 +6,12 @@ from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from typing import List, Optional
 from datetime import datetime
 from app.models.schemas import (
-    AnnouncementCreate, AnnouncementUpdate, AnnouncementResponse, TokenPayload, UserRole
+    AnnouncementCreate, AnnouncementUpdate, AnnouncementResponse, TokenPayload, UserRole, Principal
 )
 from app.core.security import require_admin, get_current_user, require_teacher
-from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.core.dependencies import get_principal
+from app.db.supabase import get_supabase_client, SupabaseQueries, run_query
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,7 +23,7 @@ async def _enrich_announcement_response(announcement: dict, db: SupabaseQueries)
     
     teacher_name = None
     if announcement.get("teacher_id"):
-        teacher = await db.select_by_id("teachers", "teacher_id", announcement["teacher_id"])
+        teacher = await db.load_by_id("teachers", "teacher_id", announcement["teacher_id"])
         if teacher:
             teacher_name = teacher.get("name")
             
@@ -83,7 +85,7 @@ async def create_announcement(
 @router.get("/", response_model=List[AnnouncementResponse])
 async def get_announcements(
     class_id: Optional[str] = None,
-    current_user: TokenPayload = Depends(get_current_user)
+    principal: Principal = Depends(get_principal)
 ):
     """
     Get a list of announcements.
@@ -97,33 +99,33 @@ async def get_announcements(
         query = supabase.table("announcements").select("*")
 
         # Role-based filtering
-        if current_user.role == UserRole.STUDENT:
-            student = await db.select_one("students", {"user_id": current_user.sub})
+        if principal.role == UserRole.STUDENT:
             targets = ["all", "students"]
             query = query.in_("target_audience", targets)
             # Filter for their class OR class-agnostic
-            if student and student.get("class_id"):
-                query = query.or_(f"class_id.eq.{student['class_id']},class_id.is.null")
+            if principal.class_ids:
+                query = query.or_(f"class_id.eq.{principal.class_ids[0]},class_id.is.null")
         
-        elif current_user.role == UserRole.PARENT:
+        elif principal.role == UserRole.PARENT:
             targets = ["all", "parents"]
             query = query.in_("target_audience", targets)
             # You could add logic here to also get announcements for their children's classes
         
         # Admin/Teacher can filter by class
-        if class_id and current_user.role in [UserRole.ADMIN, UserRole.TEACHER]:
+        if class_id and principal.role in [UserRole.ADMIN, UserRole.TEACHER]:
             query = query.eq("class_id", class_id)
             
         query = query.order("date", desc=True)
-        response = query.execute()
+        response = await run_query(query)
         
         announcements = response.data
         
-        # Enrich all announcements
-        response_list = []
-        for ann in announcements:
-            enriched_data = await _enrich_announcement_response(ann, db)
-            response_list.append(AnnouncementResponse(**ann, **enriched_data))
+        # Enrich all announcements (lookups are batched per table)
+        enriched = await asyncio.gather(*(_enrich_announcement_response(ann, db) for ann in announcements))
+        response_list = [
+            AnnouncementResponse(**ann, **enriched_data)
+            for ann, enriched_data in zip(announcements, enriched)
+        ]
             
         return response_list
         
@@ -169,7 +171,8 @@ async def get_announcement(
 async def update_announcement(
     announcement_id: str,
     announcement_data: AnnouncementUpdate,
-    current_user: TokenPayload = Depends(require_teacher) # Teachers or Admins
+    current_user: TokenPayload = Depends(require_teacher), # Teachers or Admins
+    principal: Principal = Depends(get_principal)
 ):
     """
     Update an announcement.
@@ -185,9 +188,8 @@ async def update_announcement(
             raise HTTPException(status_code=404, detail="Announcement not found")
 
         # 2. Authorization: Must be Admin or the author
-        teacher = await db.select_one("teachers", {"user_id": current_user.sub})
         if current_user.role != UserRole.ADMIN:
-            if not teacher or existing.get("teacher_id") != teacher["teacher_id"]:
+            if not principal.teacher_id or existing.get("teacher_id") != principal.teacher_id:
                 raise HTTPException(status_code=403, detail="Not authorized to update this announcement")
 
         # 3. Prepare update data
@@ -222,7 +224,8 @@ async def update_announcement(
 @router.delete("/{announcement_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_announcement(
     announcement_id: str,
-    current_user: TokenPayload = Depends(require_teacher) # Teachers or Admins
+    current_user: TokenPayload = Depends(require_teacher), # Teachers or Admins
+    principal: Principal = Depends(get_principal)
 ):
     """
     Delete an announcement.
@@ -238,9 +241,8 @@ async def delete_announcement(
             raise HTTPException(status_code=404, detail="Announcement not found")
 
         # 2. Authorization: Must be Admin or the author
-        teacher = await db.select_one("teachers", {"user_id": current_user.sub})
         if current_user.role != UserRole.ADMIN:
-            if not teacher or existing.get("teacher_id") != teacher["teacher_id"]:
+            if not principal.teacher_id or existing.get("teacher_id") != principal.teacher_id:
                 raise HTTPException(status_code=403, detail="Not authorized to delete this announcement")
             
         # 3. Delete
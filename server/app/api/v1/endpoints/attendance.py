@@ -3,14 +3,20 @@ app/api/v1/endpoints/attendance.py
 Attendance tracking endpoints
 """
 from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import date, datetime
 from app.models.schemas import (
     AttendanceCreate, AttendanceBulkCreate, AttendanceResponse,
     AttendanceStatus, TokenPayload
 )
-from app.core.security import require_teacher, get_current_user
-from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.core.security import require_teacher, require_admin, get_current_user
+from app.db.supabase import get_supabase_client, SupabaseQueries, run_query
+from app.services.attendance_rollups import (
+    attendance_change, record_attendance_changes, rebuild_attendance_rollups, academic_year
+)
+from app.services.attendance_index import attendance_index, year_bounds
+import asyncio
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,9 +35,9 @@ async def mark_attendance(
     
     try:
         # Check if attendance already exists for this student and date
-        existing = supabase.table("attendance").select("*").eq(
+        existing = await run_query(supabase.table("attendance").select("attendance_id").eq(
             "student_id", attendance_data.student_id
-        ).eq("date", str(attendance_data.date)).execute()
+        ).eq("date", str(attendance_data.date)))
         
         if existing.data:
             raise HTTPException(
@@ -49,6 +55,10 @@ async def mark_attendance(
         student = await db.select_by_id("students", "student_id", attendance_data.student_id)
         student_name = student.get("name") if student else None
         
+        changes = [attendance_change(new_attendance, (student or {}).get("class_id"), +1)]
+        await record_attendance_changes(db, changes)
+        attendance_index.apply_changes(changes)
+        
         logger.info(f"Attendance marked for student {attendance_data.student_id} on {attendance_data.date}")
         
         return AttendanceResponse(
@@ -68,18 +78,26 @@ async def mark_attendance(
 @router.post("/bulk", status_code=status.HTTP_201_CREATED)
 async def mark_bulk_attendance(
     bulk_data: AttendanceBulkCreate,
+    mode: str = Query("insert", pattern="^(insert|upsert)$", description="upsert: create, update or keep each (student, date) record"),
     current_user: TokenPayload = Depends(require_teacher)
 ):
     """
     Mark attendance for multiple students at once (Teacher/Admin)
     Useful for marking entire class attendance
+    
+    With mode=insert (default) the request fails if any student already has
+    a record for the date. With mode=upsert records are keyed on
+    (student_id, date) and the whole submission is applied in one call
+    (rpc/upsert_attendance), so resubmitting a register is safe.
     """
     supabase = get_supabase_client()
     db = SupabaseQueries(supabase)
     
     try:
         # Get all students in the class
-        students = await db.select_all("students", {"class_id": bulk_data.class_id})
+        students = await db.select_all(
+            "students", {"class_id": bulk_data.class_id}, columns="student_id"
+        )
         student_ids = {s["student_id"] for s in students}
         
         # Validate all student_ids belong to the class
@@ -90,14 +108,19 @@ async def mark_bulk_attendance(
                     detail=f"Student {record.get('student_id')} not in class {bulk_data.class_id}"
                 )
         
+        if mode == "upsert":
+            return await _upsert_bulk_attendance(db, bulk_data)
+        
         # Check if attendance already exists for this class and date
-        existing = supabase.table("attendance").select(
-            "student_id"
-        ).in_(
-            "student_id", [r["student_id"] for r in bulk_data.attendance_records]
-        ).eq("date", str(bulk_data.date)).execute()
+        existing = await db.select_in(
+            "attendance", "student_id",
+            [r["student_id"] for r in bulk_data.attendance_records],
+            {"date": str(bulk_data.date)},
+            columns="student_id",
+            limit=1
+        )
         
-        if existing.data:
+        if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Attendance already marked for some students on this date"
@@ -115,6 +138,9 @@ async def mark_bulk_attendance(
         
         # Bulk insert
         result = await db.insert_many("attendance", attendance_records)
+        changes = [attendance_change(record, bulk_data.class_id, +1) for record in result]
+        await record_attendance_changes(db, changes)
+        attendance_index.apply_changes(changes)
         
         logger.info(f"Bulk attendance marked for class {bulk_data.class_id} on {bulk_data.date}")
         
@@ -134,6 +160,49 @@ async def mark_bulk_attendance(
             detail="Failed to mark bulk attendance"
         )
 
+async def _upsert_bulk_attendance(db: SupabaseQueries, bulk_data: AttendanceBulkCreate) -> Dict[str, Any]:
+    """Apply a class register with rpc/upsert_attendance (membership already checked)"""
+    records: Dict[str, Dict[str, Any]] = {}
+    for record in bulk_data.attendance_records:
+        try:
+            record_status = AttendanceStatus(record.get("status")).value
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid status {record.get('status')!r} for student {record['student_id']}"
+            )
+        # A student listed twice: the last entry wins
+        records[record["student_id"]] = {
+            "student_id": record["student_id"],
+            "status": record_status,
+            "remarks": record.get("remarks")
+        }
+    
+    response = await run_query(db.raw_query().rpc("upsert_attendance", {
+        "p_class_id": bulk_data.class_id,
+        "p_date": str(bulk_data.date),
+        "p_academic_year": academic_year(bulk_data.date),
+        "p_records": list(records.values())
+    }))
+    result = response.data
+    # Rollups were adjusted by the database function; only the index is left
+    attendance_index.apply_changes(result.get("deltas") or [])
+    
+    logger.info(
+        f"Bulk attendance upserted for class {bulk_data.class_id} on {bulk_data.date}: "
+        f"{result['created']} created, {result['updated']} updated, {result['unchanged']} unchanged"
+    )
+    
+    return {
+        "message": f"Attendance saved for {len(records)} students",
+        "class_id": bulk_data.class_id,
+        "date": bulk_data.date,
+        "mode": "upsert",
+        "records_created": result["created"],
+        "records_updated": result["updated"],
+        "records_unchanged": result["unchanged"]
+    }
+
 @router.get("/", response_model=List[AttendanceResponse])
 async def get_attendance(
     class_id: Optional[str] = None,
@@ -149,43 +218,46 @@ async def get_attendance(
     Get attendance records with filters
     """
     supabase = get_supabase_client()
+    db = SupabaseQueries(supabase)
     
     try:
-        # Build query with filters
-        query = supabase.table("attendance").select(
-            "*, students(name, class_id)"
-        )
+        def apply_filters(query):
+            if student_id:
+                query = query.eq("student_id", student_id)
+            if start_date:
+                query = query.gte("date", str(start_date))
+            if end_date:
+                query = query.lte("date", str(end_date))
+            if status:
+                query = query.eq("status", status.value)
+            return query
         
-        if student_id:
-            query = query.eq("student_id", student_id)
+        columns = "*, students(name, class_id)"
+        start = (page - 1) * page_size
         
         if class_id:
-            # Filter by class through students table
-            students = await SupabaseQueries(supabase).select_all(
-                "students", {"class_id": class_id}
+            # Filter by class through students table; large classes are
+            # split into several in_() queries by select_in
+            students = await db.select_all(
+                "students", {"class_id": class_id}, columns="student_id"
             )
-            student_ids = [s["student_id"] for s in students]
-            if student_ids:
-                query = query.in_("student_id", student_ids)
-        
-        if start_date:
-            query = query.gte("date", str(start_date))
-        
-        if end_date:
-            query = query.lte("date", str(end_date))
-        
-        if status:
-            query = query.eq("status", status.value)
-        
-        # Pagination
-        start = (page - 1) * page_size
-        end = start + page_size - 1
-        
-        response = query.order("date", desc=True).range(start, end).execute()
+            records = await db.select_in(
+                "attendance", "student_id", [s["student_id"] for s in students],
+                columns=columns,
+                order_by="date",
+                ascending=False,
+                limit=page_size,
+                offset=start,
+                refine=apply_filters
+            )
+        else:
+            query = apply_filters(supabase.table("attendance").select(columns))
+            response = await run_query(query.order("date", desc=True).limit(page_size).offset(start))
+            records = response.data
         
         # Format response
         attendance_list = []
-        for record in response.data:
+        for record in records:
             attendance_list.append(AttendanceResponse(
                 attendance_id=record["attendance_id"],
                 student_id=record["student_id"],
@@ -217,37 +289,37 @@ async def get_attendance_statistics(
     Get attendance statistics
     """
     supabase = get_supabase_client()
+    db = SupabaseQueries(supabase)
     
     try:
-        # Build query
-        query = supabase.table("attendance").select("*")
-        
+        filters = {}
         if student_id:
-            query = query.eq("student_id", student_id)
-        
-        if class_id:
-            students = await SupabaseQueries(supabase).select_all(
-                "students", {"class_id": class_id}
-            )
-            student_ids = [s["student_id"] for s in students]
-            if student_ids:
-                query = query.in_("student_id", student_ids)
+            filters["student_id"] = student_id
         
+        conditions = []
         if start_date:
-            query = query.gte("date", str(start_date))
-        
+            conditions.append(("date", "gte", str(start_date)))
         if end_date:
-            query = query.lte("date", str(end_date))
+            conditions.append(("date", "lte", str(end_date)))
         
-        response = query.execute()
-        records = response.data
+        if class_id:
+            students = await db.select_all(
+                "students", {"class_id": class_id}, columns="student_id"
+            )
+            conditions.append(("student_id", "in", [s["student_id"] for s in students]))
+        
+        # Counted per status in the database
+        groups = await db.aggregate(
+            "attendance", group_by=["status"], filters=filters, conditions=conditions
+        )
+        counts = {g["status"]: g["count"] for g in groups}
         
         # Calculate statistics
-        total = len(records)
-        present = sum(1 for r in records if r["status"] == "present")
-        absent = sum(1 for r in records if r["status"] == "absent")
-        late = sum(1 for r in records if r["status"] == "late")
-        excused = sum(1 for r in records if r["status"] == "excused")
+        total = sum(counts.values())
+        present = counts.get("present", 0)
+        absent = counts.get("absent", 0)
+        late = counts.get("late", 0)
+        excused = counts.get("excused", 0)
         
         return {
             "total_records": total,
@@ -310,6 +382,12 @@ async def update_attendance(
         student = await db.select_by_id("students", "student_id", updated["student_id"])
         student_name = student.get("name") if student else None
         
+        if existing["status"] != updated["status"]:
+            class_id = (student or {}).get("class_id")
+            changes = [attendance_change(existing, class_id, -1), attendance_change(updated, class_id, +1)]
+            await record_attendance_changes(db, changes)
+            attendance_index.apply_changes(changes)
+        
         logger.info(f"Attendance updated: {attendance_id}")
         
         return AttendanceResponse(
@@ -346,7 +424,11 @@ async def delete_attendance(
                 detail="Attendance record not found"
             )
         
+        student = await db.select_by_id("students", "student_id", existing["student_id"], columns="class_id")
         await db.delete_by_id("attendance", "attendance_id", attendance_id)
+        changes = [attendance_change(existing, (student or {}).get("class_id"), -1)]
+        await record_attendance_changes(db, changes)
+        attendance_index.apply_changes(changes)
         
         logger.info(f"Attendance deleted: {attendance_id}")
         
@@ -359,63 +441,103 @@ async def delete_attendance(
             detail="Failed to delete attendance"
         )
 
+def _attendance_summary(students: List[Dict[str, Any]], groups: List[Dict[str, Any]]):
+    """
+    Present and total days per student from (student_id, status, count) groups
+
+    Args:
+        students: Student rows, defining the output order
+        groups: Output of aggregate(group_by=["student_id", "status"])
+
+    Returns:
+        tuple: numpy arrays (present, total), aligned with `students`
+    """
+    index = {s["student_id"]: i for i, s in enumerate(students)}
+    rows = [
+        (index[g["student_id"]], g["status"] == "present", g["count"])
+        for g in groups if g["student_id"] in index
+    ]
+    if not rows:
+        empty = np.zeros(len(students), dtype=np.int64)
+        return empty, empty
+
+    student_idx, is_present, counts = (np.array(column) for column in zip(*rows))
+    total = np.bincount(student_idx, weights=counts, minlength=len(students)).astype(np.int64)
+    present = np.bincount(student_idx, weights=counts * is_present, minlength=len(students)).astype(np.int64)
+    return present, total
+
+
 @router.get("/defaulters")
 async def get_attendance_defaulters(
     class_id: Optional[str] = None,
     threshold: int = Query(75, ge=0, le=100, description="Minimum attendance percentage"),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    page: int = Query(1, ge=1),
+    page_size: Optional[int] = Query(None, ge=1, le=1000, description="Defaulters per page (all if omitted)"),
     current_user: TokenPayload = Depends(require_teacher)
 ):
     """
     Get list of students with attendance below threshold (Teacher/Admin)
+    
+    Attendance is counted per student and status in the database (one
+    aggregate instead of one query per student); percentages, the
+    threshold filter, sorting and pagination are applied afterwards.
     """
     supabase = get_supabase_client()
+    db = SupabaseQueries(supabase)
     
     try:
-        # Get students
-        filters = {}
-        if class_id:
-            filters["class_id"] = class_id
-        
-        students = await SupabaseQueries(supabase).select_all("students", filters)
-        
-        defaulters = []
+        conditions = []
+        if start_date:
+            conditions.append(("date", "gte", str(start_date)))
+        if end_date:
+            conditions.append(("date", "lte", str(end_date)))
         
-        for student in students:
-            # Get attendance for this student
-            query = supabase.table("attendance").select("*").eq(
-                "student_id", student["student_id"]
+        students_query = db.select_all(
+            "students", {"class_id": class_id} if class_id else None,
+            columns="student_id, name, class_id", page_by="student_id"
+        )
+        if class_id:
+            students = await students_query
+            if not students:
+                return {"threshold": threshold, "total_defaulters": 0, "page": page, "page_size": page_size, "defaulters": []}
+            conditions.append(("student_id", "in", [s["student_id"] for s in students]))
+            groups = await db.aggregate("attendance", group_by=["student_id", "status"], conditions=conditions)
+        else:
+            students, groups = await asyncio.gather(
+                students_query,
+                db.aggregate("attendance", group_by=["student_id", "status"], conditions=conditions)
             )
-            
-            if start_date:
-                query = query.gte("date", str(start_date))
-            if end_date:
-                query = query.lte("date", str(end_date))
-            
-            attendance_records = query.execute().data
-            
-            if attendance_records:
-                total = len(attendance_records)
-                present = sum(1 for r in attendance_records if r["status"] == "present")
-                percentage = round((present / total * 100), 2)
-                
-                if percentage < threshold:
-                    defaulters.append({
-                        "student_id": student["student_id"],
-                        "name": student["name"],
-                        "class_id": student.get("class_id"),
-                        "total_days": total,
-                        "present_days": present,
-                        "attendance_percentage": percentage
-                    })
-        
-        # Sort by attendance percentage (lowest first)
-        defaulters.sort(key=lambda x: x["attendance_percentage"])
+        
+        present, total = _attendance_summary(students, groups)
+        percentage = np.round(np.divide(
+            present * 100.0, total, out=np.zeros(len(students)), where=total > 0
+        ), 2)
+        
+        # Students without records are not defaulters; lowest attendance first
+        below = np.flatnonzero((total > 0) & (percentage < threshold))
+        below = below[np.argsort(percentage[below], kind="stable")]
+        
+        start = (page - 1) * page_size if page_size else 0
+        window = below[start:start + page_size] if page_size else below
+        defaulters = [
+            {
+                "student_id": students[i]["student_id"],
+                "name": students[i]["name"],
+                "class_id": students[i].get("class_id"),
+                "total_days": int(total[i]),
+                "present_days": int(present[i]),
+                "attendance_percentage": float(percentage[i])
+            }
+            for i in window
+        ]
         
         return {
             "threshold": threshold,
-            "total_defaulters": len(defaulters),
+            "total_defaulters": int(len(below)),
+            "page": page,
+            "page_size": page_size,
             "defaulters": defaulters
         }
         
@@ -424,4 +546,194 @@ async def get_attendance_defaulters(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve attendance defaulters"
-        )
\ No newline at end of file
+        )
+
+async def _indexed_students(
+    db: SupabaseQueries,
+    class_id: Optional[str],
+    start_date: date,
+    end_date: Optional[date] = None
+):
+    """Students (of a class) and the attendance index of start_date's academic year"""
+    year = academic_year(start_date)
+    if end_date and academic_year(end_date) != year:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Date range must be within one academic year"
+        )
+    students, index = await asyncio.gather(
+        db.select_all(
+            "students", {"class_id": class_id} if class_id else None,
+            columns="student_id, name, class_id", order_by="name", page_by="student_id"
+        ),
+        attendance_index.get(db, year)
+    )
+    return students, index
+
+
+@router.get("/analytics")
+async def get_attendance_analytics(
+    class_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: TokenPayload = Depends(require_teacher)
+):
+    """
+    Attendance percentage and longest absence streak per student (Teacher/Admin)
+    
+    Served from the in-memory attendance index of the academic year, so a
+    whole-school range costs one students query. Defaults to the current
+    academic year up to today.
+    """
+    db = SupabaseQueries(get_supabase_client())
+    
+    try:
+        if start_date and not end_date:
+            end_date = min(date.today(), year_bounds(academic_year(start_date))[1])
+        end_date = end_date or date.today()
+        start_date = start_date or year_bounds(academic_year(end_date))[0]
+        students, index = await _indexed_students(db, class_id, start_date, end_date)
+        
+        student_ids = [s["student_id"] for s in students]
+        counts = index.counts(student_ids, start_date, end_date)
+        streaks = index.longest_absence_streak(student_ids, start_date, end_date)
+        total, present = counts["total"], counts["present"]
+        percentage = np.round(np.divide(
+            present * 100.0, total, out=np.zeros(len(students)), where=total > 0
+        ), 2)
+        
+        overall_total = int(total.sum())
+        return {
+            "academic_year": index.year,
+            "start_date": start_date,
+            "end_date": end_date,
+            "class_id": class_id,
+            "total_records": overall_total,
+            "attendance_percentage": round(int(present.sum()) / overall_total * 100, 2) if overall_total else 0,
+            "students": [
+                {
+                    "student_id": s["student_id"],
+                    "name": s["name"],
+                    "class_id": s.get("class_id"),
+                    "total_days": int(total[i]),
+                    "present_days": int(present[i]),
+                    "absent_days": int(counts["absent"][i]),
+                    "attendance_percentage": float(percentage[i]),
+                    "longest_absence_streak": int(streaks[i])
+                }
+                for i, s in enumerate(students)
+            ]
+        }
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Get attendance analytics error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve attendance analytics"
+        )
+
+
+@router.get("/snapshot")
+async def get_attendance_snapshot(
+    date_param: date = Query(..., alias="date"),
+    class_id: Optional[str] = None,
+    current_user: TokenPayload = Depends(require_teacher)
+):
+    """
+    Status of every student (of a class) on one day (Teacher/Admin)
+    """
+    db = SupabaseQueries(get_supabase_client())
+    
+    try:
+        students, index = await _indexed_students(db, class_id, date_param)
+        statuses = index.snapshot([s["student_id"] for s in students], date_param)
+        
+        summary = {name: 0 for name in ("present", "absent", "late", "excused", "not_marked")}
+        for value in statuses:
+            summary[value or "not_marked"] += 1
+        
+        return {
+            "date": date_param,
+            "class_id": class_id,
+            "summary": summary,
+            "students": [
+                {"student_id": s["student_id"], "name": s["name"], "status": value}
+                for s, value in zip(students, statuses)
+            ]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get attendance snapshot error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve attendance snapshot"
+        )
+
+
+@router.get("/absentees")
+async def get_absentees(
+    dates: List[date] = Query(..., description="Students absent on all of these dates"),
+    class_id: Optional[str] = None,
+    current_user: TokenPayload = Depends(require_teacher)
+):
+    """
+    Students recorded absent on every given date (Teacher/Admin)
+    """
+    db = SupabaseQueries(get_supabase_client())
+    
+    try:
+        students, index = await _indexed_students(db, class_id, min(dates), max(dates))
+        absent = index.absent_on([s["student_id"] for s in students], dates)
+        
+        return {
+            "dates": sorted(dates),
+            "class_id": class_id,
+            "students": [
+                {"student_id": s["student_id"], "name": s["name"], "class_id": s.get("class_id")}
+                for s, flag in zip(students, absent) if flag
+            ]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get absentees error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve absentees"
+        )
+
+
+@router.post("/rollups/rebuild")
+async def rebuild_rollups(
+    class_id: Optional[str] = None,
+    current_user: TokenPayload = Depends(require_admin)
+):
+    """
+    Recompute the attendance rollups from the attendance table (Admin only)
+    
+    Needed after attendance was changed outside the API, or to repair the
+    counts after a failed rollup update (logged as an error).
+    """
+    db = SupabaseQueries(get_supabase_client())
+    
+    try:
+        result = await rebuild_attendance_rollups(db, [class_id] if class_id else None)
+        return {
+            "message": "Attendance rollups rebuilt",
+            "class_id": class_id,
+            **(result or {})
+        }
+        
+    except Exception as e:
+        logger.error(f"Rebuild attendance rollups error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to rebuild attendance rollups"
+        )
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Form
+from fastapi import APIRouter, HTTPException, status, Depends, Form, Request
 from pydantic import EmailStr
 from app.models.schemas import (UserCreate, UserLogin, Token, UserResponse, UserRole, TokenPayload)
-from app.core.security import (hash_password, verify_password, create_access_token, create_refresh_token,get_current_user, verify_token)
-from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.core.security import (hash_password_async, verify_password_async, create_access_token, create_refresh_token,get_current_user, verify_token)
+from app.core.dependencies import build_token_claims
+from app.core.rate_limit import login_throttle
+from app.db.supabase import get_supabase_client, SupabaseQueries, run_query
 from app.core.config import settings
 import logging
 
@@ -77,7 +79,7 @@ async def register_user(user_data: UserCreate):
     
     try:
         # Check if user already exists
-        existing = supabase.table("users").select("*").eq("email", user_data.email).execute()
+        existing = await run_query(supabase.table("users").select("*").eq("email", user_data.email))
         if existing.data:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -85,7 +87,7 @@ async def register_user(user_data: UserCreate):
             )
         
         # Hash password
-        hashed_password = hash_password(user_data.password)
+        hashed_password = await hash_password_async(user_data.password)
         
         # Create user record
         user_dict = {
@@ -117,15 +119,22 @@ async def register_user(user_data: UserCreate):
         )
 
 @router.post("/login")
-async def login(credentials: UserLogin):
+async def login(credentials: UserLogin, request: Request):
     """
     Login endpoint - returns JWT tokens
+    
+    The access token carries the user's scope claims (see build_token_claims).
+    Attempts are throttled per IP and per email (429) before any lookup or
+    bcrypt work.
     """
     supabase = get_supabase_client()
+    db = SupabaseQueries(supabase)
     
     try:
+        login_throttle.check("login", request, credentials.email)
+        
         # Get user by email
-        response = supabase.table("users").select("*").eq("email", credentials.email).execute()
+        response = await run_query(supabase.table("users").select("*").eq("email", credentials.email))
         
         if not response.data:
             raise HTTPException(
@@ -143,19 +152,21 @@ async def login(credentials: UserLogin):
             )
         
         # Verify password
-        if not verify_password(credentials.password, user["password_hash"]):
+        async with login_throttle.verification_slot("login"):
+            password_ok = await verify_password_async(credentials.password, user["password_hash"])
+        if not password_ok:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
             )
         
-        # Create tokens
+        # Create tokens (the refresh token carries no scope; it is re-resolved on refresh)
         token_data = {
             "sub": user["user_id"],
             "role": user["role"]
         }
         
-        access_token = create_access_token(token_data)
+        access_token = create_access_token(await build_token_claims(user, db))
         refresh_token = create_refresh_token(token_data)
         
         logger.info(f"User logged in: {credentials.email}")
@@ -180,18 +191,30 @@ async def login(credentials: UserLogin):
 async def refresh_token(refresh_token: str):
     """
     Refresh access token using refresh token
+    
+    Scope claims are re-resolved, so this is also how clients recover from
+    a "token scope is out of date" 401.
     """
+    db = SupabaseQueries(get_supabase_client())
+    
     try:
         # Verify refresh token
         payload = verify_token(refresh_token)
         
+        user = await db.select_by_id("users", "user_id", payload.sub)
+        if not user or not user.get("is_active", True):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid refresh token"
+            )
+        
         # Create new access token
         token_data = {
             "sub": payload.sub,
             "role": payload.role.value
         }
         
-        new_access_token = create_access_token(token_data)
+        new_access_token = create_access_token(await build_token_claims(user, db))
         new_refresh_token = create_refresh_token(token_data)
         
         return Token(
@@ -216,7 +239,7 @@ async def get_current_user_info(current_user: TokenPayload = Depends(get_current
     supabase = get_supabase_client()
     
     try:
-        response = supabase.table("users").select("*").eq("user_id", current_user.sub).execute()
+        response = await run_query(supabase.table("users").select("*").eq("user_id", current_user.sub))
         
         if not response.data:
             raise HTTPException(
@@ -247,16 +270,19 @@ async def get_current_user_info(current_user: TokenPayload = Depends(get_current
 async def change_password(
     old_password: str,
     new_password: str,
+    request: Request,
     current_user: TokenPayload = Depends(get_current_user)
 ):
     """
-    Change user password
+    Change user password (throttled like login)
     """
     supabase = get_supabase_client()
     
     try:
+        login_throttle.check("change_password", request, current_user.sub)
+        
         # Get user
-        response = supabase.table("users").select("*").eq("user_id", current_user.sub).execute()
+        response = await run_query(supabase.table("users").select("*").eq("user_id", current_user.sub))
         
         if not response.data:
             raise HTTPException(
@@ -266,20 +292,21 @@ async def change_password(
         
         user = response.data[0]
         
-        # Verify old password
-        if not verify_password(old_password, user["password_hash"]):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid current password"
-            )
-        
-        # Hash new password
-        new_hashed_password = hash_password(new_password)
+        async with login_throttle.verification_slot("change_password"):
+            # Verify old password
+            if not await verify_password_async(old_password, user["password_hash"]):
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid current password"
+                )
+            
+            # Hash new password
+            new_hashed_password = await hash_password_async(new_password)
         
         # Update password
-        supabase.table("users").update({
+        await run_query(supabase.table("users").update({
             "password_hash": new_hashed_password
-        }).eq("user_id", current_user.sub).execute()
+        }).eq("user_id", current_user.sub))
         
         logger.info(f"Password changed for user: {current_user.sub}")
         
@@ -317,7 +344,7 @@ async def register_user(user_data: UserCreate):
 
 
         # Check if user already exists
-        existing = supabase.table("users").select("*").eq("email", user_data.email).execute()
+        existing = await run_query(supabase.table("users").select("*").eq("email", user_data.email))
         if existing.data:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -325,7 +352,7 @@ async def register_user(user_data: UserCreate):
             )
         
         # Hash password
-        hashed_password = hash_password(user_data.password)
+        hashed_password = await hash_password_async(user_data.password)
         
         # Create user record
         # Force role to STUDENT for public registrations
@@ -2,14 +2,17 @@
 app/api/v1/endpoints/classes.py
 Complete Class management endpoints
 """
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from typing import List, Optional, Dict, Any
 from datetime import date
 from app.models.schemas import (
     ClassCreate, ClassResponse, TokenPayload, UserRole
 )
-from app.core.security import require_admin, get_current_user
-from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.core.security import require_admin, require_teacher, get_current_user
+from app.db.supabase import get_supabase_client, SupabaseQueries, run_query
+from app.services.attendance_rollups import class_attendance_counts
+import asyncio
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,11 +31,11 @@ async def create_class(
     
     try:
         # Check if class with same name, section, and academic year exists
-        existing = supabase.table("classes").select("*").eq(
+        existing = await run_query(supabase.table("classes").select("class_id").eq(
             "class_name", class_data.class_name
         ).eq("section", class_data.section).eq(
             "academic_year", class_data.academic_year
-        ).execute()
+        ))
         
         if existing.data:
             raise HTTPException(
@@ -74,14 +77,19 @@ async def create_class(
 
 @router.get("/", response_model=List[ClassResponse])
 async def get_classes(
+    response: Response,
     academic_year: Optional[str] = None,
     teacher_id: Optional[str] = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: TokenPayload = Depends(get_current_user)
 ):
     """
     Get list of classes with optional filtering
+    
+    Pass the `X-Next-Cursor` response header back as `cursor` to fetch the
+    next page at constant cost (no total count is computed in that mode).
     """
     supabase = get_supabase_client()
     db = SupabaseQueries(supabase)
@@ -93,20 +101,32 @@ async def get_classes(
         if teacher_id:
             filters["teacher_id"] = teacher_id
         
-        result = await db.paginate("classes", page, page_size, filters, "class_name")
+        result = await db.paginate(
+            "classes", page, page_size, filters, "class_name",
+            key_column="class_id",
+            cursor=cursor,
+            count=None if cursor else "exact"
+        )
+        if result["next_cursor"]:
+            response.headers["X-Next-Cursor"] = result["next_cursor"]
+        if result["count"] is not None:
+            response.headers["X-Total-Count"] = str(result["count"])
+        
+        # Teacher names are batched; student counts are head-only requests
+        teachers, student_counts = await asyncio.gather(
+            asyncio.gather(*(
+                db.load_by_id("teachers", "teacher_id", cls.get("teacher_id"))
+                for cls in result["data"]
+            )),
+            asyncio.gather(*(
+                db.count("students", {"class_id": cls["class_id"]})
+                for cls in result["data"]
+            ))
+        )
         
         classes = []
-        for cls in result["data"]:
-            # Get teacher name
-            teacher_name = None
-            if cls.get("teacher_id"):
-                teacher = await db.select_by_id("teachers", "teacher_id", cls["teacher_id"])
-                if teacher:
-                    teacher_name = teacher.get("name")
-            
-            # Get student count
-            students = await db.select_all("students", {"class_id": cls["class_id"]})
-            student_count = len(students)
+        for cls, teacher, student_count in zip(result["data"], teachers, student_counts):
+            teacher_name = teacher.get("name") if teacher else None
             
             classes.append(ClassResponse(
                 **cls,
@@ -116,6 +136,8 @@ async def get_classes(
         
         return classes
         
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Get classes error: {e}")
         raise HTTPException(
@@ -151,8 +173,7 @@ async def get_class(
                 teacher_name = teacher.get("name")
         
         # Get student count
-        students = await db.select_all("students", {"class_id": class_id})
-        student_count = len(students)
+        student_count = await db.count("students", {"class_id": class_id})
         
         return ClassResponse(
             **cls,
@@ -225,8 +246,7 @@ async def update_class(
                 teacher_name = teacher.get("name")
         
         # Get student count
-        students = await db.select_all("students", {"class_id": class_id})
-        student_count = len(students)
+        student_count = await db.count("students", {"class_id": class_id})
         
         logger.info(f"Class updated: {class_id}")
         
@@ -265,11 +285,11 @@ async def delete_class(
             )
         
         # Check if class has students
-        students = await db.select_all("students", {"class_id": class_id})
-        if students:
+        student_count = await db.count("students", {"class_id": class_id})
+        if student_count:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Cannot delete class with {len(students)} enrolled students. Please reassign students first."
+                detail=f"Cannot delete class with {student_count} enrolled students. Please reassign students first."
             )
         
         await db.delete_by_id("classes", "class_id", class_id)
@@ -392,7 +412,7 @@ async def get_class_timetable(
         if day:
             query = query.eq("day", day)
         
-        response = query.order("day").order("period_number").execute()
+        response = await run_query(query.order("day").order("period_number"))
         
         # Group by day
         timetable = {}
@@ -446,11 +466,13 @@ async def get_class_attendance_summary(
                 detail="Class not found"
             )
         
-        # Get all students in class
-        students = await SupabaseQueries(supabase).select_all("students", {"class_id": class_id})
-        student_ids = [s["student_id"] for s in students]
+        # Student count and the class's attendance rollups, summed in the database
+        total_students, counts = await asyncio.gather(
+            SupabaseQueries(supabase).count("students", {"class_id": class_id}),
+            class_attendance_counts(SupabaseQueries(supabase), class_id, date_param)
+        )
         
-        if not student_ids:
+        if not total_students:
             return {
                 "class_id": class_id,
                 "class_name": f"{cls['class_name']} - {cls['section']}",
@@ -462,26 +484,18 @@ async def get_class_attendance_summary(
                 "date": date_param or "All dates"
             }
         
-        # Get attendance records
-        query = supabase.table("attendance").select("*").in_("student_id", student_ids)
-        
-        if date_param:
-            query = query.eq("date", date_param)
-        
-        response = query.execute()
-        
         # Calculate statistics
-        total = len(response.data)
-        present = sum(1 for r in response.data if r["status"] == "present")
-        absent = sum(1 for r in response.data if r["status"] == "absent")
-        late = sum(1 for r in response.data if r["status"] == "late")
+        total = counts["total"]
+        present = counts["present"]
+        absent = counts["absent"]
+        late = counts["late"]
         
         attendance_percentage = (present / total * 100) if total > 0 else 0
         
         return {
             "class_id": class_id,
             "class_name": f"{cls['class_name']} - {cls['section']}",
-            "total_students": len(students),
+            "total_students": total_students,
             "total_records": total,
             "present": present,
             "absent": absent,
@@ -520,7 +534,7 @@ async def get_class_performance(
             )
         
         # Get all students
-        students = await db.select_all("students", {"class_id": class_id})
+        students = await db.select_all("students", {"class_id": class_id}, columns="student_id")
         student_ids = [s["student_id"] for s in students]
         
         if not student_ids:
@@ -532,27 +546,24 @@ async def get_class_performance(
                 "average_marks": 0
             }
         
-        # Calculate attendance percentage
-        attendance_records = supabase.table("attendance").select("*").in_(
-            "student_id", student_ids
-        ).execute()
+        attendance_counts, marks_records = await asyncio.gather(
+            class_attendance_counts(db, class_id),
+            db.select_in("marks", "student_id", student_ids, columns="marks_scored, exams(max_marks)")
+        )
         
-        total_attendance = len(attendance_records.data)
-        present_count = sum(1 for a in attendance_records.data if a["status"] == "present")
+        # Calculate attendance percentage
+        total_attendance = attendance_counts["total"]
+        present_count = attendance_counts["present"]
         avg_attendance = (present_count / total_attendance * 100) if total_attendance > 0 else 0
         
         # Calculate average marks
-        marks_records = supabase.table("marks").select(
-            "*, exams(max_marks)"
-        ).in_("student_id", student_ids).execute()
-        
         total_percentage = 0
-        for mark in marks_records.data:
+        for mark in marks_records:
             if mark.get("exams") and mark["exams"].get("max_marks"):
                 percentage = (mark["marks_scored"] / mark["exams"]["max_marks"]) * 100
                 total_percentage += percentage
         
-        avg_marks = total_percentage / len(marks_records.data) if marks_records.data else 0
+        avg_marks = total_percentage / len(marks_records) if marks_records else 0
         
         return {
             "class_id": class_id,
@@ -565,7 +576,7 @@ async def get_class_performance(
             },
             "academic": {
                 "average_percentage": round(avg_marks, 2),
-                "total_exams": len(marks_records.data)
+                "total_exams": len(marks_records)
             }
         }
         
@@ -578,6 +589,111 @@ async def get_class_performance(
             detail=f"Failed to retrieve class performance: {str(e)}"
         )
 
+def _gradebook_aggregates(scores: List[List[Optional[float]]], max_marks: List[Optional[float]]) -> Dict[str, Any]:
+    """Per-student (row) and per-exam (column) statistics of a gradebook matrix"""
+    matrix = np.array(scores, dtype=np.float64).reshape(len(scores), len(max_marks))  # None -> nan
+    maximum = np.array([m or np.nan for m in max_marks], dtype=np.float64)
+    taken = ~np.isnan(matrix)
+    percentages = np.where(taken, matrix / maximum * 100, 0.0)
+    graded = taken & ~np.isnan(maximum)
+
+    def column(values: np.ndarray, present: np.ndarray) -> List[Optional[float]]:
+        return [round(float(v), 2) if ok else None for v, ok in zip(values, present)]
+
+    row_counts = taken.sum(axis=1)
+    graded_counts = graded.sum(axis=1)
+    col_counts = taken.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        row_average = np.where(graded, percentages, 0.0).sum(axis=1) / graded_counts
+        col_mean = np.where(taken, matrix, 0.0).sum(axis=0) / col_counts
+    return {
+        "students": {
+            "exams_taken": row_counts.tolist(),
+            "total_scored": column(np.where(taken, matrix, 0.0).sum(axis=1), row_counts > 0),
+            "average_percentage": column(row_average, graded_counts > 0)
+        },
+        "exams": {
+            "count": col_counts.tolist(),
+            "mean": column(col_mean, col_counts > 0),
+            "min": column(np.fmin.reduce(matrix, axis=0, initial=np.inf), col_counts > 0),
+            "max": column(np.fmax.reduce(matrix, axis=0, initial=-np.inf), col_counts > 0)
+        }
+    }
+
+
+@router.get("/{class_id}/gradebook")
+async def get_class_gradebook(
+    class_id: str,
+    subject_id: Optional[str] = None,
+    aggregates: bool = Query(False, description="Include per-student and per-exam statistics"),
+    current_user: TokenPayload = Depends(require_teacher)
+):
+    """
+    Students x exams marks grid of a class (Teacher/Admin)
+    
+    Columnar payload: student and exam attributes as parallel arrays, and
+    `scores[i][j]` the mark of student i in exam j (null when missing).
+    The class's exams come with their marks embedded, in one query.
+    """
+    supabase = get_supabase_client()
+    db = SupabaseQueries(supabase)
+    
+    try:
+        cls = await db.select_by_id("classes", "class_id", class_id)
+        if not cls:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Class not found"
+            )
+        
+        exam_filters = {"class_id": class_id}
+        if subject_id:
+            exam_filters["subject_id"] = subject_id
+        students, exams = await asyncio.gather(
+            db.select_all("students", {"class_id": class_id}, order_by="name", columns="student_id, name"),
+            db.select_all(
+                "exams", exam_filters, order_by="date",
+                columns="exam_id, exam_name, date, max_marks, subjects(subject_name), marks(student_id, marks_scored)"
+            )
+        )
+        
+        row_of = {s["student_id"]: i for i, s in enumerate(students)}
+        scores: List[List[Optional[float]]] = [[None] * len(exams) for _ in students]
+        for j, exam in enumerate(exams):
+            for mark in exam.get("marks") or []:
+                i = row_of.get(mark["student_id"])
+                if i is not None:  # marks of students who have left the class are skipped
+                    scores[i][j] = mark["marks_scored"]
+        
+        gradebook = {
+            "class_id": class_id,
+            "class_name": f"{cls['class_name']} - {cls['section']}",
+            "students": {
+                "ids": [s["student_id"] for s in students],
+                "names": [s["name"] for s in students]
+            },
+            "exams": {
+                "ids": [e["exam_id"] for e in exams],
+                "names": [e["exam_name"] for e in exams],
+                "subjects": [(e.get("subjects") or {}).get("subject_name") for e in exams],
+                "dates": [e.get("date") for e in exams],
+                "max_marks": [e.get("max_marks") for e in exams]
+            },
+            "scores": scores
+        }
+        if aggregates:
+            gradebook["aggregates"] = _gradebook_aggregates(scores, gradebook["exams"]["max_marks"])
+        return gradebook
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get class gradebook error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve class gradebook: {str(e)}"
+        )
+
 @router.post("/{class_id}/assign-teacher/{teacher_id}")
 async def assign_teacher_to_class(
     class_id: str,
@@ -4,9 +4,14 @@ Dashboard statistics endpoints
 """
 from fastapi import APIRouter, HTTPException, status, Depends
 from datetime import date, timedelta
-from app.models.schemas import TokenPayload, UserRole
+from app.models.schemas import TokenPayload, UserRole, Principal
 from app.core.security import get_current_user
-from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.core.dependencies import get_principal
+from app.db.supabase import get_supabase_client, SupabaseQueries, run_query
+from app.services.attendance_rollups import (
+    class_attendance_counts, student_attendance_counts, attendance_percentage
+)
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,38 +28,42 @@ async def get_admin_dashboard(
     db = SupabaseQueries(supabase)
     
     try:
-        # Total counts
-        total_students = len(await db.select_all("students", {}))
-        total_teachers = len(await db.select_all("teachers", {}))
-        total_classes = len(await db.select_all("classes", {}))
-        total_parents = len(await db.select_all("parents", {}))
+        # Total counts (head-only requests, no rows transferred)
+        total_students, total_teachers, total_classes, total_parents = await asyncio.gather(
+            db.count("students"),
+            db.count("teachers"),
+            db.count("classes"),
+            db.count("parents")
+        )
         
-        # Today's attendance
+        # Today's attendance (one rollup row per class) and fee totals
         today = date.today()
-        today_attendance = supabase.table("attendance").select("*").eq("date", str(today)).execute()
-        present_today = sum(1 for a in today_attendance.data if a["status"] == "present")
-        total_today = len(today_attendance.data)
-        attendance_percentage = (present_today / total_today * 100) if total_today > 0 else 0
+        attendance_counts, fee_totals = await asyncio.gather(
+            class_attendance_counts(db, day=today),
+            db.aggregate("fees", metrics={"expected": "sum:amount", "collected": "sum:amount_paid"})
+        )
+        present_today = attendance_counts["present"]
+        total_today = attendance_counts["total"]
+        percentage_today = attendance_percentage(attendance_counts)
         
         # Upcoming exams (next 7 days)
         next_week = date.today() + timedelta(days=7)
-        upcoming_exams = supabase.table("exams").select("*").gte(
+        upcoming_exams = await run_query(supabase.table("exams").select("*").gte(
             "date", str(today)
-        ).lte("date", str(next_week)).execute()
+        ).lte("date", str(next_week)))
         
         # Recent announcements (last 5)
-        recent_announcements = supabase.table("announcements").select(
+        recent_announcements = await run_query(supabase.table("announcements").select(
             "*, teachers(name)"
-        ).order("date", desc=True).limit(5).execute()
+        ).order("date", desc=True).limit(5))
         
         # Fee collection status
-        fees = await db.select_all("fees", {})
-        total_expected = sum(f["amount"] for f in fees)
-        total_collected = sum(f.get("amount_paid", 0) for f in fees)
+        total_expected = fee_totals[0]["expected"] or 0
+        total_collected = fee_totals[0]["collected"] or 0
         collection_percentage = (total_collected / total_expected * 100) if total_expected > 0 else 0
         
         # Pending leave requests
-        pending_leaves = supabase.table("leave_requests").select("*").eq("status", "pending").execute()
+        pending_leaves = await db.count("leave_requests", {"status": "pending"})
         
         return {
             "overview": {
@@ -66,7 +75,7 @@ async def get_admin_dashboard(
             "attendance_today": {
                 "total": total_today,
                 "present": present_today,
-                "percentage": round(attendance_percentage, 2)
+                "percentage": percentage_today
             },
             "upcoming_exams": {
                 "count": len(upcoming_exams.data),
@@ -79,7 +88,7 @@ async def get_admin_dashboard(
                 "percentage": round(collection_percentage, 2),
                 "pending": total_expected - total_collected
             },
-            "pending_leave_requests": len(pending_leaves.data),
+            "pending_leave_requests": pending_leaves,
             "quick_actions": [
                 {"label": "Mark Attendance", "route": "/attendance/bulk"},
                 {"label": "Create Announcement", "route": "/announcements"},
@@ -97,7 +106,7 @@ async def get_admin_dashboard(
 
 @router.get("/teacher")
 async def get_teacher_dashboard(
-    current_user: TokenPayload = Depends(get_current_user)
+    principal: Principal = Depends(get_principal)
 ):
     """
     Teacher dashboard statistics
@@ -106,15 +115,15 @@ async def get_teacher_dashboard(
     db = SupabaseQueries(supabase)
     
     try:
-        # Get teacher info
-        teacher_data = await db.select_all("teachers", {"user_id": current_user.sub})
-        if not teacher_data:
+        # Get teacher info (served from the reference cache)
+        teacher = await db.select_by_id("teachers", "teacher_id", principal.teacher_id) if principal.teacher_id else None
+        if not teacher:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Teacher profile not found"
             )
         
-        teacher_id = teacher_data[0]["teacher_id"]
+        teacher_id = teacher["teacher_id"]
         
         # My classes
         my_classes = await db.select_all("classes", {"teacher_id": teacher_id})
@@ -122,29 +131,29 @@ async def get_teacher_dashboard(
         # Today's schedule
         today = date.today()
         day_name = today.strftime("%A")
-        today_schedule = supabase.table("timetable").select(
+        today_schedule = await run_query(supabase.table("timetable").select(
             "*, subjects(subject_name), classes(class_name, section)"
-        ).eq("teacher_id", teacher_id).eq("day", day_name).order("period_number").execute()
+        ).eq("teacher_id", teacher_id).eq("day", day_name).order("period_number"))
         
         # Pending homework submissions
-        my_homework = supabase.table("homework").select("*").eq("teacher_id", teacher_id).execute()
+        my_homework = await run_query(supabase.table("homework").select("hw_id, class_id").eq("teacher_id", teacher_id))
         total_homework = len(my_homework.data)
         
         pending_submissions = 0
         for hw in my_homework.data:
-            submissions = supabase.table("submissions").select("*").eq("hw_id", hw["hw_id"]).execute()
-            students = await db.select_all("students", {"class_id": hw["class_id"]})
-            pending_submissions += len(students) - len(submissions.data)
+            submission_count = await db.count("submissions", {"hw_id": hw["hw_id"]})
+            student_count = await db.count("students", {"class_id": hw["class_id"]})
+            pending_submissions += student_count - submission_count
         
         # Recent exams
-        recent_exams = supabase.table("exams").select(
+        recent_exams = await run_query(supabase.table("exams").select(
             "*, classes(class_name, section), subjects(subject_name)"
-        ).order("date", desc=True).limit(5).execute()
+        ).order("date", desc=True).limit(5))
         
         return {
             "teacher_info": {
-                "name": teacher_data[0]["name"],
-                "subject": teacher_data[0].get("subject_id")
+                "name": teacher["name"],
+                "subject": teacher.get("subject_id")
             },
             "my_classes": {
                 "count": len(my_classes),
@@ -178,7 +187,7 @@ async def get_teacher_dashboard(
 
 @router.get("/student")
 async def get_student_dashboard(
-    current_user: TokenPayload = Depends(get_current_user)
+    principal: Principal = Depends(get_principal)
 ):
     """
     Student dashboard
@@ -188,60 +197,56 @@ async def get_student_dashboard(
     
     try:
         # Get student info
-        student_data = await db.select_all("students", {"user_id": current_user.sub})
-        if not student_data:
+        student = await db.select_by_id("students", "student_id", principal.student_id) if principal.student_id else None
+        if not student:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Student profile not found"
             )
         
-        student = student_data[0]
         student_id = student["student_id"]
         
-        # My attendance
-        attendance = supabase.table("attendance").select("*").eq("student_id", student_id).execute()
-        total_days = len(attendance.data)
-        present_days = sum(1 for a in attendance.data if a["status"] == "present")
-        attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
+        # My attendance (rollup rows, one per academic year)
+        attendance = (await student_attendance_counts(db, [student_id]))[student_id]
         
         # My timetable (today)
         if student.get("class_id"):
             today = date.today()
             day_name = today.strftime("%A")
-            timetable = supabase.table("timetable").select(
+            timetable = await run_query(supabase.table("timetable").select(
                 "*, subjects(subject_name), teachers(name)"
-            ).eq("class_id", student["class_id"]).eq("day", day_name).order("period_number").execute()
+            ).eq("class_id", student["class_id"]).eq("day", day_name).order("period_number"))
         else:
             timetable = {"data": []}
         
         # Upcoming exams
         today = date.today()
         next_month = today + timedelta(days=30)
-        upcoming_exams = supabase.table("exams").select(
+        upcoming_exams = await run_query(supabase.table("exams").select(
             "*, subjects(subject_name)"
         ).eq("class_id", student.get("class_id")).gte(
             "date", str(today)
-        ).lte("date", str(next_month)).order("date").execute()
+        ).lte("date", str(next_month)).order("date"))
         
         # Pending homework
-        pending_homework = supabase.table("homework").select(
+        pending_homework = await run_query(supabase.table("homework").select(
             "*, subjects(subject_name)"
-        ).eq("class_id", student.get("class_id")).gte("due_date", str(today)).execute()
+        ).eq("class_id", student.get("class_id")).gte("due_date", str(today)))
         
         # Filter out submitted homework
-        my_submissions = supabase.table("submissions").select("hw_id").eq("student_id", student_id).execute()
+        my_submissions = await run_query(supabase.table("submissions").select("hw_id").eq("student_id", student_id))
         submitted_ids = {s["hw_id"] for s in my_submissions.data}
         pending = [hw for hw in pending_homework.data if hw["hw_id"] not in submitted_ids]
         
         # Recent marks
-        recent_marks = supabase.table("marks").select(
+        recent_marks = await run_query(supabase.table("marks").select(
             "*, exams(exam_name, max_marks, subjects(subject_name))"
-        ).eq("student_id", student_id).order("created_at", desc=True).limit(5).execute()
+        ).eq("student_id", student_id).order("created_at", desc=True).limit(5))
         
         # Recent announcements
-        announcements = supabase.table("announcements").select(
+        announcements = await run_query(supabase.table("announcements").select(
             "*, teachers(name)"
-        ).order("date", desc=True).limit(5).execute()
+        ).order("date", desc=True).limit(5))
         
         return {
             "student_info": {
@@ -249,9 +254,9 @@ async def get_student_dashboard(
                 "class": student.get("class_id")
             },
             "attendance": {
-                "total_days": total_days,
-                "present_days": present_days,
-                "percentage": round(attendance_percentage, 2)
+                "total_days": attendance["total"],
+                "present_days": attendance["present"],
+                "percentage": attendance_percentage(attendance)
             },
             "today_timetable": {
                 "day": date.today().strftime("%A"),
@@ -286,7 +291,7 @@ async def get_student_dashboard(
 
 @router.get("/parent")
 async def get_parent_dashboard(
-    current_user: TokenPayload = Depends(get_current_user)
+    principal: Principal = Depends(get_principal)
 ):
     """
     Parent dashboard
@@ -296,35 +301,41 @@ async def get_parent_dashboard(
     
     try:
         # Get parent info
-        parent_data = await db.select_all("parents", {"user_id": current_user.sub})
-        if not parent_data:
+        if not principal.parent_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Parent profile not found"
             )
         
-        parent_id = parent_data[0]["parent_id"]
+        parent_id = principal.parent_id
         
-        # Get children
-        children_response = supabase.table("parent_student").select(
-            "*, students(*, classes(class_name, section))"
-        ).eq("parent_id", parent_id).execute()
+        # Parent info and children
+        parent, children_response = await asyncio.gather(
+            db.select_by_id("parents", "parent_id", parent_id),
+            run_query(supabase.table("parent_student").select(
+                "*, students(*, classes(class_name, section))"
+            ).eq("parent_id", parent_id))
+        )
+        if not parent:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Parent profile not found"
+            )
+        
+        # Attendance of all children from the rollups in one query
+        attendance = await student_attendance_counts(
+            db, [c["students"]["student_id"] for c in children_response.data if c.get("students")]
+        )
         
         children_summary = []
         for child_record in children_response.data:
             child = child_record["students"]
             student_id = child["student_id"]
             
-            # Get attendance
-            attendance = supabase.table("attendance").select("*").eq("student_id", student_id).execute()
-            total_days = len(attendance.data)
-            present_days = sum(1 for a in attendance.data if a["status"] == "present")
-            attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
-            
             # Get recent marks
-            marks = supabase.table("marks").select(
-                "*, exams(max_marks)"
-            ).eq("student_id", student_id).execute()
+            marks = await run_query(supabase.table("marks").select(
+                "marks_scored, exams(max_marks)"
+            ).eq("student_id", student_id))
             
             total_percentage = 0
             for mark in marks.data:
@@ -336,19 +347,19 @@ async def get_parent_dashboard(
                 "student_id": student_id,
                 "name": child["name"],
                 "class": f"{child['classes']['class_name']} - {child['classes']['section']}" if child.get("classes") else None,
-                "attendance_percentage": round(attendance_percentage, 2),
+                "attendance_percentage": attendance_percentage(attendance[student_id]),
                 "average_marks": round(avg_percentage, 2)
             })
         
         # Recent announcements
-        announcements = supabase.table("announcements").select(
+        announcements = await run_query(supabase.table("announcements").select(
             "*, teachers(name)"
-        ).in_("target_audience", ["all", "parents"]).order("date", desc=True).limit(5).execute()
+        ).in_("target_audience", ["all", "parents"]).order("date", desc=True).limit(5))
         
         return {
             "parent_info": {
-                "name": parent_data[0]["name"],
-                "email": parent_data[0]["email"]
+                "name": parent["name"],
+                "email": parent["email"]
             },
             "children": {
                 "count": len(children_summary),
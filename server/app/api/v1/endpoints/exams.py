@@ -8,8 +8,10 @@ from datetime import date
 from app.models.schemas import (
     ExamCreate, ExamUpdate, ExamResponse, TokenPayload, UserRole
 )
-from app.core.security import require_admin, get_current_user
+from app.core.security import require_admin, require_teacher, get_current_user
 from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.services.exam_analytics import get_exam_analytics, invalidate_exam_analytics
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,12 +24,12 @@ async def _enrich_exam_response(exam: dict, db: SupabaseQueries) -> dict:
     subject_name = None
 
     if exam.get("class_id"):
-        cls = await db.select_by_id("classes", "class_id", exam["class_id"])
+        cls = await db.load_by_id("classes", "class_id", exam["class_id"])
         if cls:
             class_name = f"{cls.get('class_name', '')} - {cls.get('section', '')}"
     
     if exam.get("subject_id"):
-        subject = await db.select_by_id("subjects", "subject_id", exam["subject_id"])
+        subject = await db.load_by_id("subjects", "subject_id", exam["subject_id"])
         if subject:
             subject_name = subject.get("subject_name")
             
@@ -102,11 +104,12 @@ async def get_exams(
         
         exams = await db.select_all("exams", filters=filters, order_by="date", ascending=False)
         
-        # Enrich all exams in the list
-        response_list = []
-        for exam in exams:
-            enriched_data = await _enrich_exam_response(exam, db)
-            response_list.append(ExamResponse(**exam, **enriched_data))
+        # Enrich all exams in the list (lookups are batched per table)
+        enriched = await asyncio.gather(*(_enrich_exam_response(exam, db) for exam in exams))
+        response_list = [
+            ExamResponse(**exam, **enriched_data)
+            for exam, enriched_data in zip(exams, enriched)
+        ]
             
         return response_list
         
@@ -145,6 +148,35 @@ async def get_exam(
             detail=f"Failed to retrieve exam: {str(e)}"
         )
 
+@router.get("/{exam_id}/analytics")
+async def get_exam_results_analytics(
+    exam_id: str,
+    current_user: TokenPayload = Depends(require_teacher)
+):
+    """
+    Result analytics for an exam (Teacher/Admin)
+    
+    Mean, median, standard deviation, percentiles, a score histogram, the
+    pass rate and the ranked list of students. Computed once from the
+    exam's marks and cached until a mark of the exam changes.
+    """
+    db = SupabaseQueries(get_supabase_client())
+    
+    try:
+        analytics = await get_exam_analytics(db, exam_id)
+        if analytics is None:
+            raise HTTPException(status_code=404, detail="Exam not found")
+        return analytics
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get exam analytics error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve exam analytics: {str(e)}"
+        )
+
 @router.put("/{exam_id}", response_model=ExamResponse)
 async def update_exam(
     exam_id: str,
@@ -182,6 +214,7 @@ async def update_exam(
 
         # 3. Update exam
         updated_exam = await db.update_by_id("exams", "exam_id", exam_id, update_data)
+        invalidate_exam_analytics(exam_id)  # max_marks / name may have changed
         
         logger.info(f"Exam updated: {updated_exam['exam_id']}")
 
@@ -222,6 +255,7 @@ async def delete_exam(
             )
             
         await db.delete_by_id("exams", "exam_id", exam_id)
+        invalidate_exam_analytics(exam_id)
         
         logger.info(f"Exam deleted: {exam_id}")
         return Response(status_code=status.HTTP_204_NO_CONTENT)
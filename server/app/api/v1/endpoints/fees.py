@@ -495,15 +495,18 @@
 app/api/v1/endpoints/fees.py
 Fee management endpoints
 """
-from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response, Header
 from typing import List, Optional
-from datetime import date, datetime
+from datetime import date
 from app.models.schemas import (
-    FeeCreate, FeeUpdate, FeePayment, FeeResponse, FeeStatus,
-    TokenPayload, UserRole
+    FeeCreate, FeeUpdate, FeePayment, FeePaymentRecord, FeeResponse, FeeStatus,
+    TokenPayload, UserRole, Principal
 )
 from app.core.security import get_current_user, require_admin
-from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.core.dependencies import get_principal
+from app.db.supabase import get_supabase_client, SupabaseQueries, run_query
+import asyncio
+import uuid
 import logging
 
 logger = logging.getLogger(__name__)
@@ -515,7 +518,7 @@ async def _enrich_fee_response(fee: dict, db: SupabaseQueries) -> dict:
     
     student_name = None
     if fee.get("student_id"):
-        student = await db.select_by_id("students", "student_id", fee["student_id"])
+        student = await db.load_by_id("students", "student_id", fee["student_id"])
         if student:
             student_name = student.get("name")
             
@@ -575,59 +578,65 @@ async def create_fee(
 @router.post("/payment", response_model=FeeResponse)
 async def record_payment(
     payment_data: FeePayment,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     current_user: TokenPayload = Depends(get_current_user) # Allow Admin/Staff
 ):
     """
     Record a fee payment against an existing fee.
+    
+    The payment is appended to the fee's ledger and the fee's balance
+    moved in one database transaction (rpc/record_fee_payment), so
+    counters taking payments for the same fee at the same time cannot
+    overwrite each other. A retried request with the same Idempotency-Key
+    header (or, without the header, the same transaction_id) is applied
+    only once: the retry returns the fee with `Idempotent-Replayed: true`.
     """
     supabase = get_supabase_client()
     db = SupabaseQueries(supabase)
     
+    if idempotency_key:
+        key = idempotency_key
+    elif payment_data.transaction_id:
+        key = f"txn:{payment_data.transaction_id}"
+    else:
+        key = f"auto:{uuid.uuid4()}"  # no way to recognise a retry
+    
     try:
-        # 1. Get existing fee record
-        fee = await db.select_by_id("fees", "fee_id", str(payment_data.fee_id))
-        if not fee:
+        result = (await run_query(db.raw_query().rpc("record_fee_payment", {
+            "p_fee_id": str(payment_data.fee_id),
+            "p_amount": payment_data.amount_paid,
+            "p_payment_method": payment_data.payment_method,
+            "p_transaction_id": payment_data.transaction_id,
+            "p_idempotency_key": key,
+            "p_recorded_by": current_user.sub
+        }))).data
+        
+        outcome = result["outcome"]
+        if outcome == "not_found":
             raise HTTPException(status_code=404, detail="Fee record not found")
-
-        # 2. Check for overpayment
-        current_paid = fee.get("amount_paid", 0)
-        total_amount = fee.get("amount", 0)
-        new_paid_amount = current_paid + payment_data.amount_paid
-        
-        if new_paid_amount > total_amount:
+        if outcome == "overpayment":
+            fee = result["fee"]
+            balance = fee.get("amount", 0) - (fee.get("amount_paid") or 0)
             raise HTTPException(
                 status_code=400,
-                detail=f"Payment (₹{payment_data.amount_paid}) exceeds balance due (₹{total_amount - current_paid})"
+                detail=f"Payment (₹{payment_data.amount_paid}) exceeds balance due (₹{balance})"
+            )
+        if outcome == "conflict":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="This idempotency key / transaction ID was already used for a different payment"
             )
-
-        # 3. Determine new status
-        new_balance = total_amount - new_paid_amount
-        new_status = FeeStatus.PARTIAL.value
-        if new_balance == 0:
-            new_status = FeeStatus.PAID.value
-            
-        # 4. Prepare update data
-        update_data = {
-            "amount_paid": new_paid_amount,
-            "status": new_status,
-            "payment_date": datetime.now().isoformat(),
-            "payment_method": payment_data.payment_method,
-            "transaction_id": payment_data.transaction_id
-        }
-        
-        # 5. Update the fee record
-        updated_fee = await db.update_by_id(
-            "fees",
-            "fee_id",
-            str(payment_data.fee_id),
-            update_data
-        )
         
-        logger.info(f"Payment recorded for fee {payment_data.fee_id}")
+        if outcome == "duplicate":
+            response.headers["Idempotent-Replayed"] = "true"
+            logger.info(f"Payment replay ignored for fee {payment_data.fee_id} (key {key})")
+        else:
+            logger.info(f"Payment recorded for fee {payment_data.fee_id}: {result['payment']['payment_id']}")
         
-        # 6. Enrich and return response
-        enriched_data = await _enrich_fee_response(updated_fee, db)
-        return FeeResponse(**updated_fee, **enriched_data)
+        fee = result["fee"]
+        enriched_data = await _enrich_fee_response(fee, db)
+        return FeeResponse(**fee, **enriched_data)
         
     except HTTPException:
         raise
@@ -638,12 +647,50 @@ async def record_payment(
             detail=f"Failed to record payment: {str(e)}"
         )
 
+@router.get("/{fee_id}/payments", response_model=List[FeePaymentRecord])
+async def get_fee_payments(
+    fee_id: str,
+    principal: Principal = Depends(get_principal)
+):
+    """
+    Payment ledger of a fee, oldest first.
+    - Students/Parents can only see their own.
+    """
+    supabase = get_supabase_client()
+    db = SupabaseQueries(supabase)
+    
+    try:
+        fee, payments = await asyncio.gather(
+            db.select_by_id("fees", "fee_id", fee_id, columns="fee_id, student_id"),
+            db.select_all(
+                "fee_payments", {"fee_id": fee_id}, order_by="created_at",
+                columns="payment_id, fee_id, amount, payment_method, transaction_id, recorded_by, created_at"
+            )
+        )
+        if not fee:
+            raise HTTPException(status_code=404, detail="Fee record not found")
+
+        if principal.role in (UserRole.STUDENT, UserRole.PARENT):
+            if fee.get("student_id") not in principal.student_ids:
+                raise HTTPException(status_code=403, detail="Access denied")
+
+        return [FeePaymentRecord(**p) for p in payments]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get fee payments error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve fee payments: {str(e)}"
+        )
+
 @router.get("/", response_model=List[FeeResponse])
 async def get_fees(
     student_id: Optional[str] = None,
     status: Optional[FeeStatus] = None,
     academic_year: Optional[str] = None,
-    current_user: TokenPayload = Depends(get_current_user)
+    principal: Principal = Depends(get_principal)
 ):
     """
     Get fee records with filtering.
@@ -656,27 +703,14 @@ async def get_fees(
     student_ids_allowed = None
 
     # --- Role-based security ---
-    if current_user.role == UserRole.STUDENT:
-        student = await db.select_one("students", {"user_id": current_user.sub})
-        if not student:
-            return []
-        student_ids_allowed = [student["student_id"]]
-        filters["student_id"] = student["student_id"]
-        
-    elif current_user.role == UserRole.PARENT:
-        parent = await db.select_one("parents", {"user_id": current_user.sub})
-        if not parent:
-            return []
-        links = await db.select_all("parent_student", {"parent_id": parent["parent_id"]})
-        student_ids_allowed = [link["student_id"] for link in links]
+    if principal.role in (UserRole.STUDENT, UserRole.PARENT):
+        student_ids_allowed = principal.student_ids
         if not student_ids_allowed:
             return []
-        # If parent is filtering for a *specific* child they own
-        if student_id and student_id in student_ids_allowed:
-            filters["student_id"] = student_id
-        # If parent is *not* filtering, we'll fetch all and filter in Python
-        elif student_id:
+        if student_id and student_id not in student_ids_allowed:
             raise HTTPException(status_code=403, detail="Access denied to this student's records")
+        if student_id:
+            student_ids_allowed = [student_id]
 
     elif student_id: # Admin or Teacher filtering
         filters["student_id"] = student_id
@@ -688,17 +722,20 @@ async def get_fees(
         filters["academic_year"] = academic_year
         
     try:
-        fees_list = await db.select_all("fees", filters, "due_date", ascending=False)
-        
-        response_list = []
-        for fee in fees_list:
-            # Post-fetch filter for Parent role
-            if current_user.role == UserRole.PARENT and student_ids_allowed:
-                if fee.get("student_id") not in student_ids_allowed:
-                    continue
-
-            enriched_data = await _enrich_fee_response(fee, db)
-            response_list.append(FeeResponse(**fee, **enriched_data))
+        if student_ids_allowed is not None:
+            fees_list = await db.select_in(
+                "fees", "student_id", student_ids_allowed, filters,
+                order_by="due_date", ascending=False
+            )
+        else:
+            fees_list = await db.select_all("fees", filters, "due_date", ascending=False)
+
+        # Lookups are batched per table
+        enriched = await asyncio.gather(*(_enrich_fee_response(fee, db) for fee in fees_list))
+        response_list = [
+            FeeResponse(**fee, **enriched_data)
+            for fee, enriched_data in zip(fees_list, enriched)
+        ]
             
         return response_list
         
@@ -712,7 +749,7 @@ async def get_fees(
 @router.get("/{fee_id}", response_model=FeeResponse)
 async def get_fee(
     fee_id: str,
-    current_user: TokenPayload = Depends(get_current_user)
+    principal: Principal = Depends(get_principal)
 ):
     """
     Get a single fee record by ID.
@@ -727,18 +764,8 @@ async def get_fee(
             raise HTTPException(status_code=404, detail="Fee record not found")
 
         # --- Authorization Check ---
-        if current_user.role == UserRole.STUDENT:
-            student = await db.select_one("students", {"user_id": current_user.sub})
-            if not student or fee.get("student_id") != student["student_id"]:
-                raise HTTPException(status_code=403, detail="Access denied")
-                
-        elif current_user.role == UserRole.PARENT:
-            parent = await db.select_one("parents", {"user_id": current_user.sub})
-            if not parent:
-                raise HTTPException(status_code=403, detail="Access denied")
-            links = await db.select_all("parent_student", {"parent_id": parent["parent_id"]})
-            student_ids_allowed = [link["student_id"] for link in links]
-            if fee.get("student_id") not in student_ids_allowed:
+        if principal.role in (UserRole.STUDENT, UserRole.PARENT):
+            if fee.get("student_id") not in principal.student_ids:
                 raise HTTPException(status_code=403, detail="Access denied")
         # --- End Auth Check ---
 
@@ -850,27 +877,25 @@ async def get_fee_statistics(
     Get fee collection statistics (Admin only)
     """
     supabase = get_supabase_client()
+    db = SupabaseQueries(supabase)
     
     try:
-        query = supabase.table("fees").select("*")
-        
-        if academic_year:
-            query = query.eq("academic_year", academic_year)
-        
-        response = query.execute()
-        fees = response.data
+        # One row per status instead of every fee record
+        groups = await db.aggregate(
+            "fees",
+            group_by=["status"],
+            metrics={"count": "count", "expected": "sum:amount", "collected": "sum:amount_paid"},
+            filters={"academic_year": academic_year} if academic_year else None
+        )
         
-        if not fees:
+        if not groups:
             return {"summary": "No fee data found for the specified criteria."}
 
-        total_expected = sum(f["amount"] for f in fees)
-        total_collected = sum(f.get("amount_paid", 0) for f in fees)
+        total_expected = sum(g["expected"] or 0 for g in groups)
+        total_collected = sum(g["collected"] or 0 for g in groups)
         total_pending = total_expected - total_collected
         
-        paid_count = sum(1 for f in fees if f["status"] == "paid")
-        pending_count = sum(1 for f in fees if f["status"] == "pending")
-        overdue_count = sum(1 for f in fees if f["status"] == "overdue")
-        partial_count = sum(1 for f in fees if f["status"] == "partial")
+        status_counts = {g["status"]: g["count"] for g in groups}
         
         collection_rate = (total_collected / total_expected * 100) if total_expected > 0 else 0
         
@@ -882,10 +907,10 @@ async def get_fee_statistics(
                 "collection_rate_percentage": round(collection_rate, 2)
             },
             "status_count": {
-                "paid": paid_count,
-                "pending": pending_count,
-                "overdue": overdue_count,
-                "partial": partial_count
+                "paid": status_counts.get("paid", 0),
+                "pending": status_counts.get("pending", 0),
+                "overdue": status_counts.get("overdue", 0),
+                "partial": status_counts.get("partial", 0)
             },
             "academic_year": academic_year or "All"
         }
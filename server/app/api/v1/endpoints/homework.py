@@ -6,10 +6,12 @@ from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from typing import List, Optional
 from datetime import date
 from app.models.schemas import (
-    HomeworkCreate, HomeworkUpdate, HomeworkResponse, TokenPayload, UserRole
+    HomeworkCreate, HomeworkUpdate, HomeworkResponse, TokenPayload, UserRole, Principal
 )
-from app.core.security import require_admin, get_current_user, require_teacher
-from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.core.security import require_admin, require_teacher
+from app.core.dependencies import get_principal
+from app.db.supabase import get_supabase_client, SupabaseQueries, run_query
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,17 +24,17 @@ async def _enrich_homework_response(homework: dict, db: SupabaseQueries) -> dict
     class_name, subject_name, teacher_name = None, None, None
     
     if homework.get("class_id"):
-        cls = await db.select_by_id("classes", "class_id", homework["class_id"])
+        cls = await db.load_by_id("classes", "class_id", homework["class_id"])
         if cls:
             class_name = f"{cls.get('class_name', '')} - {cls.get('section', '')}"
             
     if homework.get("subject_id"):
-        subject = await db.select_by_id("subjects", "subject_id", homework["subject_id"])
+        subject = await db.load_by_id("subjects", "subject_id", homework["subject_id"])
         if subject:
             subject_name = subject.get("subject_name")
 
     if homework.get("teacher_id"):
-        teacher = await db.select_by_id("teachers", "teacher_id", homework["teacher_id"])
+        teacher = await db.load_by_id("teachers", "teacher_id", homework["teacher_id"])
         if teacher:
             teacher_name = teacher.get("name")
             
@@ -46,7 +48,8 @@ async def _enrich_homework_response(homework: dict, db: SupabaseQueries) -> dict
 @router.post("/", response_model=HomeworkResponse, status_code=status.HTTP_201_CREATED)
 async def create_homework(
     homework_data: HomeworkCreate,
-    current_user: TokenPayload = Depends(require_teacher) # Teachers or Admins
+    current_user: TokenPayload = Depends(require_teacher), # Teachers or Admins
+    principal: Principal = Depends(get_principal)
 ):
     """
     Create a new homework assignment.
@@ -63,14 +66,13 @@ async def create_homework(
             raise HTTPException(status_code=404, detail="Subject not found")
         
         # 2. Get Teacher ID from current user
-        teacher = await db.select_one("teachers", {"user_id": current_user.sub})
-        if not teacher and current_user.role != UserRole.ADMIN:
+        if not principal.teacher_id and current_user.role != UserRole.ADMIN:
              raise HTTPException(status_code=404, detail="Teacher profile not found for this user.")
         
         # Admins can post on behalf of others, but teachers must use their own ID
         teacher_id_to_use = str(homework_data.teacher_id)
         if current_user.role == UserRole.TEACHER:
-            teacher_id_to_use = teacher["teacher_id"]
+            teacher_id_to_use = principal.teacher_id
         elif not await db.select_by_id("teachers", "teacher_id", teacher_id_to_use):
             raise HTTPException(status_code=404, detail="Teacher (teacher_id) not found.")
 
@@ -105,7 +107,7 @@ async def create_homework(
 async def get_homework_list(
     class_id: Optional[str] = None,
     teacher_id: Optional[str] = None,
-    current_user: TokenPayload = Depends(get_current_user)
+    principal: Principal = Depends(get_principal)
 ):
     """
     Get a list of homework assignments.
@@ -121,25 +123,15 @@ async def get_homework_list(
 
     try:
         # --- Role-based security ---
-        if current_user.role == UserRole.STUDENT:
-            student = await db.select_one("students", {"user_id": current_user.sub})
-            if not student or not student.get("class_id"):
+        if principal.role == UserRole.STUDENT:
+            if not principal.class_ids:
                 return []
-            class_ids_allowed = [student["class_id"]]
-            filters["class_id"] = student["class_id"]
-            
-        elif current_user.role == UserRole.PARENT:
-            parent = await db.select_one("parents", {"user_id": current_user.sub})
-            if not parent: return []
-            
-            links = await db.select_all("parent_student", {"parent_id": parent["parent_id"]})
-            child_student_ids = [link["student_id"] for link in links]
-            if not child_student_ids: return []
-            
-            # Find all unique class IDs for their children
-            children = await db.raw_query().table("students").select("class_id").in_("student_id", child_student_ids).execute()
-            class_ids_allowed = list(set(c["class_id"] for c in children.data if c.get("class_id")))
+            class_ids_allowed = principal.class_ids
+            filters["class_id"] = class_ids_allowed[0]
             
+        elif principal.role == UserRole.PARENT:
+            # Classes of all linked children
+            class_ids_allowed = principal.class_ids
             if not class_ids_allowed: return []
             
             # If parent is filtering for a specific class they have access to
@@ -151,7 +143,7 @@ async def get_homework_list(
         elif class_id: # Admin/Teacher filtering
             filters["class_id"] = class_id
             
-        if teacher_id and current_user.role in [UserRole.ADMIN, UserRole.TEACHER]:
+        if teacher_id and principal.role in [UserRole.ADMIN, UserRole.TEACHER]:
             filters["teacher_id"] = teacher_id
         # --- End security ---
         
@@ -161,17 +153,18 @@ async def get_homework_list(
             query = query.eq(key, value)
             
         # Handle parent query for multiple classes
-        if current_user.role == UserRole.PARENT and not class_id:
+        if principal.role == UserRole.PARENT and not class_id:
             query = query.in_("class_id", class_ids_allowed)
             
-        response = query.order("due_date", desc=True).execute()
+        response = await run_query(query.order("due_date", desc=True))
         homework_list = response.data
         
-        # Enrich all entries
-        response_list = []
-        for hw in homework_list:
-            enriched_data = await _enrich_homework_response(hw, db)
-            response_list.append(HomeworkResponse(**hw, **enriched_data))
+        # Enrich all entries (lookups are batched per table)
+        enriched = await asyncio.gather(*(_enrich_homework_response(hw, db) for hw in homework_list))
+        response_list = [
+            HomeworkResponse(**hw, **enriched_data)
+            for hw, enriched_data in zip(homework_list, enriched)
+        ]
             
         return response_list
         
@@ -185,7 +178,7 @@ async def get_homework_list(
 @router.get("/{hw_id}", response_model=HomeworkResponse)
 async def get_homework(
     hw_id: str,
-    current_user: TokenPayload = Depends(get_current_user)
+    principal: Principal = Depends(get_principal)
 ):
     """
     Get a single homework assignment by its ID.
@@ -200,21 +193,8 @@ async def get_homework(
             raise HTTPException(status_code=404, detail="Homework not found")
 
         # --- Authorization Check ---
-        if current_user.role == UserRole.STUDENT:
-            student = await db.select_one("students", {"user_id": current_user.sub})
-            if not student or hw.get("class_id") != student.get("class_id"):
-                raise HTTPException(status_code=403, detail="Access denied")
-                
-        elif current_user.role == UserRole.PARENT:
-            parent = await db.select_one("parents", {"user_id": current_user.sub})
-            if not parent:
-                 raise HTTPException(status_code=403, detail="Access denied")
-            links = await db.select_all("parent_student", {"parent_id": parent["parent_id"]})
-            child_student_ids = [link["student_id"] for link in links]
-            children = await db.raw_query().table("students").select("class_id").in_("student_id", child_student_ids).execute()
-            class_ids_allowed = list(set(c["class_id"] for c in children.data if c.get("class_id")))
-            
-            if hw.get("class_id") not in class_ids_allowed:
+        if principal.role in (UserRole.STUDENT, UserRole.PARENT):
+            if hw.get("class_id") not in principal.class_ids:
                 raise HTTPException(status_code=403, detail="Access denied")
         # --- End Auth Check ---
 
@@ -234,7 +214,8 @@ async def get_homework(
 async def update_homework(
     hw_id: str,
     homework_data: HomeworkUpdate,
-    current_user: TokenPayload = Depends(require_teacher) # Teachers or Admins
+    current_user: TokenPayload = Depends(require_teacher), # Teachers or Admins
+    principal: Principal = Depends(get_principal)
 ):
     """
     Update a homework assignment.
@@ -250,9 +231,8 @@ async def update_homework(
             raise HTTPException(status_code=404, detail="Homework not found")
 
         # 2. Authorization: Must be Admin or the author
-        teacher = await db.select_one("teachers", {"user_id": current_user.sub})
         if current_user.role != UserRole.ADMIN:
-            if not teacher or existing.get("teacher_id") != teacher["teacher_id"]:
+            if not principal.teacher_id or existing.get("teacher_id") != principal.teacher_id:
                 raise HTTPException(status_code=403, detail="Not authorized to update this homework")
 
         # 3. Prepare update data
@@ -292,7 +272,8 @@ async def update_homework(
 @router.delete("/{hw_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_homework(
     hw_id: str,
-    current_user: TokenPayload = Depends(require_teacher) # Teachers or Admins
+    current_user: TokenPayload = Depends(require_teacher), # Teachers or Admins
+    principal: Principal = Depends(get_principal)
 ):
     """
     Delete a homework assignment.
@@ -308,9 +289,8 @@ async def delete_homework(
             raise HTTPException(status_code=404, detail="Homework not found")
 
         # 2. Authorization: Must be Admin or the author
-        teacher = await db.select_one("teachers", {"user_id": current_user.sub})
         if current_user.role != UserRole.ADMIN:
-            if not teacher or existing.get("teacher_id") != teacher["teacher_id"]:
+            if not principal.teacher_id or existing.get("teacher_id") != principal.teacher_id:
                 raise HTTPException(status_code=403, detail="Not authorized to delete this homework")
         
         # 3. Check for submissions (optional: prevent deletion if graded)
@@ -6,10 +6,12 @@ from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from typing import List, Optional
 from datetime import datetime
 from app.models.schemas import (
-    LeaveRequestCreate, LeaveRequestUpdate, LeaveRequestResponse, TokenPayload, UserRole, LeaveStatus
+    LeaveRequestCreate, LeaveRequestUpdate, LeaveRequestResponse, TokenPayload, UserRole, LeaveStatus, Principal
 )
-from app.core.security import require_admin, get_current_user, require_teacher
+from app.core.security import require_admin, require_teacher
+from app.core.dependencies import get_principal
 from app.db.supabase import get_supabase_client, SupabaseQueries
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,7 +22,7 @@ async def _enrich_leave_response(request: dict, db: SupabaseQueries) -> dict:
     """Helper to add student_name."""
     student_name = None
     if request.get("student_id"):
-        student = await db.select_by_id("students", "student_id", request["student_id"])
+        student = await db.load_by_id("students", "student_id", request["student_id"])
         if student:
             student_name = student.get("name")
     return {"student_name": student_name}
@@ -29,7 +31,7 @@ async def _enrich_leave_response(request: dict, db: SupabaseQueries) -> dict:
 @router.post("/", response_model=LeaveRequestResponse, status_code=status.HTTP_201_CREATED)
 async def create_leave_request(
     request_data: LeaveRequestCreate,
-    current_user: TokenPayload = Depends(get_current_user) # Students, Parents, Admins
+    principal: Principal = Depends(get_principal) # Students, Parents, Admins
 ):
     """
     Create a new leave request.
@@ -43,27 +45,22 @@ async def create_leave_request(
     
     try:
         # 1. Authorize who is creating the request
-        if current_user.role == UserRole.STUDENT:
-            student = await db.select_one("students", {"user_id": current_user.sub})
-            if not student:
+        if principal.role == UserRole.STUDENT:
+            if not principal.student_id:
                 raise HTTPException(status_code=404, detail="Student profile not found for this user.")
-            if request_data.student_id != student["student_id"]:
+            if request_data.student_id != principal.student_id:
                  raise HTTPException(status_code=403, detail="Students can only submit leave requests for themselves.")
-            student_id_to_use = student["student_id"]
+            student_id_to_use = principal.student_id
 
-        elif current_user.role == UserRole.PARENT:
-            parent = await db.select_one("parents", {"user_id": current_user.sub})
-            if not parent:
+        elif principal.role == UserRole.PARENT:
+            if not principal.parent_id:
                 raise HTTPException(status_code=404, detail="Parent profile not found for this user.")
             
-            links = await db.select_all("parent_student", {"parent_id": parent["parent_id"]})
-            child_ids = [link["student_id"] for link in links]
-            
-            if request_data.student_id not in child_ids:
+            if request_data.student_id not in principal.child_ids:
                 raise HTTPException(status_code=403, detail="Parents can only submit requests for their own children.")
             student_id_to_use = request_data.student_id
         
-        elif current_user.role == UserRole.ADMIN:
+        elif principal.role == UserRole.ADMIN:
              student_id_to_use = str(request_data.student_id)
              if not await db.select_by_id("students", "student_id", student_id_to_use):
                  raise HTTPException(status_code=404, detail="Student not found.")
@@ -102,7 +99,7 @@ async def create_leave_request(
 async def get_leave_requests(
     status: Optional[LeaveStatus] = None,
     student_id: Optional[str] = None,
-    current_user: TokenPayload = Depends(get_current_user)
+    principal: Principal = Depends(get_principal)
 ):
     """
     Get a list of all leave requests.
@@ -118,22 +115,14 @@ async def get_leave_requests(
     
     try:
         # --- Role-based security ---
-        if current_user.role == UserRole.STUDENT:
-            student = await db.select_one("students", {"user_id": current_user.sub})
-            if not student: return []
-            filters["student_id"] = student["student_id"]
-            
-        elif current_user.role == UserRole.PARENT:
-            parent = await db.select_one("parents", {"user_id": current_user.sub})
-            if not parent: return []
-            links = await db.select_all("parent_student", {"parent_id": parent["parent_id"]})
-            student_ids_allowed = [link["student_id"] for link in links]
+        if principal.role in (UserRole.STUDENT, UserRole.PARENT):
+            student_ids_allowed = principal.student_ids
             if not student_ids_allowed: return []
             
-            if student_id and student_id in student_ids_allowed:
-                filters["student_id"] = student_id
-            elif student_id: # Parent trying to access a student not their own
+            if student_id and student_id not in student_ids_allowed:
                  raise HTTPException(status_code=403, detail="Access denied")
+            if student_id:
+                student_ids_allowed = [student_id]
 
         elif student_id: # Admin/Teacher filtering
             filters["student_id"] = student_id
@@ -142,20 +131,25 @@ async def get_leave_requests(
         if status:
             filters["status"] = status.value
             
-        requests_list = await db.select_all("leave_requests", filters, "created_at", ascending=False)
-        
-        response_list = []
-        for req in requests_list:
-            # Post-fetch filter for Parent role
-            if current_user.role == UserRole.PARENT and not student_id:
-                if req.get("student_id") not in student_ids_allowed:
-                    continue
+        if student_ids_allowed is not None:
+            requests_list = await db.select_in(
+                "leave_requests", "student_id", student_ids_allowed, filters,
+                order_by="created_at", ascending=False
+            )
+        else:
+            requests_list = await db.select_all("leave_requests", filters, "created_at", ascending=False)
 
-            enriched_data = await _enrich_leave_response(req, db)
-            response_list.append(LeaveRequestResponse(**req, **enriched_data))
+        # Lookups are batched per table
+        enriched = await asyncio.gather(*(_enrich_leave_response(req, db) for req in requests_list))
+        response_list = [
+            LeaveRequestResponse(**req, **enriched_data)
+            for req, enriched_data in zip(requests_list, enriched)
+        ]
             
         return response_list
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get leave requests error: {e}")
         raise HTTPException(
@@ -166,7 +160,7 @@ async def get_leave_requests(
 @router.get("/{request_id}", response_model=LeaveRequestResponse)
 async def get_leave_request(
     request_id: str,
-    current_user: TokenPayload = Depends(get_current_user)
+    principal: Principal = Depends(get_principal)
 ):
     """
     Get a single leave request by its ID.
@@ -181,18 +175,8 @@ async def get_leave_request(
             raise HTTPException(status_code=404, detail="Leave request not found")
 
         # --- Authorization Check ---
-        if current_user.role == UserRole.STUDENT:
-            student = await db.select_one("students", {"user_id": current_user.sub})
-            if not student or request.get("student_id") != student["student_id"]:
-                raise HTTPException(status_code=403, detail="Access denied")
-                
-        elif current_user.role == UserRole.PARENT:
-            parent = await db.select_one("parents", {"user_id": current_user.sub})
-            if not parent:
-                raise HTTPException(status_code=403, detail="Access denied")
-            links = await db.select_all("parent_student", {"parent_id": parent["parent_id"]})
-            student_ids_allowed = [link["student_id"] for link in links]
-            if request.get("student_id") not in student_ids_allowed:
+        if principal.role in (UserRole.STUDENT, UserRole.PARENT):
+            if request.get("student_id") not in principal.student_ids:
                 raise HTTPException(status_code=403, detail="Access denied")
         # --- End Auth Check ---
 
@@ -3,12 +3,15 @@ app/api/v1/endpoints/marks.py
 Marks management endpoints
 """
 from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from app.models.schemas import (
-    MarksCreate, MarksUpdate, MarksResponse, TokenPayload, UserRole
+    MarksCreate, MarksUpdate, MarksResponse, TokenPayload, UserRole, Principal
 )
-from app.core.security import require_admin, get_current_user, require_teacher
+from app.core.security import require_admin, require_teacher
+from app.core.dependencies import get_principal
 from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.services.exam_analytics import invalidate_exam_analytics
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,13 +25,13 @@ async def _enrich_mark_response(mark: dict, db: SupabaseQueries) -> dict:
     
     # 1. Get Student
     if mark.get("student_id"):
-        student = await db.select_by_id("students", "student_id", mark["student_id"])
+        student = await db.load_by_id("students", "student_id", mark["student_id"])
         if student:
             student_name = student.get("name")
             
     # 2. Get Exam
     if mark.get("exam_id"):
-        exam = await db.select_by_id("exams", "exam_id", mark["exam_id"])
+        exam = await db.load_by_id("exams", "exam_id", mark["exam_id"])
         if exam:
             exam_name = exam.get("exam_name")
             max_marks = exam.get("max_marks")
@@ -89,6 +92,7 @@ async def create_mark(
         
         # 5. Insert new mark
         new_mark = await db.insert_one("marks", mark_dict)
+        invalidate_exam_analytics(mark_dict["exam_id"])
         
         logger.info(f"Mark created: {new_mark['mark_id']}")
         
@@ -150,6 +154,7 @@ async def create_bulk_marks(
     if records_to_insert:
         try:
             new_marks = await db.insert_many("marks", records_to_insert)
+            invalidate_exam_analytics(first_exam_id)
             created_count = len(new_marks)
             logger.info(f"Bulk marks created: {created_count} records.")
         except Exception as e:
@@ -166,11 +171,125 @@ async def create_bulk_marks(
     }
 
 
+@router.post("/bulk-upsert")
+async def upsert_bulk_marks(
+    marks_list: List[MarksCreate],
+    current_user: TokenPayload = Depends(require_teacher) # Teachers or Admins
+):
+    """
+    Create or update marks for any number of exams in one call.
+    (Admin or Teacher only)
+    
+    Marks are keyed on (exam_id, student_id): new pairs are created,
+    existing ones updated, identical ones left alone, so a re-uploaded
+    marks sheet is safe. Exams, students and the existing marks are
+    fetched with one query each and all writes go in a single upsert.
+    Every row gets an outcome: created, updated, unchanged, superseded
+    (a later row has the same pair) or error.
+    """
+    supabase = get_supabase_client()
+    db = SupabaseQueries(supabase)
+    
+    if not marks_list:
+        raise HTTPException(status_code=400, detail="No marks data provided.")
+
+    rows = [
+        {"exam_id": str(m.exam_id), "student_id": str(m.student_id), "marks_scored": m.marks_scored, "remarks": m.remarks}
+        for m in marks_list
+    ]
+    exam_ids = list(dict.fromkeys(r["exam_id"] for r in rows))
+    
+    try:
+        exams, students, existing_marks = await asyncio.gather(
+            db.select_in("exams", "exam_id", exam_ids, columns="exam_id, max_marks"),
+            db.select_in("students", "student_id", [r["student_id"] for r in rows], columns="student_id"),
+            # Paged: a few exams of a large school already exceed max-rows
+            db.select_in(
+                "marks", "exam_id", exam_ids,
+                columns="mark_id, exam_id, student_id, marks_scored, remarks", page_by="mark_id"
+            )
+        )
+    except Exception as e:
+        logger.error(f"Bulk upsert marks lookup error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to upsert marks in bulk: {str(e)}"
+        )
+
+    max_marks = {e["exam_id"]: e.get("max_marks", 0) for e in exams}
+    known_students = {s["student_id"] for s in students}
+    existing = {(m["exam_id"], m["student_id"]): m for m in existing_marks}
+
+    results: List[Dict[str, Any]] = []
+    for i, row in enumerate(rows):
+        result = {"index": i, "exam_id": row["exam_id"], "student_id": row["student_id"]}
+        results.append(result)
+        if row["exam_id"] not in max_marks:
+            result.update(status="error", error=f"Exam with ID {row['exam_id']} not found.")
+        elif row["student_id"] not in known_students:
+            result.update(status="error", error=f"Student with ID {row['student_id']} not found.")
+        elif row["marks_scored"] > max_marks[row["exam_id"]]:
+            result.update(status="error", error=f"Marks ({row['marks_scored']}) exceed max marks ({max_marks[row['exam_id']]}).")
+
+    # The last valid row of a pair wins
+    last_row = {(r["exam_id"], r["student_id"]): i for i, r in enumerate(rows) if "status" not in results[i]}
+    to_write: Dict[Tuple[str, str], int] = {}
+    for key, i in last_row.items():
+        if key in existing:
+            current = existing[key]
+            results[i]["mark_id"] = current["mark_id"]
+            if (current["marks_scored"], current.get("remarks")) == (rows[i]["marks_scored"], rows[i]["remarks"]):
+                results[i]["status"] = "unchanged"
+            else:
+                results[i]["status"] = "updated"
+                to_write[key] = i
+        else:
+            results[i]["status"] = "created"
+            to_write[key] = i
+    for result in results:
+        if "status" not in result:
+            winner = last_row[(result["exam_id"], result["student_id"])]
+            result.update(status="superseded", error=f"Row {winner} has marks for the same exam and student.")
+
+    if to_write:
+        try:
+            written = await db.upsert_many(
+                "marks", [rows[i] for i in to_write.values()], on_conflict="exam_id,student_id"
+            )
+        except Exception as e:
+            logger.error(f"Bulk upsert marks error: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to upsert marks in bulk: {str(e)}"
+            )
+        for mark in written:
+            i = to_write.get((mark["exam_id"], mark["student_id"]))
+            if i is not None:
+                results[i]["mark_id"] = mark["mark_id"]
+        for exam_id in dict.fromkeys(key[0] for key in to_write):
+            invalidate_exam_analytics(exam_id)
+
+    counts = {outcome: 0 for outcome in ("created", "updated", "unchanged", "superseded", "error")}
+    for result in results:
+        counts[result["status"]] += 1
+    logger.info(f"Bulk marks upserted: {counts}")
+    
+    return {
+        "message": "Bulk marks processed.",
+        "created_count": counts["created"],
+        "updated_count": counts["updated"],
+        "unchanged_count": counts["unchanged"],
+        "superseded_count": counts["superseded"],
+        "error_count": counts["error"],
+        "results": results
+    }
+
+
 @router.get("/", response_model=List[MarksResponse])
 async def get_marks(
     student_id: Optional[str] = None,
     exam_id: Optional[str] = None,
-    current_user: TokenPayload = Depends(get_current_user)
+    principal: Principal = Depends(get_principal)
 ):
     """
     Get a list of all marks, with optional filters.
@@ -181,33 +300,17 @@ async def get_marks(
     db = SupabaseQueries(supabase)
     
     filters = {}
+    student_ids = None
     
     # Role-based filtering
-    if current_user.role == UserRole.STUDENT:
-        student_profile = await db.select_one("students", {"user_id": current_user.sub})
-        if not student_profile:
-            return [] # This user has no student profile
-        filters["student_id"] = student_profile["student_id"]
-    elif current_user.role == UserRole.PARENT:
-        # Logic to get children's student_ids
-        parent_profile = await db.select_one("parents", {"user_id": current_user.sub})
-        if not parent_profile:
-            return []
-        
-        child_links = await db.select_all("parent_student", {"parent_id": parent_profile["parent_id"]})
-        child_ids = [link["student_id"] for link in child_links]
-        if not child_ids:
-            return []
-        
-        # This endpoint doesn't support "IN" filter, so we filter by student if one is provided,
-        # otherwise we fetch all and filter in Python (less efficient, but works for now)
-        if student_id and student_id in child_ids:
-            filters["student_id"] = student_id
-        elif student_id:
-             raise HTTPException(status_code=403, detail="You do not have permission to view this student's marks.")
-        else:
-            # Parent is asking for all their children's marks
-             pass # We'll filter later
+    if principal.role in (UserRole.STUDENT, UserRole.PARENT):
+        student_ids = principal.student_ids
+        if not student_ids:
+            return [] # No student profile / no linked children
+        if student_id and student_id not in student_ids:
+            raise HTTPException(status_code=403, detail="You do not have permission to view this student's marks.")
+        if student_id:
+            student_ids = [student_id]
     
     # Admin/Teacher filters
     elif student_id:
@@ -217,17 +320,20 @@ async def get_marks(
         filters["exam_id"] = exam_id
         
     try:
-        marks_list = await db.select_all("marks", filters=filters, order_by="created_at", ascending=False)
-        
-        response_list = []
-        for mark in marks_list:
-            # Post-fetch filter for Parent role if student_id wasn't specified
-            if current_user.role == UserRole.PARENT and not student_id:
-                if mark.get("student_id") not in child_ids:
-                    continue
-                    
-            enriched_data = await _enrich_mark_response(mark, db)
-            response_list.append(MarksResponse(**mark, **enriched_data))
+        if student_ids is not None:
+            marks_list = await db.select_in(
+                "marks", "student_id", student_ids, filters,
+                order_by="created_at", ascending=False
+            )
+        else:
+            marks_list = await db.select_all("marks", filters=filters, order_by="created_at", ascending=False)
+
+        # Lookups are batched per table
+        enriched = await asyncio.gather(*(_enrich_mark_response(mark, db) for mark in marks_list))
+        response_list = [
+            MarksResponse(**mark, **enriched_data)
+            for mark, enriched_data in zip(marks_list, enriched)
+        ]
             
         return response_list
         
@@ -241,7 +347,7 @@ async def get_marks(
 @router.get("/{mark_id}", response_model=MarksResponse)
 async def get_mark(
     mark_id: str,
-    current_user: TokenPayload = Depends(get_current_user)
+    principal: Principal = Depends(get_principal)
 ):
     """
     Get a single mark entry by its ID.
@@ -256,17 +362,9 @@ async def get_mark(
             raise HTTPException(status_code=404, detail="Mark not found")
 
         # --- Authorization Check ---
-        if current_user.role == UserRole.STUDENT:
-            student_profile = await db.select_one("students", {"user_id": current_user.sub})
-            if not student_profile or mark.get("student_id") != student_profile["student_id"]:
+        if principal.role in (UserRole.STUDENT, UserRole.PARENT):
+            if mark.get("student_id") not in principal.student_ids:
                 raise HTTPException(status_code=403, detail="Access denied")
-
-        if current_user.role == UserRole.PARENT:
-            parent_profile = await db.select_one("parents", {"user_id": current_user.sub})
-            child_links = await db.select_all("parent_student", {"parent_id": parent_profile["parent_id"]})
-            child_ids = [link["student_id"] for link in child_links]
-            if mark.get("student_id") not in child_ids:
-                 raise HTTPException(status_code=403, detail="Access denied")
         # --- End Auth Check ---
 
         enriched_data = await _enrich_mark_response(mark, db)
@@ -318,6 +416,7 @@ async def update_mark(
 
         # Update the mark
         updated_mark = await db.update_by_id("marks", "mark_id", mark_id, update_data)
+        invalidate_exam_analytics(existing_mark["exam_id"])
         
         logger.info(f"Mark updated: {updated_mark['mark_id']}")
 
@@ -346,10 +445,12 @@ async def delete_mark(
     db = SupabaseQueries(supabase)
     
     try:
-        if not await db.select_by_id("marks", "mark_id", mark_id):
+        existing_mark = await db.select_by_id("marks", "mark_id", mark_id)
+        if not existing_mark:
             raise HTTPException(status_code=404, detail="Mark not found")
             
         await db.delete_by_id("marks", "mark_id", mark_id)
+        invalidate_exam_analytics(existing_mark["exam_id"])
         
         logger.info(f"Mark deleted: {mark_id}")
         return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -5,8 +5,10 @@ Parent management endpoints with auto user creation
 from fastapi import APIRouter, HTTPException, status, Depends
 from typing import List
 from app.models.schemas import ParentCreate, ParentResponse, TokenPayload, StudentResponse
-from app.core.security import require_admin, require_parent, get_current_user, hash_password
-from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.core.security import require_admin, require_parent, get_current_user, hash_password_async
+from app.core.dependencies import invalidate_parent_scope
+from app.db.supabase import get_supabase_client, SupabaseQueries, run_query
+from app.services.attendance_rollups import student_attendance_counts, attendance_percentage
 # from app.services.email_service import EmailService
 import logging
 
@@ -59,7 +61,7 @@ async def create_parent(
         # Step 1: Create user account with phone as password
         user_data = {
             "email": parent_data.email,
-            "password_hash": hash_password(parent_data.phone),
+            "password_hash": await hash_password_async(parent_data.phone),
             "role": "parent",
             "is_active": True
         }
@@ -173,9 +175,9 @@ async def get_parents(
         parents_response = []
         for parent in parents:
             # Get linked students
-            students_data = supabase.table("parent_student").select(
+            students_data = await run_query(supabase.table("parent_student").select(
                 "students(*)"
-            ).eq("parent_id", parent["parent_id"]).execute()
+            ).eq("parent_id", parent["parent_id"]))
             
             students = []
             if students_data.data:
@@ -212,9 +214,9 @@ async def get_parent(
             )
         
         # Get linked students
-        students_data = supabase.table("parent_student").select(
+        students_data = await run_query(supabase.table("parent_student").select(
             "students(*)"
-        ).eq("parent_id", parent_id).execute()
+        ).eq("parent_id", parent_id))
         
         students = []
         if students_data.data:
@@ -252,9 +254,9 @@ async def get_parent_children(
             )
         
         # Get children with class information
-        response = supabase.table("parent_student").select(
+        response = await run_query(supabase.table("parent_student").select(
             "*, students(*, classes(class_name, section))"
-        ).eq("parent_id", parent_id).execute()
+        ).eq("parent_id", parent_id))
         
         children = []
         for record in response.data:
@@ -301,9 +303,9 @@ async def get_child_performance(
     
     try:
         # Verify parent-student relationship
-        relationship = supabase.table("parent_student").select("*").eq(
+        relationship = await run_query(supabase.table("parent_student").select("*").eq(
             "parent_id", parent_id
-        ).eq("student_id", student_id).execute()
+        ).eq("student_id", student_id))
         
         if not relationship.data:
             raise HTTPException(
@@ -319,16 +321,13 @@ async def get_child_performance(
                 detail="Student not found"
             )
         
-        # Get attendance
-        attendance = supabase.table("attendance").select("*").eq("student_id", student_id).execute()
-        total_days = len(attendance.data)
-        present_days = sum(1 for a in attendance.data if a["status"] == "present")
-        attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
+        # Get attendance (rollup rows, one per academic year)
+        attendance = (await student_attendance_counts(db, [student_id]))[student_id]
         
         # Get marks
-        marks = supabase.table("marks").select(
+        marks = await run_query(supabase.table("marks").select(
             "*, exams(exam_name, max_marks, date, subjects(subject_name))"
-        ).eq("student_id", student_id).execute()
+        ).eq("student_id", student_id))
         
         # Calculate average
         total_percentage = 0
@@ -344,9 +343,9 @@ async def get_child_performance(
             "student_id": student_id,
             "student_name": student["name"],
             "attendance": {
-                "total_days": total_days,
-                "present_days": present_days,
-                "percentage": round(attendance_percentage, 2)
+                "total_days": attendance["total"],
+                "present_days": attendance["present"],
+                "percentage": attendance_percentage(attendance)
             },
             "academic": {
                 "total_exams": len(marks.data),
@@ -393,9 +392,9 @@ async def link_student_to_parent(
             )
         
         # Check if relationship already exists
-        existing = supabase.table("parent_student").select("*").eq(
+        existing = await run_query(supabase.table("parent_student").select("*").eq(
             "parent_id", parent_id
-        ).eq("student_id", student_id).execute()
+        ).eq("student_id", student_id))
         
         if existing.data:
             raise HTTPException(
@@ -409,6 +408,7 @@ async def link_student_to_parent(
             "student_id": student_id,
             "relationship": relationship
         })
+        await invalidate_parent_scope(db, parent_id)
         
         logger.info(f"Linked student {student_id} to parent {parent_id}")
         
@@ -436,12 +436,13 @@ async def unlink_student_from_parent(
 ):
     """Unlink a student from a parent (Admin only)"""
     supabase = get_supabase_client()
+    db = SupabaseQueries(supabase)
     
     try:
         # Check if relationship exists
-        existing = supabase.table("parent_student").select("*").eq(
+        existing = await run_query(supabase.table("parent_student").select("*").eq(
             "parent_id", parent_id
-        ).eq("student_id", student_id).execute()
+        ).eq("student_id", student_id))
         
         if not existing.data:
             raise HTTPException(
@@ -450,9 +451,10 @@ async def unlink_student_from_parent(
             )
         
         # Delete relationship
-        supabase.table("parent_student").delete().eq(
+        await run_query(supabase.table("parent_student").delete().eq(
             "parent_id", parent_id
-        ).eq("student_id", student_id).execute()
+        ).eq("student_id", student_id))
+        await invalidate_parent_scope(db, parent_id)
         
         logger.info(f"Unlinked student {student_id} from parent {parent_id}")
         
@@ -489,6 +491,7 @@ async def delete_parent(
             )
         
         # Delete parent (cascade will handle parent_student relationships)
+        await invalidate_parent_scope(db, parent_id)
         await db.delete_by_id("parents", "parent_id", parent_id)
         
         # Also delete user account if exists
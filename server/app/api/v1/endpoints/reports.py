@@ -0,0 +1,127 @@
+"""
+app/api/v1/endpoints/reports.py
+Report card endpoints (PDF per student, ZIP per class or school)
+"""
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from app.models.schemas import TokenPayload, UserRole, Principal
+from app.core.security import require_admin, require_teacher
+from app.core.dependencies import get_principal
+from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.services.report_service import load_report_cards, report_renderer
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+YEAR_PATTERN = r"^\d{4}-\d{2}$"
+
+
+def _zip_response(cards: list, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        report_renderer.stream_zip(cards),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Total-Count": str(len(cards))
+        }
+    )
+
+
+@router.get("/students/{student_id}/report-card")
+async def get_student_report_card(
+    student_id: str,
+    academic_year: Optional[str] = Query(None, pattern=YEAR_PATTERN),
+    principal: Principal = Depends(get_principal)
+):
+    """
+    Report card of one student as a PDF
+    - Students and parents can only download their own / their children's.
+    - Admins/Teachers can download any.
+    """
+    if principal.role in (UserRole.STUDENT, UserRole.PARENT) and student_id not in principal.student_ids:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    db = SupabaseQueries(get_supabase_client())
+
+    try:
+        cards = await load_report_cards(db, student_ids=[student_id], year=academic_year)
+        if not cards:
+            raise HTTPException(status_code=404, detail="Student not found")
+
+        filename, pdf = await report_renderer.render_one(cards[0])
+        return Response(
+            content=pdf,
+            media_type="application/pdf",
+            headers={"Content-Disposition": f'attachment; filename="{filename.rsplit("/", 1)[-1]}"'}
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Report card error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate report card: {str(e)}"
+        )
+
+
+@router.get("/classes/{class_id}/report-cards")
+async def get_class_report_cards(
+    class_id: str,
+    academic_year: Optional[str] = Query(None, pattern=YEAR_PATTERN),
+    current_user: TokenPayload = Depends(require_teacher)
+):
+    """
+    Report cards of every student of a class, as a ZIP of PDFs (Teacher/Admin)
+
+    The archive is streamed while the PDFs are rendered.
+    """
+    db = SupabaseQueries(get_supabase_client())
+
+    try:
+        school_class = await db.select_by_id("classes", "class_id", class_id)
+        if not school_class:
+            raise HTTPException(status_code=404, detail="Class not found")
+
+        cards = await load_report_cards(db, class_ids=[class_id], year=academic_year)
+        name = re.sub(r"[^A-Za-z0-9]+", "_", f"{school_class['class_name']}-{school_class['section']}").strip("_")
+        logger.info(f"Report cards requested for class {class_id}: {len(cards)} students")
+        return _zip_response(cards, f"report_cards_{name}.zip")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Class report cards error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate report cards: {str(e)}"
+        )
+
+
+@router.get("/report-cards")
+async def get_school_report_cards(
+    class_id: Optional[List[str]] = Query(None, description="Classes to include (default: all)"),
+    academic_year: Optional[str] = Query(None, pattern=YEAR_PATTERN),
+    current_user: TokenPayload = Depends(require_admin)
+):
+    """
+    Report cards of the whole school (or several classes) as one ZIP (Admin only)
+
+    One folder per class inside the archive.
+    """
+    db = SupabaseQueries(get_supabase_client())
+
+    try:
+        cards = await load_report_cards(db, class_ids=class_id, year=academic_year)
+        logger.info(f"Report cards requested for {len(cards)} students")
+        return _zip_response(cards, "report_cards.zip")
+
+    except Exception as e:
+        logger.error(f"School report cards error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate report cards: {str(e)}"
+        )
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response, UploadFile, File
 from typing import List, Optional
 from app.models.schemas import (StudentCreate, StudentUpdate, StudentResponse, PaginationParams, TokenPayload, UserRole)
-from app.core.security import get_current_user, require_admin, require_teacher, hash_password
-from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.core.security import get_current_user, require_admin, require_teacher, hash_password_async
+from app.core.dependencies import invalidate_student_scope
+from app.db.supabase import get_supabase_client, SupabaseQueries, run_query
+from app.services.attendance_rollups import rebuild_attendance_rollups
+from app.services.import_service import StudentImporter, iter_csv_rows, iter_xlsx_rows
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,7 +28,7 @@ async def create_student(
 
     try:
          
-        existing = supabase.table("users").select("*").eq("email", student_data.email).execute()
+        existing = await run_query(supabase.table("users").select("*").eq("email", student_data.email))
         if existing.data:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -38,7 +42,7 @@ async def create_student(
                 detail="Date of Birth (DOB) is required to set initial password"
             )
         
-        hashed_password = hash_password(str(student_data.dob.isoformat()))
+        hashed_password = await hash_password_async(str(student_data.dob.isoformat()))
 
         
         user_dict = {
@@ -90,15 +94,63 @@ async def create_student(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create student: {str(e)}"
         )
+
+@router.post("/import")
+async def import_students(
+    file: UploadFile = File(...),
+    batch_size: Optional[int] = Query(None, ge=1, le=1000),
+    current_user: TokenPayload = Depends(require_admin)
+):
+    """
+    Bulk-create students from a CSV or XLSX upload (Admin only)
+    
+    Header row columns: name, dob, email (required), phone, address,
+    guardian_name, and class_id or class_name (+ section). Each row gets a
+    user whose initial password is the DOB, as in create_student. Rows are
+    processed in batches; invalid or duplicate rows are skipped and listed
+    in `errors` with their row number.
+    """
+    filename = (file.filename or "").lower()
+    if filename.endswith(".csv"):
+        rows = iter_csv_rows(file.file)
+    elif filename.endswith(".xlsx"):
+        rows = iter_xlsx_rows(file.file)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload a .csv or .xlsx file"
+        )
+    
+    db = SupabaseQueries(get_supabase_client())
+    
+    try:
+        return await StudentImporter(db, batch_size).run(rows)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Import students error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to import students: {str(e)}"
+        )
+
 # # //////////////////////
 @router.get("/", response_model=List[StudentResponse])
 async def get_students(
+    response: Response,
     class_id: Optional[str] = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: TokenPayload = Depends(get_current_user)
 ):
+    """
+    Get list of students
     
+    Pass the `X-Next-Cursor` response header back as `cursor` to fetch the
+    next page at constant cost (no total count is computed in that mode).
+    """
     supabase = get_supabase_client()
     db = SupabaseQueries(supabase)
     
@@ -122,21 +174,35 @@ async def get_students(
             filters["class_id"] = class_id
         
       
-        result = await db.paginate("students", page, page_size, filters, "name")
+        result = await db.paginate(
+            "students", page, page_size, filters, "name",
+            key_column="student_id",
+            cursor=cursor,
+            count=None if cursor else "exact"
+        )
+        if result["next_cursor"]:
+            response.headers["X-Next-Cursor"] = result["next_cursor"]
+        if result["count"] is not None:
+            response.headers["X-Total-Count"] = str(result["count"])
+        
+        # Enrich with class names (one batched lookup for the whole page)
+        classes = await asyncio.gather(*(
+            db.load_by_id("classes", "class_id", student.get("class_id"))
+            for student in result["data"]
+        ))
         
-        # Enrich with class names
         students = []
-        for student in result["data"]:
+        for student, class_data in zip(result["data"], classes):
             class_name = None
-            if student.get("class_id"):
-                class_data = await db.select_by_id("classes", "class_id", student["class_id"])
-                if class_data:
-                    class_name = f"{class_data['class_name']} - {class_data['section']}"
+            if class_data:
+                class_name = f"{class_data['class_name']} - {class_data['section']}"
             
             students.append(StudentResponse(**student, class_name=class_name))
         
         return students
         
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Get students error: {e}")
         raise HTTPException(
@@ -226,6 +292,12 @@ async def update_student(
             student_id,
             update_data
         )
+        # Class changes alter what the student and their parents can see,
+        # and move the student's attendance to the new class's rollups
+        if "class_id" in update_data:
+            await invalidate_student_scope(db, student_id)
+            if update_data["class_id"] != existing.get("class_id"):
+                await rebuild_attendance_rollups(db, [existing.get("class_id"), update_data["class_id"]])
         
         # Get class name
         class_name = None
@@ -267,7 +339,11 @@ async def delete_student(
                 detail="Student not found"
             )
         
+        await invalidate_student_scope(db, student_id)
         await db.delete_by_id("students", "student_id", student_id)
+        if existing.get("class_id"):
+            # Drop the student's attendance from the class rollups
+            await rebuild_attendance_rollups(db, [existing["class_id"]])
         
         logger.info(f"Student deleted: {student_id}")
         
@@ -311,7 +387,7 @@ async def get_student_attendance(
         if end_date:
             query = query.lte("date", end_date)
         
-        response = query.order("date", desc=True).execute()
+        response = await run_query(query.order("date", desc=True))
         
         # Calculate statistics
         total = len(response.data)
@@ -368,7 +444,7 @@ async def get_student_marks(
         if exam_id:
             query = query.eq("exam_id", exam_id)
         
-        response = query.execute()
+        response = await run_query(query)
         
         # Calculate overall performance
         marks_data = response.data
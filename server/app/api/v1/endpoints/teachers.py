@@ -8,7 +8,8 @@ from app.models.schemas import (
     TeacherCreate, TeacherUpdate, TeacherResponse, TokenPayload
 )
 from app.core.security import require_admin, get_current_user, require_teacher
-from app.db.supabase import get_supabase_client, SupabaseQueries
+from app.db.supabase import get_supabase_client, SupabaseQueries, run_query
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -81,14 +82,15 @@ async def get_teachers(
         
         result = await db.paginate("teachers", page, page_size, filters, "name")
         
+        # Subject names are resolved with one batched lookup for the whole page
+        subjects = await asyncio.gather(*(
+            db.load_by_id("subjects", "subject_id", teacher.get("subject_id"))
+            for teacher in result["data"]
+        ))
+        
         teachers = []
-        for teacher in result["data"]:
-            subject_name = None
-            if teacher.get("subject_id"):
-                subject = await db.select_by_id("subjects", "subject_id", teacher["subject_id"])
-                if subject:
-                    subject_name = subject.get("subject_name")
-            
+        for teacher, subject in zip(result["data"], subjects):
+            subject_name = subject.get("subject_name") if subject else None
             teachers.append(TeacherResponse(**teacher, subject_name=subject_name))
         
         return teachers
@@ -244,7 +246,7 @@ async def get_teacher_classes(
             )
         
         # Get classes where teacher is class teacher
-        response = supabase.table("classes").select("*").eq("teacher_id", teacher_id).execute()
+        response = await run_query(supabase.table("classes").select("*").eq("teacher_id", teacher_id))
         
         return {
             "teacher_id": teacher_id,
@@ -288,7 +290,7 @@ async def get_teacher_schedule(
         if day:
             query = query.eq("day", day)
         
-        response = query.order("day").order("period_number").execute()
+        response = await run_query(query.order("day").order("period_number"))
         
         # Group by day
         schedule = {}
@@ -339,7 +341,7 @@ async def get_teacher_homework(
         if class_id:
             query = query.eq("class_id", class_id)
         
-        response = query.order("due_date", desc=True).execute()
+        response = await run_query(query.order("due_date", desc=True))
         
         return {
             "teacher_id": teacher_id,
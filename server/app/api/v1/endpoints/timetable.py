@@ -113,6 +113,7 @@ from app.models.schemas import (
 )
 from app.core.security import require_admin, get_current_user
 from app.db.supabase import get_supabase_client, SupabaseQueries
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -125,17 +126,17 @@ async def _enrich_timetable_response(entry: dict, db: SupabaseQueries) -> dict:
     class_name, subject_name, teacher_name = None, None, None
     
     if entry.get("class_id"):
-        cls = await db.select_by_id("classes", "class_id", entry["class_id"])
+        cls = await db.load_by_id("classes", "class_id", entry["class_id"])
         if cls:
             class_name = f"{cls.get('class_name', '')} - {cls.get('section', '')}"
             
     if entry.get("subject_id"):
-        subject = await db.select_by_id("subjects", "subject_id", entry["subject_id"])
+        subject = await db.load_by_id("subjects", "subject_id", entry["subject_id"])
         if subject:
             subject_name = subject.get("subject_name")
 
     if entry.get("teacher_id"):
-        teacher = await db.select_by_id("teachers", "teacher_id", entry["teacher_id"])
+        teacher = await db.load_by_id("teachers", "teacher_id", entry["teacher_id"])
         if teacher:
             teacher_name = teacher.get("name")
             
@@ -233,11 +234,12 @@ async def get_timetable_entries(
         
         entries = await db.select_all("timetable", filters=filters, order_by="period_number")
         
-        # Enrich all entries
-        response_list = []
-        for entry in entries:
-            enriched_data = await _enrich_timetable_response(entry, db)
-            response_list.append(TimetableResponse(**entry, **enriched_data))
+        # Enrich all entries (lookups are batched per table)
+        enriched = await asyncio.gather(*(_enrich_timetable_response(entry, db) for entry in entries))
+        response_list = [
+            TimetableResponse(**entry, **enriched_data)
+            for entry, enriched_data in zip(entries, enriched)
+        ]
             
         return response_list
         
@@ -20,12 +20,63 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000  # verified tokens kept per worker; 0 disables the cache
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0  # resolved student/teacher/parent profiles per user
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    SCOPE_VERSION_CACHE_TTL_SECONDS: float = 15.0  # how long other workers may accept tokens with outdated scope claims
+    PASSWORD_HASH_WORKERS: int = 2  # bcrypt processes per worker; 0 hashes inline on the event loop
+    PASSWORD_HASH_MAX_QUEUE: int = 32  # jobs waiting for a process before returning 503
+    PASSWORD_HASH_RETRY_AFTER: int = 1  # seconds, Retry-After of that 503
+    PASSWORD_HASH_BATCH_JOB_SIZE: int = 4  # hashes per pool job of a bulk batch (imports), so logins interleave
+    LOGIN_IP_RATE_PER_MINUTE: float = 30.0  # login / change-password attempts per client IP
+    LOGIN_IP_BURST: int = 30
+    LOGIN_ACCOUNT_RATE_PER_MINUTE: float = 5.0  # attempts per email / user
+    LOGIN_ACCOUNT_BURST: int = 10
+    LOGIN_MAX_CONCURRENT_VERIFICATIONS: int = 16  # password checks in flight per worker before 429; 0 = unlimited
+    RATE_LIMIT_MAX_KEYS: int = 100000  # buckets kept per limiter
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False  # use X-Forwarded-For (only behind a trusted proxy)
     
     # Supabase
     SUPABASE_URL: str
     SUPABASE_KEY: str  # anon/public key
     SUPABASE_SERVICE_KEY: str  # service_role key for admin operations
-    
+
+    # Database backend: "supabase", or "local" for the in-memory stand-in
+    # used by tests, load tests and benchmarks (no network, no Supabase project)
+    DATABASE_BACKEND: str = "supabase"
+    LOCAL_DB_SEED_FILE: str = ""  # JSON file of {"table": [rows]} loaded on first use
+    LOCAL_DB_LATENCY_MS: float = 0.0  # simulated round trip per local query
+    LOCAL_DB_MAX_ROWS: int = 0  # rows per local response, like PostgREST max-rows (0 = unlimited)
+
+    # Database execution
+    DB_MAX_CONCURRENCY: int = 100  # max PostgREST requests in flight per worker
+    DB_N_PLUS_ONE_THRESHOLD: int = 10  # warn when one request queries a table more often
+    DB_MAX_ROWS: int = 1000  # PostgREST max-rows; reads that can exceed it are keyset-paged (must not be larger)
+    IN_FILTER_CHUNK_SIZE: int = 200  # max values per in_() filter (~8 KB of UUIDs in the URL)
+    STUDENT_IMPORT_BATCH_SIZE: int = 200  # rows validated, checked and inserted together by /students/import
+    ACADEMIC_YEAR_START_MONTH: int = 6  # attendance rollups: dates from June 2026 belong to "2026-27"
+    ATTENDANCE_INDEX_TTL_SECONDS: float = 300.0  # in-memory attendance index rebuilt after this (picks up other workers' writes)
+    ATTENDANCE_INDEX_MAX_YEARS: int = 2  # academic years kept in memory per worker
+    EXAM_ANALYTICS_CACHE_TTL_SECONDS: float = 600.0  # /exams/{id}/analytics results per exam
+    EXAM_ANALYTICS_CACHE_MAX_ENTRIES: int = 1000
+    EXAM_PASS_PERCENTAGE: float = 35.0  # pass mark as a share of max_marks
+    REPORT_RENDER_WORKERS: int = 2  # report card PDF processes per worker; 0 renders on a thread
+    REPORT_RENDER_CHUNK_SIZE: int = 20  # report cards per rendering job
+
+    # Supabase HTTP connection pool (per worker)
+    SUPABASE_POOL_MAX_CONNECTIONS: int = 100  # keep >= DB_MAX_CONCURRENCY
+    SUPABASE_POOL_MAX_KEEPALIVE: int = 20
+    SUPABASE_KEEPALIVE_EXPIRY: float = 30.0  # seconds an idle connection is kept
+    SUPABASE_CONNECT_TIMEOUT: float = 5.0
+    SUPABASE_READ_TIMEOUT: float = 30.0
+    SUPABASE_POOL_TIMEOUT: float = 10.0  # max wait for a free connection
+    SUPABASE_HTTP2: bool = False  # requires the h2 package (pip install httpx[http2])
+    SUPABASE_CONNECT_RETRIES: int = 2
+
+    # Reference data cache (classes, subjects, teachers)
+    REFERENCE_CACHE_TTL_SECONDS: float = 300.0
+    REFERENCE_CACHE_MAX_ENTRIES: int = 5000  # per table
+
     # Email (SendGrid)
     SENDGRID_API_KEY: str = ""
     FROM_EMAIL: str = "noreply@schoolmanagement.com"
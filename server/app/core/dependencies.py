@@ -1,6 +1,13 @@
 from fastapi import Depends, HTTPException, status
+from app.core.config import settings
 from app.core.security import get_current_user # You'll need to implement this
-from app.models.schemas import TokenPayload, UserRole
+from app.db.cache import TTLCache
+from app.db.supabase import get_supabase_client, SupabaseQueries, run_query
+from app.models.schemas import TokenPayload, UserRole, Principal
+from typing import Optional, Dict, Any, Iterable
+import logging
+
+logger = logging.getLogger(__name__)
 
 def get_admin_user(current_user: TokenPayload = Depends(get_current_user)):
     """
@@ -11,4 +18,235 @@ def get_admin_user(current_user: TokenPayload = Depends(get_current_user)):
             status_code=status.HTTP_403_FORBIDDEN,
             detail="The user does not have administrative privileges"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+# ============================================
+# PRINCIPAL RESOLUTION
+# ============================================
+
+# Resolved principals per user_id, shared across requests of this worker.
+# Writes that change a principal invalidate it here (see the invalidate_*
+# helpers); other workers pick the change up after the TTL.
+principal_cache = TTLCache(settings.PRINCIPAL_CACHE_MAX_ENTRIES, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+async def resolve_principal(user_id: str, role: UserRole, db: SupabaseQueries) -> Principal:
+    """
+    Look up a user's profile rows
+
+    Args:
+        user_id: User ID (token subject)
+        role: User role
+        db: Query helper
+
+    Returns:
+        Principal: IDs of the user's student/teacher/parent profile, the
+                   children linked to a parent and the classes involved
+    """
+    principal = Principal(user_id=user_id, role=role)
+
+    if role == UserRole.STUDENT:
+        student = await db.select_one("students", {"user_id": user_id}, columns="student_id, class_id")
+        if student:
+            principal.student_id = student["student_id"]
+            principal.class_ids = [student["class_id"]] if student.get("class_id") else []
+
+    elif role == UserRole.PARENT:
+        parent = await db.select_one("parents", {"user_id": user_id}, columns="parent_id")
+        if parent:
+            principal.parent_id = parent["parent_id"]
+            links = await db.select_all("parent_student", {"parent_id": parent["parent_id"]}, columns="student_id")
+            principal.child_ids = [link["student_id"] for link in links]
+            children = await db.select_in("students", "student_id", principal.child_ids, columns="class_id")
+            principal.class_ids = list(dict.fromkeys(c["class_id"] for c in children if c.get("class_id")))
+
+    elif role in (UserRole.TEACHER, UserRole.ADMIN):
+        # Admins may also hold a teacher profile
+        teacher = await db.select_one("teachers", {"user_id": user_id}, columns="teacher_id")
+        if teacher:
+            principal.teacher_id = teacher["teacher_id"]
+
+    return principal
+
+
+async def get_principal(current_user: TokenPayload = Depends(get_current_user)) -> Principal:
+    """
+    Dependency returning the caller's resolved Principal
+
+    Access tokens minted by login/refresh carry the scope as claims; those
+    are trusted as long as their scope version is current, so no profile
+    lookups are needed. Older tokens fall back to resolving (and caching)
+    the profile rows.
+    """
+    db = SupabaseQueries(get_supabase_client())
+
+    try:
+        if current_user.scope_version is not None:
+            version = await current_scope_version(current_user.sub, db)
+            if version is None or current_user.scope_version < version:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Token scope is out of date, please refresh",
+                    headers={"WWW-Authenticate": 'Bearer error="invalid_token"'}
+                )
+            return principal_from_token(current_user)
+
+        cached = principal_cache.get(current_user.sub)
+        if cached is not None and cached["role"] == current_user.role:
+            return Principal(**cached)
+
+        principal = await resolve_principal(current_user.sub, current_user.role, db)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Resolve principal error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to resolve user profile"
+        )
+    principal_cache.set(current_user.sub, principal.model_dump())
+    return principal
+
+
+# ============================================
+# SCOPE CLAIMS
+# ============================================
+
+# users.scope_version per user_id. Bumped (here and in the database) when a
+# user's scope changes; other workers see the bump after the TTL.
+scope_version_cache = TTLCache(settings.PRINCIPAL_CACHE_MAX_ENTRIES, settings.SCOPE_VERSION_CACHE_TTL_SECONDS)
+
+
+def scope_claims(principal: Principal, scope_version: int) -> Dict[str, Any]:
+    """
+    Compact JWT claims describing what a principal may access
+
+    Args:
+        principal: Resolved principal
+        scope_version: The user's current users.scope_version
+
+    Returns:
+        dict: "sv" plus the non-empty profile/child/class IDs
+    """
+    claims: Dict[str, Any] = {"sv": scope_version}
+    for key in ("student_id", "teacher_id", "parent_id", "child_ids", "class_ids"):
+        value = getattr(principal, key)
+        if value:
+            claims[key] = value
+    return claims
+
+
+def principal_from_token(current_user: TokenPayload) -> Principal:
+    """Build a Principal from the scope claims of a verified token"""
+    return Principal(
+        user_id=current_user.sub,
+        role=current_user.role,
+        student_id=current_user.student_id,
+        teacher_id=current_user.teacher_id,
+        parent_id=current_user.parent_id,
+        child_ids=current_user.child_ids,
+        class_ids=current_user.class_ids
+    )
+
+
+async def build_token_claims(user: Dict[str, Any], db: SupabaseQueries) -> Dict[str, Any]:
+    """
+    Claims for a new access token: subject, role and freshly resolved scope
+
+    Args:
+        user: Row from the users table
+        db: Query helper
+
+    Returns:
+        dict: Data for create_access_token
+    """
+    # Read before resolving: a concurrent bump then makes the token stale
+    # rather than letting an outdated scope through
+    scope_version = user.get("scope_version") or 0
+    role = UserRole(user["role"])
+    principal = await resolve_principal(user["user_id"], role, db)
+
+    principal_cache.set(user["user_id"], principal.model_dump())
+    return {"sub": user["user_id"], "role": role.value, **scope_claims(principal, scope_version)}
+
+
+async def current_scope_version(user_id: str, db: SupabaseQueries) -> Optional[int]:
+    """
+    The user's current scope version (cached)
+
+    Args:
+        user_id: User ID
+        db: Query helper
+
+    Returns:
+        int: users.scope_version (0 when unset), None if the user is gone
+    """
+    cached = scope_version_cache.get(user_id)
+    if cached is not None:
+        return cached["scope_version"]
+
+    user = await db.select_by_id("users", "user_id", user_id, columns="scope_version")
+    version = (user.get("scope_version") or 0) if user else None
+    scope_version_cache.set(user_id, {"scope_version": version})
+    return version
+
+
+async def bump_scope_versions(db: SupabaseQueries, user_ids: Iterable[Optional[str]]):
+    """
+    Invalidate the scope of users whose links or classes changed
+
+    Increments users.scope_version (rpc/bump_scope_version), so access
+    tokens minted earlier are rejected and have to be refreshed.
+
+    Args:
+        db: Query helper
+        user_ids: Affected users (None entries are skipped)
+    """
+    ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id]
+    if not ids:
+        return
+
+    response = await run_query(db.raw_query().rpc("bump_scope_version", {"p_user_ids": ids}))
+    for row in response.data or []:
+        scope_version_cache.set(row["user_id"], {"scope_version": row["scope_version"]})
+    for user_id in ids:
+        principal_cache.delete(user_id)
+
+
+# ============================================
+# INVALIDATION
+# ============================================
+
+async def invalidate_parent_scope(db: SupabaseQueries, parent_id: str):
+    """
+    Invalidate a parent's scope (after link/unlink or deletion)
+
+    Args:
+        db: Query helper
+        parent_id: Parent whose children changed
+    """
+    parent = await db.select_by_id("parents", "parent_id", parent_id, columns="user_id")
+    await bump_scope_versions(db, [(parent or {}).get("user_id")])
+    principal_cache.delete_matching(lambda p: p.get("parent_id") == parent_id)
+
+
+async def invalidate_student_scope(db: SupabaseQueries, student_id: str):
+    """
+    Invalidate the scope of a student and of every parent linked to them
+    (after class changes or deletion; call before deleting the rows)
+
+    Args:
+        db: Query helper
+        student_id: Student whose class or links changed
+    """
+    student = await db.select_by_id("students", "student_id", student_id, columns="user_id")
+    links = await db.select_all("parent_student", {"student_id": student_id}, columns="parent_id")
+    parents = await db.select_in("parents", "parent_id", [link["parent_id"] for link in links], columns="user_id")
+
+    await bump_scope_versions(db, [(student or {}).get("user_id")] + [p.get("user_id") for p in parents])
+    dropped = principal_cache.delete_matching(
+        lambda p: p.get("student_id") == student_id or student_id in p.get("child_ids", [])
+    )
+    if dropped:
+        logger.info(f"Invalidated {dropped} cached principals for student {student_id}")
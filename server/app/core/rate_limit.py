@@ -0,0 +1,253 @@
+"""
+app/core/rate_limit.py
+In-process rate limiting for CPU-heavy authentication endpoints
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, Tuple, AsyncIterator
+from fastapi import HTTPException, Request, status
+from app.core.config import settings
+import math
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# TOKEN BUCKETS
+# ============================================
+
+class RateLimitBackend(ABC):
+    """
+    Storage for per-key rate limits
+
+    Subclass and pass an instance to LoginThrottle to share limits between
+    workers (e.g. a Redis-backed bucket); the default keeps them in process.
+    """
+
+    @abstractmethod
+    def acquire(self, key: str) -> float:
+        """
+        Take one token for `key`
+
+        Args:
+            key: Bucket key, e.g. "login:ip:10.0.0.7"
+
+        Returns:
+            float: 0 if allowed, otherwise seconds until a token is available
+        """
+
+    @abstractmethod
+    def reset(self):
+        """Forget every bucket"""
+
+
+class TokenBucketLimiter(RateLimitBackend):
+    """
+    Token buckets kept in memory, one per key
+
+    Each bucket holds up to `burst` tokens and refills at `rate_per_minute`.
+    Only the `max_keys` most recently used buckets are kept; an evicted key
+    simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = 100000):
+        """
+        Initialize TokenBucketLimiter
+
+        Args:
+            rate_per_minute: Sustained requests per minute per key
+            burst: Bucket size (requests allowed back to back)
+            max_keys: Maximum number of buckets kept
+        """
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                retry_after = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                retry_after = (1 - tokens) / self.rate if self.rate > 0 else 60.0
+
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# ============================================
+# CONCURRENCY LIMIT
+# ============================================
+
+class ConcurrencyLimiter:
+    """Non-blocking cap on simultaneous operations (0 = unlimited)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._active = 0
+        self._peak = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.limit > 0 and self._active >= self.limit:
+                return False
+            self._active += 1
+            self._peak = max(self._peak, self._active)
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"limit": self.limit, "active": self._active, "peak": self._peak}
+
+
+# ============================================
+# LOGIN THROTTLE
+# ============================================
+
+def client_ip(request: Request) -> str:
+    """
+    Address of the calling client
+
+    Uses the first X-Forwarded-For hop when RATE_LIMIT_TRUST_FORWARDED_FOR
+    is set (only behind a proxy that overwrites the header).
+    """
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class LoginThrottle:
+    """
+    Sheds password-checking requests before any bcrypt work starts
+
+    Requests are checked against a bucket per client IP and one per account
+    (email or user ID), then must take one of a fixed number of password
+    verification slots. Rejections are 429 with Retry-After and are counted
+    per reason.
+    """
+
+    def __init__(
+        self,
+        per_ip: RateLimitBackend,
+        per_account: RateLimitBackend,
+        max_concurrent: int
+    ):
+        """
+        Initialize LoginThrottle
+
+        Args:
+            per_ip: Buckets keyed by client IP
+            per_account: Buckets keyed by email / user ID
+            max_concurrent: Password verifications allowed at once (0 = unlimited)
+        """
+        self.per_ip = per_ip
+        self.per_account = per_account
+        self.verifications = ConcurrencyLimiter(max_concurrent)
+        self._lock = threading.Lock()
+        self._allowed: Dict[str, int] = {}
+        self._shed: Dict[str, Dict[str, int]] = {}
+
+    def _reject(self, action: str, reason: str, retry_after: float):
+        with self._lock:
+            counters = self._shed.setdefault(action, {"ip": 0, "account": 0, "concurrency": 0})
+            counters[reason] += 1
+        logger.warning(f"Throttled {action} request ({reason} limit)")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please retry later",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    def check(self, action: str, request: Request, account: Optional[str] = None):
+        """
+        Charge one attempt to the caller's IP and account buckets
+
+        Args:
+            action: Endpoint label, e.g. "login"
+            request: Incoming request (for the client IP)
+            account: Email or user ID the attempt is for
+
+        Raises:
+            HTTPException: 429 when either bucket is empty
+        """
+        retry_after = self.per_ip.acquire(f"{action}:ip:{client_ip(request)}")
+        if retry_after:
+            self._reject(action, "ip", retry_after)
+        if account:
+            retry_after = self.per_account.acquire(f"{action}:account:{account.strip().lower()}")
+            if retry_after:
+                self._reject(action, "account", retry_after)
+
+    @asynccontextmanager
+    async def verification_slot(self, action: str) -> AsyncIterator[None]:
+        """
+        Hold one of the password verification slots
+
+        Raises:
+            HTTPException: 429 when all slots are taken
+
+        Example:
+            >>> async with login_throttle.verification_slot("login"):
+            ...     ok = await verify_password_async(password, password_hash)
+        """
+        if not self.verifications.try_acquire():
+            self._reject(action, "concurrency", settings.PASSWORD_HASH_RETRY_AFTER)
+        try:
+            with self._lock:
+                self._allowed[action] = self._allowed.get(action, 0) + 1
+            yield
+        finally:
+            self.verifications.release()
+
+    def reset(self):
+        """Forget all buckets and counters"""
+        self.per_ip.reset()
+        self.per_account.reset()
+        with self._lock:
+            self._allowed.clear()
+            self._shed.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Throttle counters
+
+        Returns:
+            dict: Verifications let through and requests shed per action
+                  and reason, plus current/peak concurrent verifications
+        """
+        with self._lock:
+            return {
+                "verifications": dict(self._allowed),
+                "shed": {action: dict(counters) for action, counters in self._shed.items()},
+                "concurrency": self.verifications.stats()
+            }
+
+
+login_throttle = LoginThrottle(
+    per_ip=TokenBucketLimiter(settings.LOGIN_IP_RATE_PER_MINUTE, settings.LOGIN_IP_BURST, settings.RATE_LIMIT_MAX_KEYS),
+    per_account=TokenBucketLimiter(settings.LOGIN_ACCOUNT_RATE_PER_MINUTE, settings.LOGIN_ACCOUNT_BURST, settings.RATE_LIMIT_MAX_KEYS),
+    max_concurrent=settings.LOGIN_MAX_CONCURRENT_VERIFICATIONS
+)
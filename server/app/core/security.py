@@ -2,14 +2,21 @@
 app/core/security.py
 Authentication and security utilities
 """
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Dict, Any, Callable, Tuple, List
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.config import settings
 from app.models.schemas import UserRole, TokenPayload
+import asyncio
+import hashlib
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,6 +33,155 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash several passwords (one pool job for a small chunk)"""
+    return [pwd_context.hash(p) for p in passwords]
+
+# ============================================
+# PASSWORD HASHING EXECUTOR
+# ============================================
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated process pool
+
+    A bcrypt hash/verify costs ~200 ms of CPU; run inline it stalls every
+    other request on the worker. Jobs go to `max_workers` processes instead.
+    At most `max_workers + max_queue` jobs are accepted at once; beyond that
+    callers get 503 with Retry-After rather than an ever-growing queue.
+    With max_workers=0 hashing runs inline on the event loop (the old
+    behaviour, kept for benchmarks and debugging).
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        """
+        Initialize PasswordHasher
+
+        Args:
+            max_workers: Hashing processes (0 = hash inline)
+            max_queue: Jobs allowed to wait for a free process
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.max_workers <= 0:
+            return fn(*args)
+
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication service is busy, please retry",
+                    headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER)}
+                )
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        pool = self._get_pool()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool next time
+            logger.error("Password hashing pool broken, recreating")
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            pool.shutdown(wait=False)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """
+        Hash a batch of passwords a few at a time
+
+        The batch is split into jobs of PASSWORD_HASH_BATCH_JOB_SIZE hashes
+        and at most `max_workers` of them are submitted at once. The pool
+        runs jobs in arrival order, so a login arriving mid-batch waits for
+        one short job to finish, not for the rest of the batch.
+
+        Args:
+            passwords: Plain-text passwords
+
+        Returns:
+            list: Hashes in input order
+        """
+        if not passwords:
+            return []
+        size = max(1, settings.PASSWORD_HASH_BATCH_JOB_SIZE)
+        chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+        slots = asyncio.Semaphore(max(1, self.max_workers))
+
+        async def run(chunk: List[str]) -> List[str]:
+            async with slots:
+                return await self._run(hash_passwords, chunk)
+
+        results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        return [hashed for chunk in results for hashed in chunk]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hashing pool statistics
+
+        Returns:
+            dict: Capacity, in-flight/queued jobs and rejections
+        """
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queued": max(self._in_flight - self.max_workers, 0),
+                "peak_in_flight": self._peak_in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected
+            }
+
+    def shutdown(self):
+        """Stop the hashing processes (called on application shutdown)"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await password_hasher.hash(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop"""
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def hash_passwords_async(passwords: List[str]) -> List[str]:
+    """Hash a batch of passwords in small jobs without blocking the event loop"""
+    return await password_hasher.hash_many(passwords)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -47,8 +203,92 @@ def create_refresh_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+# ============================================
+# VERIFIED TOKEN CACHE
+# ============================================
+
+class TokenCache:
+    """
+    Bounded LRU of already verified tokens
+
+    Keyed by the SHA-256 of the token (the raw token is never stored), each
+    entry lives until the token's own `exp`. Only successfully verified
+    tokens are cached, so invalid or expired tokens still fail with 401.
+    """
+
+    def __init__(self, maxsize: int):
+        """
+        Initialize TokenCache
+
+        Args:
+            maxsize: Maximum cached tokens (0 disables the cache)
+        """
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[float, TokenPayload]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[TokenPayload]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, expires_at: float, payload: TokenPayload):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (expires_at, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache statistics
+
+        Returns:
+            dict: Entries, hits/misses/evictions and hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_MAX_ENTRIES)
+
+
 def verify_token(token: str) -> TokenPayload:
-    """Verify and decode JWT token"""
+    """Verify and decode JWT token (cached until the token expires)"""
+    cache_key = TokenCache.key(token)
+    cached = token_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
@@ -60,11 +300,19 @@ def verify_token(token: str) -> TokenPayload:
                 detail="Invalid token payload"
             )
         
-        return TokenPayload(
+        token_payload = TokenPayload(
             sub=user_id,
             role=UserRole(role),
-            exp=datetime.fromtimestamp(payload.get("exp"))
+            exp=datetime.fromtimestamp(payload.get("exp")),
+            scope_version=payload.get("sv"),
+            student_id=payload.get("student_id"),
+            teacher_id=payload.get("teacher_id"),
+            parent_id=payload.get("parent_id"),
+            child_ids=payload.get("child_ids", []),
+            class_ids=payload.get("class_ids", [])
         )
+        token_cache.set(cache_key, payload["exp"], token_payload)
+        return token_payload
     except JWTError as e:
         logger.error(f"JWT verification failed: {e}")
         raise HTTPException(
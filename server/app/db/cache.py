@@ -0,0 +1,189 @@
+"""
+app/db/cache.py
+In-process cache for small, rarely-changing reference tables
+"""
+from collections import OrderedDict
+from typing import Optional, Dict, List, Any, Tuple, Callable
+from app.core.config import settings
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cached tables and their primary key column
+REFERENCE_TABLES: Dict[str, str] = {
+    "classes": "class_id",
+    "subjects": "subject_id",
+    "teachers": "teacher_id",
+}
+
+# ============================================
+# TTL / LRU CACHE
+# ============================================
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a fixed TTL
+
+    Values are copied on the way in and out, so callers can mutate the
+    dictionaries they receive without corrupting the cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        Initialize TTLCache
+
+        Args:
+            maxsize: Maximum number of entries (least recently used evicted)
+            ttl: Seconds an entry stays valid
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def set(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, dict(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_matching(self, predicate: Callable[[Dict[str, Any]], bool]) -> int:
+        """
+        Drop every entry whose value satisfies the predicate
+
+        Args:
+            predicate: Called with each cached value
+
+        Returns:
+            int: Number of entries dropped
+        """
+        with self._lock:
+            doomed = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in doomed:
+                del self._data[key]
+            return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# ============================================
+# REFERENCE DATA CACHE
+# ============================================
+
+class ReferenceCache:
+    """
+    Per-table TTL caches for classes, subjects and teachers
+
+    Writes made through SupabaseQueries update the cache of the current
+    worker immediately (write-through). Other workers pick the change up
+    once the TTL expires, so keep REFERENCE_CACHE_TTL_SECONDS short enough
+    for that window to be acceptable.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        Initialize ReferenceCache
+
+        Args:
+            maxsize: Maximum cached rows per table
+            ttl: Seconds a cached row stays valid
+        """
+        self._tables = {table: TTLCache(maxsize, ttl) for table in REFERENCE_TABLES}
+
+    @staticmethod
+    def handles(table: str, id_column: Optional[str] = None) -> bool:
+        """
+        Whether lookups on this table/column are served from the cache
+
+        Args:
+            table: Table name
+            id_column: Column being looked up (must be the primary key)
+
+        Returns:
+            bool: True for primary-key lookups on a reference table
+        """
+        pk = REFERENCE_TABLES.get(table)
+        return pk is not None and (id_column is None or id_column == pk)
+
+    def get(self, table: str, id_value: Any) -> Optional[Dict[str, Any]]:
+        return self._tables[table].get(str(id_value))
+
+    def put(self, table: str, row: Optional[Dict[str, Any]]):
+        pk = REFERENCE_TABLES[table]
+        if row and row.get(pk) is not None:
+            self._tables[table].set(str(row[pk]), row)
+
+    def put_many(self, table: str, rows: List[Dict[str, Any]]):
+        for row in rows:
+            self.put(table, row)
+
+    def invalidate(self, table: str, id_value: Any = None):
+        """
+        Drop one row, or the whole table when no ID is given
+
+        Args:
+            table: Table name
+            id_value: Primary key of the row to drop
+        """
+        if id_value is None:
+            self._tables[table].clear()
+            logger.info(f"Reference cache cleared for {table}")
+        else:
+            self._tables[table].delete(str(id_value))
+
+    def clear(self):
+        for cache in self._tables.values():
+            cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache statistics per table
+
+        Returns:
+            dict: Mapping of table name to entries/hits/misses/hit rate
+        """
+        return {table: cache.stats() for table, cache in self._tables.items()}
+
+
+reference_cache = ReferenceCache(
+    settings.REFERENCE_CACHE_MAX_ENTRIES,
+    settings.REFERENCE_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,203 @@
+"""
+app/db/instrumentation.py
+Per-request database query instrumentation and N+1 detection
+"""
+from contextvars import ContextVar
+from typing import Optional, Dict, Any
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# PER-REQUEST STATISTICS
+# ============================================
+
+class RequestDBStats:
+    """
+    Database activity of a single HTTP request, broken down per table
+
+    Recorded from the event loop (query count, latency, rows) and from the
+    query executor threads (payload bytes), hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tables: Dict[str, Dict[str, float]] = {}
+
+    def _table(self, table: str) -> Dict[str, float]:
+        entry = self.tables.get(table)
+        if entry is None:
+            entry = self.tables[table] = {"queries": 0, "ms": 0.0, "rows": 0, "bytes": 0}
+        return entry
+
+    def record_query(self, table: str, elapsed: float, rows: int):
+        with self._lock:
+            entry = self._table(table)
+            entry["queries"] += 1
+            entry["ms"] += elapsed * 1000
+            entry["rows"] += rows
+
+    def record_bytes(self, table: str, nbytes: int):
+        with self._lock:
+            self._table(table)["bytes"] += nbytes
+
+    @property
+    def queries(self) -> int:
+        return sum(int(t["queries"]) for t in self.tables.values())
+
+    @property
+    def duration_ms(self) -> float:
+        return sum(t["ms"] for t in self.tables.values())
+
+    @property
+    def rows(self) -> int:
+        return sum(int(t["rows"]) for t in self.tables.values())
+
+    @property
+    def bytes(self) -> int:
+        return sum(int(t["bytes"]) for t in self.tables.values())
+
+    def server_timing(self) -> str:
+        """
+        Format as a Server-Timing header value
+
+        Returns:
+            str: e.g. 'db;dur=12.5;desc="4 queries", db-students;dur=8.1'
+        """
+        with self._lock:
+            parts = [f'db;dur={self.duration_ms:.1f};desc="{self.queries} queries"']
+            for table, entry in sorted(self.tables.items()):
+                name = "db-" + "".join(c if c.isalnum() or c in "-_" else "-" for c in table)
+                parts.append(f"{name};dur={entry['ms']:.1f}")
+            return ", ".join(parts)
+
+
+_current_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("db_request_stats", default=None)
+
+
+def start_request_stats() -> RequestDBStats:
+    """
+    Start collecting database statistics for the current request
+
+    Tasks and executor threads spawned from this context share the object.
+
+    Returns:
+        RequestDBStats: The collector bound to the current context
+    """
+    stats = RequestDBStats()
+    _current_stats.set(stats)
+    return stats
+
+
+def current_request_stats() -> Optional[RequestDBStats]:
+    """Statistics collector of the current request, if any"""
+    return _current_stats.get()
+
+
+def table_from_path(path: str) -> str:
+    """
+    Derive a table label from a PostgREST path
+
+    Args:
+        path: Builder path ("/students") or URL path ("/rest/v1/students")
+
+    Returns:
+        str: "students", or "rpc/<function>" for RPC calls
+    """
+    if "/rest/v1/" in path:
+        path = path.split("/rest/v1/", 1)[1]
+    return path.strip("/") or "unknown"
+
+
+def record_query(table: str, elapsed: float, rows: int):
+    """Record one query against the current request (no-op outside requests)"""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record_query(table, elapsed, rows)
+
+
+def record_bytes(table: str, nbytes: int):
+    """Record response payload bytes against the current request"""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record_bytes(table, nbytes)
+
+
+# ============================================
+# AGGREGATED ROUTE METRICS
+# ============================================
+
+class RouteMetrics:
+    """Process-wide database metrics aggregated per route"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, float]] = {}
+
+    def observe(self, route: str, stats: RequestDBStats, n_plus_one: bool):
+        with self._lock:
+            entry = self._routes.setdefault(route, {
+                "requests": 0,
+                "queries": 0,
+                "max_queries": 0,
+                "db_ms": 0.0,
+                "rows": 0,
+                "bytes": 0,
+                "n_plus_one_warnings": 0
+            })
+            queries = stats.queries
+            entry["requests"] += 1
+            entry["queries"] += queries
+            entry["max_queries"] = max(entry["max_queries"], queries)
+            entry["db_ms"] += stats.duration_ms
+            entry["rows"] += stats.rows
+            entry["bytes"] += stats.bytes
+            entry["n_plus_one_warnings"] += int(n_plus_one)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Per-route totals and averages
+
+        Returns:
+            dict: Mapping of "METHOD /path" to query/latency/payload metrics
+        """
+        with self._lock:
+            return {
+                route: {
+                    **entry,
+                    "db_ms": round(entry["db_ms"], 3),
+                    "avg_queries": round(entry["queries"] / entry["requests"], 2),
+                    "avg_db_ms": round(entry["db_ms"] / entry["requests"], 3)
+                }
+                for route, entry in sorted(self._routes.items())
+            }
+
+
+route_metrics = RouteMetrics()
+
+
+def finish_request_stats(route: str, stats: RequestDBStats, threshold: int) -> Dict[str, int]:
+    """
+    Close out a request: aggregate metrics and flag N+1 patterns
+
+    Args:
+        route: Route label, e.g. "GET /api/v1/dashboard/teacher"
+        stats: The request's collector
+        threshold: Max queries per table before a warning is logged
+
+    Returns:
+        dict: Tables that exceeded the threshold, with their query counts
+    """
+    suspects = {
+        table: int(entry["queries"])
+        for table, entry in stats.tables.items()
+        if entry["queries"] > threshold
+    }
+    for table, count in suspects.items():
+        logger.warning(
+            f"Possible N+1 query pattern on {route}: "
+            f"{count} queries against '{table}' in one request"
+        )
+    route_metrics.observe(route, stats, bool(suspects))
+    return suspects
@@ -0,0 +1,912 @@
+"""
+app/db/local_backend.py
+In-memory stand-in for Supabase, used for tests, load tests and benchmarks
+"""
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient
+from app.core.config import settings
+from app.db.instrumentation import record_bytes, table_from_path
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Optional, Dict, List, Any, Callable, Tuple, FrozenSet
+import json
+import re
+import threading
+import time
+import uuid
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+LOCAL_BASE_URL = "http://local.supabase/rest/v1"
+
+# Primary key of every table the application uses; generated on insert
+PRIMARY_KEYS: Dict[str, str] = {
+    "users": "user_id",
+    "students": "student_id",
+    "teachers": "teacher_id",
+    "parents": "parent_id",
+    "classes": "class_id",
+    "subjects": "subject_id",
+    "attendance": "attendance_id",
+    "exams": "exam_id",
+    "marks": "mark_id",
+    "homework": "hw_id",
+    "submissions": "submission_id",
+    "fees": "fee_id",
+    "fee_payments": "payment_id",
+    "timetable": "timetable_id",
+    "announcements": "announcement_id",
+    "leave_requests": "request_id",
+}
+
+# Query parameters that are not column filters
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "or", "and", "on_conflict", "columns"}
+
+# Stored procedures available to `client.rpc()`, see `local_rpc`
+LOCAL_RPC_FUNCTIONS: Dict[str, Callable[..., Any]] = {}
+
+
+def local_rpc(name: str):
+    """
+    Register a Python implementation of a database function
+
+    The function receives the LocalDatabase followed by the RPC arguments
+    as keyword arguments, and must return JSON-serialisable data.
+
+    Args:
+        name: Function name as called through `client.rpc(name, params)`
+
+    Example:
+        @local_rpc("student_count")
+        def student_count(db, class_id):
+            return len(db.select_rows("students", {"class_id": class_id}))
+    """
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        LOCAL_RPC_FUNCTIONS[name] = fn
+        return fn
+    return decorator
+
+
+class LocalQueryError(Exception):
+    """Error reported back to postgrest-py in PostgREST's error format"""
+
+    def __init__(self, status_code: int, code: str, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+
+    def payload(self) -> Dict[str, Any]:
+        return {"code": self.code, "message": self.message, "details": None, "hint": None}
+
+
+# ============================================
+# QUERY SYNTAX
+# ============================================
+
+def _split_top_level(text: str, sep: str = ",") -> List[str]:
+    """Split on `sep`, ignoring separators inside parentheses or quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == sep and depth == 0 and not quoted:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    tail = "".join(current).strip()
+    if tail:
+        parts.append(tail)
+    return parts
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+
+def _parse_select(text: str) -> List[Tuple[str, ...]]:
+    """
+    Parse a PostgREST select list
+
+    Returns:
+        list: ("*",), ("column", alias, name) or ("embed", alias, table, children)
+    """
+    nodes: List[Tuple[str, ...]] = []
+    for item in _split_top_level(text or "*"):
+        if item == "*":
+            nodes.append(("*",))
+        elif "(" in item and item.endswith(")"):
+            head, inner = item[:-1].split("(", 1)
+            alias, _, target = head.rpartition(":")
+            table = target.split("!", 1)[0].strip()
+            nodes.append(("embed", alias.strip() or table, table, _parse_select(inner)))
+        else:
+            alias, _, column = item.rpartition(":")
+            column = column.split("::", 1)[0].strip()
+            nodes.append(("column", alias.strip() or column, column))
+    return nodes
+
+
+def _parse_condition(text: str) -> Tuple[str, Any, bool]:
+    """
+    Parse one `column.op.value` / `and(...)` / `or(...)` term of a logic tree
+
+    Returns:
+        tuple: (kind, operand, negated) where kind is "and"/"or" for groups
+               (operand: list of terms) and the column name otherwise
+               (operand: "op.value")
+    """
+    negated = text.startswith("not.")
+    if negated:
+        text = text[4:]
+    for group in ("and", "or"):
+        if text.startswith(f"{group}(") and text.endswith(")"):
+            return group, [_parse_condition(t) for t in _split_top_level(text[len(group) + 1:-1])], negated
+    column, _, expression = text.partition(".")
+    if not expression:
+        raise LocalQueryError(400, "PGRST100", f"failed to parse logic tree ({text})")
+    return column, expression, negated
+
+
+def _like_regex(pattern: str, ignore_case: bool) -> "re.Pattern[str]":
+    regex = "".join(
+        ".*" if c in "*%" else "." if c == "_" else re.escape(c)
+        for c in pattern
+    )
+    return re.compile(regex, re.IGNORECASE | re.DOTALL if ignore_case else re.DOTALL)
+
+
+def _coerce(stored: Any, raw: str) -> Any:
+    """Convert a filter value to the type of the stored value it is compared with"""
+    if isinstance(stored, bool):
+        return raw.lower() in ("true", "t", "1", "yes", "on")
+    if isinstance(stored, (int, float)):
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+    return raw
+
+
+def _compare(stored: Any, op: str, raw: str) -> bool:
+    if stored is None:
+        return False
+    value = _coerce(stored, raw)
+    if isinstance(value, str) and not isinstance(stored, str):
+        stored = str(stored)
+    if op == "eq":
+        return stored == value
+    if op == "neq":
+        return stored != value
+    if op == "gt":
+        return stored > value
+    if op == "gte":
+        return stored >= value
+    if op == "lt":
+        return stored < value
+    return stored <= value
+
+
+@lru_cache(maxsize=256)
+def _in_values(raw: str) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+    # Parsed once per filter, not once per row scanned
+    values = tuple(_unquote(v) for v in _split_top_level(raw.strip("()")))
+    return values, frozenset(values)
+
+
+def _matches(row: Dict[str, Any], column: str, expression: str, negated: bool = False) -> bool:
+    op, _, raw = expression.partition(".")
+    if op == "not":
+        return _matches(row, column, raw, not negated)
+
+    stored = row.get(column)
+    if op in ("eq", "neq", "gt", "gte", "lt", "lte"):
+        result = _compare(stored, op, _unquote(raw))
+    elif op == "in":
+        values, lookup = _in_values(raw)
+        if isinstance(stored, str):
+            result = stored in lookup
+        else:
+            result = any(_compare(stored, "eq", v) for v in values)
+    elif op == "is":
+        target = {"null": None, "true": True, "false": False}.get(raw.lower(), raw)
+        result = stored is target if target is None else stored == target
+    elif op in ("like", "ilike"):
+        result = stored is not None and bool(
+            _like_regex(_unquote(raw), op == "ilike").fullmatch(str(stored))
+        )
+    else:
+        raise LocalQueryError(400, "PGRST100", f"operator '{op}' is not supported by the local backend")
+
+    # SQL semantics: NOT of a comparison with NULL is still not true
+    if negated:
+        return stored is not None and not result if op != "is" else not result
+    return result
+
+
+def _evaluate(row: Dict[str, Any], condition: Tuple[str, Any, bool]) -> bool:
+    kind, operand, negated = condition
+    if kind == "and":
+        result = all(_evaluate(row, c) for c in operand)
+    elif kind == "or":
+        result = any(_evaluate(row, c) for c in operand)
+    else:
+        return _matches(row, kind, operand, negated)
+    return not result if negated else result
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    if isinstance(value, (bool, int, float)):
+        return (0, value)
+    return (1, str(value))
+
+
+def _apply_order(rows: List[Dict[str, Any]], terms: List[str]) -> List[Dict[str, Any]]:
+    # Stable sorts applied from the least to the most significant term
+    for term in reversed(terms):
+        column, *modifiers = term.split(".")
+        descending = "desc" in modifiers
+        nulls_first = "nullsfirst" in modifiers or (descending and "nullslast" not in modifiers)
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: _sort_key(r[column]), reverse=descending)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ============================================
+# IN-MEMORY DATABASE
+# ============================================
+
+class LocalDatabase:
+    """
+    Thread-safe in-memory tables with PostgREST query semantics
+
+    Tables are schemaless lists of rows and are created on first use. A
+    missing column reads as NULL. Inserts fill in the table's primary key
+    (UUID) and `created_at` when they are not supplied.
+    """
+
+    def __init__(self, primary_keys: Optional[Dict[str, str]] = None):
+        """
+        Initialize LocalDatabase
+
+        Args:
+            primary_keys: Mapping of table name to primary key column
+        """
+        self.primary_keys = dict(PRIMARY_KEYS if primary_keys is None else primary_keys)
+        self._tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.RLock()
+
+    def _table(self, table: str) -> List[Dict[str, Any]]:
+        return self._tables.setdefault(table, [])
+
+    # --- Seeding and inspection -------------
+
+    def seed(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insert rows directly, bypassing the HTTP layer
+
+        Args:
+            table: Table name
+            rows: Rows to insert
+
+        Returns:
+            list: Inserted rows including generated keys
+        """
+        with self._lock:
+            return self.insert(table, [dict(r) for r in rows])
+
+    def load_file(self, path: str):
+        """
+        Seed tables from a JSON file of the form {"table": [rows, ...]}
+
+        Args:
+            path: Path to the JSON file
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for table, rows in data.items():
+            self.seed(table, rows)
+        logger.info(f"Local database seeded from {path}")
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        """Copies of all rows of a table"""
+        with self._lock:
+            return [dict(r) for r in self._tables.get(table, [])]
+
+    def select_rows(self, table: str, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Rows matching equality filters (for use in `local_rpc` functions)
+
+        Args:
+            table: Table name
+            filters: Dictionary of column: value pairs
+
+        Returns:
+            list: Copies of the matching rows
+        """
+        with self._lock:
+            return [
+                dict(r) for r in self._tables.get(table, [])
+                if all(r.get(k) == v for k, v in (filters or {}).items())
+            ]
+
+    def reset(self):
+        """Drop all data"""
+        with self._lock:
+            self._tables.clear()
+
+    # --- Query operations -------------------
+
+    def filter(self, table: str, conditions: List[Tuple[str, Any, bool]]) -> List[Dict[str, Any]]:
+        return [r for r in self._table(table) if all(_evaluate(r, c) for c in conditions)]
+
+    def insert(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        on_conflict: Optional[List[str]] = None,
+        resolution: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        pk = self.primary_keys.get(table)
+        conflict_columns = on_conflict or ([pk] if pk else [])
+        stored = self._table(table)
+        result = []
+        # Stored rows by conflict key, built once per statement
+        by_key = {tuple(r.get(c) for c in conflict_columns): r for r in reversed(stored)} if conflict_columns else {}
+
+        for row in rows:
+            existing = None
+            key = tuple(row.get(c) for c in conflict_columns)
+            if conflict_columns and all(v is not None for v in key):
+                existing = by_key.get(key)
+            if existing is not None:
+                if resolution == "merge-duplicates":
+                    existing.update(row)
+                    result.append(existing)
+                    continue
+                if resolution == "ignore-duplicates":
+                    continue
+                raise LocalQueryError(
+                    409, "23505",
+                    f'duplicate key value violates unique constraint "{table}_{"_".join(conflict_columns)}_key"'
+                )
+
+            if pk and row.get(pk) is None:
+                row[pk] = str(uuid.uuid4())
+            row.setdefault("created_at", _now())
+            stored.append(row)
+            if conflict_columns:
+                by_key[tuple(row.get(c) for c in conflict_columns)] = row
+            result.append(row)
+        return result
+
+    def update(self, table: str, conditions: List[Tuple[str, Any, bool]], values: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rows = self.filter(table, conditions)
+        for row in rows:
+            row.update(values)
+        return rows
+
+    def delete(self, table: str, conditions: List[Tuple[str, Any, bool]]) -> List[Dict[str, Any]]:
+        doomed = self.filter(table, conditions)
+        ids = {id(r) for r in doomed}
+        self._tables[table] = [r for r in self._table(table) if id(r) not in ids]
+        return doomed
+
+    # --- Projection and embedding -----------
+
+    def project(self, table: str, rows: List[Dict[str, Any]], nodes: List[Tuple[str, ...]]) -> List[Dict[str, Any]]:
+        """
+        Apply a parsed select list, resolving embedded resources
+
+        A resource is embedded to-one when the row holds its primary key
+        (e.g. `attendance.student_id` -> `students`), and to-many when the
+        embedded table holds this table's primary key.
+        """
+        indexes: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        return [self._project_row(table, row, nodes, indexes) for row in rows]
+
+    def _project_row(
+        self,
+        table: str,
+        row: Dict[str, Any],
+        nodes: List[Tuple[str, ...]],
+        indexes: Dict[str, Dict[Any, Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        for node in nodes:
+            if node[0] == "*":
+                result.update(row)
+            elif node[0] == "column":
+                result[node[1]] = row.get(node[2])
+            else:
+                _, alias, target, children = node
+                result[alias] = self._embed(table, row, target, children, indexes)
+        return result
+
+    def _embed(
+        self,
+        table: str,
+        row: Dict[str, Any],
+        target: str,
+        children: List[Tuple[str, ...]],
+        indexes: Dict[str, Dict[Any, Dict[str, Any]]]
+    ) -> Any:
+        target_pk = self.primary_keys.get(target)
+        if target_pk and target_pk in row:
+            if target not in indexes:
+                indexes[target] = {r.get(target_pk): r for r in self._table(target)}
+            related = indexes[target].get(row[target_pk])
+            return self._project_row(target, related, children, indexes) if related else None
+
+        own_pk = self.primary_keys.get(table)
+        if own_pk and row.get(own_pk) is not None:
+            return [
+                self._project_row(target, r, children, indexes)
+                for r in self._table(target)
+                if r.get(own_pk) == row[own_pk]
+            ]
+
+        raise LocalQueryError(
+            400, "PGRST200",
+            f"Could not find a relationship between '{table}' and '{target}'"
+        )
+
+
+# ============================================
+# POSTGREST EMULATION
+# ============================================
+
+class LocalTransport(httpx.BaseTransport):
+    """
+    httpx transport that answers PostgREST requests from a LocalDatabase
+
+    The regular postgrest-py request builders run on top of it unchanged,
+    so everything the application builds (filters, `or=` logic trees,
+    `order=` lists, Range headers, HEAD counts, upserts, RPC calls) is
+    interpreted exactly as the HTTP API would receive it.
+    """
+
+    def __init__(self, database: LocalDatabase, latency: float = 0.0):
+        """
+        Initialize LocalTransport
+
+        Args:
+            database: Backing store
+            latency: Simulated round-trip time in seconds
+        """
+        self.database = database
+        self.latency = latency
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            time.sleep(self.latency)
+
+        resource = table_from_path(request.url.path)
+        try:
+            with self.database._lock:
+                status, body, headers = self._dispatch(request, resource)
+        except LocalQueryError as e:
+            status, body, headers = e.status_code, e.payload(), {}
+
+        content = b"" if body is None or request.method == "HEAD" else json.dumps(body).encode()
+        record_bytes(resource, len(content))
+        headers.setdefault("Content-Type", "application/json; charset=utf-8")
+        return httpx.Response(status, headers=headers, content=content)
+
+    def _dispatch(self, request: httpx.Request, resource: str) -> Tuple[int, Any, Dict[str, str]]:
+        params = request.url.params
+        prefer = {
+            key.strip(): value.strip()
+            for key, _, value in (
+                part.partition("=") for part in request.headers.get("Prefer", "").split(",") if part
+            )
+        }
+        body = json.loads(request.content) if request.content else None
+
+        if resource.startswith("rpc/"):
+            return self._rpc(resource[4:], body or {})
+
+        db = self.database
+        conditions = self._conditions(params)
+        nodes = _parse_select(params.get("select", "*"))
+
+        if request.method in ("GET", "HEAD"):
+            rows = db.filter(resource, conditions)
+            total = len(rows)
+            rows = _apply_order(rows, [t for value in params.get_list("order") for t in value.split(",")])
+            start, rows = self._window(rows, params, request.headers.get("Range"))
+            if settings.LOCAL_DB_MAX_ROWS:
+                rows = rows[:settings.LOCAL_DB_MAX_ROWS]
+            data = db.project(resource, rows, nodes)
+            status = 200
+        elif request.method == "POST":
+            rows = body if isinstance(body, list) else [body]
+            on_conflict = params.get("on_conflict")
+            data = db.project(resource, db.insert(
+                resource,
+                [dict(r) for r in rows],
+                on_conflict.split(",") if on_conflict else None,
+                prefer.get("resolution")
+            ), nodes)
+            start, total, status = 0, len(data), 201
+        elif request.method == "PATCH":
+            data = db.project(resource, db.update(resource, conditions, body or {}), nodes)
+            start, total, status = 0, len(data), 200
+        elif request.method == "DELETE":
+            data = db.project(resource, db.delete(resource, conditions), nodes)
+            start, total, status = 0, len(data), 200
+        else:
+            raise LocalQueryError(405, "PGRST117", f"Unsupported HTTP method: {request.method}")
+
+        headers = {"Content-Range": self._content_range(start, len(data), total, "count" in prefer)}
+        if "application/vnd.pgrst.object+json" in request.headers.get("Accept", ""):
+            if len(data) != 1:
+                raise LocalQueryError(
+                    406, "PGRST116",
+                    f"JSON object requested, multiple (or no) rows returned ({len(data)} rows)"
+                )
+            return status, data[0], headers
+        if prefer.get("return") == "minimal" and request.method != "GET":
+            return 204 if status == 200 else status, None, headers
+        return status, data, headers
+
+    def _rpc(self, name: str, args: Dict[str, Any]) -> Tuple[int, Any, Dict[str, str]]:
+        fn = LOCAL_RPC_FUNCTIONS.get(name)
+        if fn is None:
+            raise LocalQueryError(404, "PGRST202", f"Could not find the function public.{name}")
+        return 200, fn(self.database, **args), {}
+
+    @staticmethod
+    def _conditions(params: httpx.QueryParams) -> List[Tuple[str, Any, bool]]:
+        conditions = []
+        for key, value in params.multi_items():
+            if key in ("or", "and"):
+                conditions.append(_parse_condition(f"{key}{value}"))
+            elif key not in _RESERVED_PARAMS:
+                if "." in key:
+                    raise LocalQueryError(
+                        400, "PGRST100",
+                        f"filters on embedded resources ({key}) are not supported by the local backend"
+                    )
+                conditions.append((key, value, False))
+        return conditions
+
+    @staticmethod
+    def _window(rows: List[Dict[str, Any]], params: httpx.QueryParams, range_header: Optional[str]) -> Tuple[int, List[Dict[str, Any]]]:
+        start = int(params.get("offset", 0))
+        limit = int(params["limit"]) if "limit" in params else None
+        if range_header:
+            first, _, last = range_header.partition("-")
+            start += int(first)
+            if last:
+                span = int(last) - int(first) + 1
+                limit = span if limit is None else min(limit, span)
+        end = None if limit is None else start + limit
+        return start, rows[start:end]
+
+    @staticmethod
+    def _content_range(start: int, returned: int, total: int, counted: bool) -> str:
+        window = f"{start}-{start + returned - 1}" if returned else "*"
+        return f"{window}/{total if counted else '*'}"
+
+
+# ============================================
+# DATABASE FUNCTIONS
+# ============================================
+# Python equivalents of the SQL functions in supabase/migrations
+
+def _filter_expression(op: str, value: Any) -> str:
+    """Turn an aggregate_rows filter into PostgREST `op.value` syntax"""
+    if op == "in":
+        quoted = ",".join('"' + str(v).replace('"', '\\"') + '"' for v in value)
+        return f"in.({quoted})"
+    if op not in ("eq", "neq", "gt", "gte", "lt", "lte", "is"):
+        raise LocalQueryError(400, "22023", f"aggregate_rows: invalid filter operator {op}")
+    return f"{op}.{'null' if value is None else value}"
+
+
+def _metric(rows: List[Dict[str, Any]], spec: str) -> Any:
+    fn, _, column = spec.partition(":")
+    fn = fn.lower()
+    if fn == "count" and not column:
+        return len(rows)
+    if fn not in ("count", "sum", "avg", "min", "max") or not column:
+        raise LocalQueryError(400, "22023", f"aggregate_rows: invalid metric {spec}")
+
+    values = [r[column] for r in rows if r.get(column) is not None]
+    if fn == "count":
+        return len(values)
+    if not values:
+        return None
+    if fn == "sum":
+        return sum(values)
+    if fn == "avg":
+        return sum(values) / len(values)
+    return min(values) if fn == "min" else max(values)
+
+
+@local_rpc("aggregate_rows")
+def aggregate_rows(
+    db: LocalDatabase,
+    p_table: str,
+    p_group_by: Optional[List[str]] = None,
+    p_metrics: Optional[Dict[str, str]] = None,
+    p_filters: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    conditions = [
+        (f["column"], _filter_expression(f["op"], f.get("value")), False)
+        for f in p_filters or []
+    ]
+    group_by = p_group_by or []
+    metrics = p_metrics or {"count": "count"}
+
+    groups: Dict[Tuple[Any, ...], List[Dict[str, Any]]] = {}
+    for row in db.filter(p_table, conditions):
+        groups.setdefault(tuple(row.get(c) for c in group_by), []).append(row)
+    if not group_by and not groups:
+        groups[()] = []
+
+    return [
+        {
+            **dict(zip(group_by, key)),
+            **{name: _metric(rows, spec) for name, spec in metrics.items()}
+        }
+        for key, rows in groups.items()
+    ]
+
+
+@local_rpc("bump_scope_version")
+def bump_scope_version(db: LocalDatabase, p_user_ids: List[str]) -> List[Dict[str, Any]]:
+    bumped = []
+    for row in db.filter("users", [("user_id", _filter_expression("in", p_user_ids), False)]):
+        row["scope_version"] = (row.get("scope_version") or 0) + 1
+        bumped.append({"user_id": row["user_id"], "scope_version": row["scope_version"]})
+    return bumped
+
+
+@local_rpc("existing_user_emails")
+def existing_user_emails(db: LocalDatabase, p_emails: List[str]) -> List[str]:
+    wanted = {email.lower() for email in p_emails}
+    return [row["email"] for row in db.rows("users") if (row.get("email") or "").lower() in wanted]
+
+
+_ROLLUP_STATUSES = ("present", "absent", "late", "excused")
+
+
+def _rollup_row(db: LocalDatabase, table: str, key: Dict[str, Any]) -> Dict[str, Any]:
+    """Stored rollup row for `key`, created with zero counts if missing"""
+    conditions = [(column, f"eq.{value}", False) for column, value in key.items()]
+    rows = db.filter(table, conditions)
+    if rows:
+        return rows[0]
+    return db.insert(table, [{**key, **{s: 0 for s in _ROLLUP_STATUSES}}])[0]
+
+
+@local_rpc("apply_attendance_deltas")
+def apply_attendance_deltas(db: LocalDatabase, p_deltas: List[Dict[str, Any]]) -> int:
+    for d in p_deltas:
+        if d["status"] not in _ROLLUP_STATUSES:
+            continue
+        if d.get("class_id"):
+            row = _rollup_row(db, "attendance_class_daily", {"class_id": d["class_id"], "date": d["date"]})
+            row[d["status"]] += d["delta"]
+        row = _rollup_row(db, "attendance_student_yearly", {
+            "student_id": d["student_id"], "academic_year": d["academic_year"]
+        })
+        row[d["status"]] += d["delta"]
+    return len(p_deltas)
+
+
+@local_rpc("upsert_attendance")
+def upsert_attendance(
+    db: LocalDatabase,
+    p_class_id: str,
+    p_date: str,
+    p_academic_year: str,
+    p_records: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    created = updated = 0
+    deltas = []
+    for record in p_records:
+        existing = db.filter("attendance", [
+            ("student_id", f"eq.{record['student_id']}", False), ("date", f"eq.{p_date}", False)
+        ])
+        values = {"status": record["status"], "remarks": record.get("remarks")}
+        delta = {"class_id": p_class_id, "student_id": record["student_id"], "date": p_date, "academic_year": p_academic_year}
+        if not existing:
+            db.insert("attendance", [{"student_id": record["student_id"], "date": p_date, **values}])
+            deltas.append({**delta, "status": record["status"], "delta": 1})
+            created += 1
+        elif (existing[0].get("status"), existing[0].get("remarks")) != (values["status"], values["remarks"]):
+            if existing[0].get("status") != record["status"]:
+                deltas.append({**delta, "status": existing[0]["status"], "delta": -1})
+                deltas.append({**delta, "status": record["status"], "delta": 1})
+            existing[0].update(values)
+            updated += 1
+
+    deltas.sort(key=lambda d: d["delta"])  # -1s first, like the SQL function
+    if deltas:
+        apply_attendance_deltas(db, deltas)
+    return {
+        "created": created,
+        "updated": updated,
+        "unchanged": len(p_records) - created - updated,
+        "deltas": deltas
+    }
+
+
+@local_rpc("rebuild_attendance_rollups")
+def rebuild_attendance_rollups(
+    db: LocalDatabase,
+    p_class_ids: Optional[List[str]] = None,
+    p_start_month: int = 6
+) -> Dict[str, int]:
+    students = {
+        s["student_id"]: s.get("class_id") for s in db.rows("students")
+        if p_class_ids is None or s.get("class_id") in p_class_ids
+    }
+    if p_class_ids is None:
+        db.delete("attendance_class_daily", [])
+        db.delete("attendance_student_yearly", [])
+    else:
+        db.delete("attendance_class_daily", [("class_id", _filter_expression("in", p_class_ids), False)])
+        db.delete("attendance_student_yearly", [("student_id", _filter_expression("in", list(students)), False)])
+
+    class_days: Dict[Tuple[str, str], Dict[str, int]] = {}
+    student_years: Dict[Tuple[str, str], Dict[str, int]] = {}
+    for row in db.rows("attendance"):
+        if row["student_id"] not in students or row.get("status") not in _ROLLUP_STATUSES:
+            continue
+        day = str(row["date"])[:10]
+        year, month = int(day[:4]), int(day[5:7])
+        start = year if month >= p_start_month else year - 1
+        class_id = students[row["student_id"]]
+        if class_id:
+            counts = class_days.setdefault((class_id, day), dict.fromkeys(_ROLLUP_STATUSES, 0))
+            counts[row["status"]] += 1
+        counts = student_years.setdefault(
+            (row["student_id"], f"{start}-{str(start + 1)[-2:]}"), dict.fromkeys(_ROLLUP_STATUSES, 0)
+        )
+        counts[row["status"]] += 1
+
+    db.insert("attendance_class_daily", [
+        {"class_id": class_id, "date": day, **counts} for (class_id, day), counts in class_days.items()
+    ])
+    db.insert("attendance_student_yearly", [
+        {"student_id": student_id, "academic_year": year, **counts}
+        for (student_id, year), counts in student_years.items()
+    ])
+    return {"class_days": len(class_days), "student_years": len(student_years)}
+
+
+@local_rpc("record_fee_payment")
+def record_fee_payment(
+    db: LocalDatabase,
+    p_fee_id: str,
+    p_amount: float,
+    p_payment_method: str,
+    p_transaction_id: Optional[str],
+    p_idempotency_key: str,
+    p_recorded_by: Optional[str] = None
+) -> Dict[str, Any]:
+    fees = db.filter("fees", [("fee_id", f"eq.{p_fee_id}", False)])
+    if not fees:
+        return {"outcome": "not_found"}
+    fee = fees[0]
+
+    previous = db.filter("fee_payments", [("idempotency_key", _filter_expression("eq", p_idempotency_key), False)])
+    if previous:
+        payment = previous[0]
+        same = payment["fee_id"] == p_fee_id and float(payment["amount"]) == float(p_amount)
+        return {"outcome": "duplicate" if same else "conflict", "fee": dict(fee), "payment": dict(payment)}
+
+    paid = round(float(fee.get("amount_paid") or 0) + float(p_amount), 2)
+    if paid > float(fee["amount"]):
+        return {"outcome": "overpayment", "fee": dict(fee)}
+
+    payment = db.insert("fee_payments", [{
+        "fee_id": p_fee_id,
+        "amount": p_amount,
+        "payment_method": p_payment_method,
+        "transaction_id": p_transaction_id,
+        "idempotency_key": p_idempotency_key,
+        "recorded_by": p_recorded_by
+    }])[0]
+    fee.update({
+        "amount_paid": paid,
+        "status": "paid" if paid >= float(fee["amount"]) else "partial",
+        "payment_date": _now(),
+        "payment_method": p_payment_method,
+        "transaction_id": p_transaction_id or fee.get("transaction_id")
+    })
+    return {"outcome": "recorded", "fee": dict(fee), "payment": dict(payment)}
+
+# ============================================
+# CLIENT
+# ============================================
+
+class LocalPostgrestClient(SyncPostgrestClient):
+    """PostgREST client whose session is served by a LocalTransport"""
+
+    def __init__(self, *, transport: LocalTransport, **kwargs: Any):
+        self._transport = transport
+        super().__init__(LOCAL_BASE_URL, **kwargs)
+
+    def create_session(self, base_url: str, headers: Dict[str, str], timeout: Any) -> SyncClient:
+        return SyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=self._transport
+        )
+
+
+class LocalClient:
+    """
+    Drop-in replacement for the parts of supabase.Client the app uses
+
+    `table()`, `from_()` and `rpc()` return the regular postgrest-py
+    builders, so `run_query`, `run_head` and SupabaseQueries work as-is.
+    """
+
+    def __init__(self, name: str, database: LocalDatabase, latency: float = 0.0):
+        """
+        Initialize LocalClient
+
+        Args:
+            name: Label ("anon" / "admin")
+            database: Backing store, shared between clients
+            latency: Simulated round-trip time in seconds
+        """
+        self.name = name
+        self.database = database
+        self.transport = LocalTransport(database, latency)
+        self.postgrest = LocalPostgrestClient(transport=self.transport)
+
+    def table(self, table_name: str):
+        return self.postgrest.from_(table_name)
+
+    def from_(self, table_name: str):
+        return self.postgrest.from_(table_name)
+
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None):
+        return self.postgrest.rpc(fn, params or {})
+
+    def close(self):
+        self.postgrest.aclose()
+
+
+local_database = LocalDatabase()
+
+
+def create_local_client(name: str) -> LocalClient:
+    """
+    Create a client on the process-wide local database
+
+    Seeds the database from LOCAL_DB_SEED_FILE the first time it is used.
+
+    Args:
+        name: Label ("anon" / "admin")
+
+    Returns:
+        LocalClient: Client backed by `local_database`
+    """
+    with local_database._lock:
+        if settings.LOCAL_DB_SEED_FILE and not local_database._tables:
+            local_database.load_file(settings.LOCAL_DB_SEED_FILE)
+    return LocalClient(name, local_database, settings.LOCAL_DB_LATENCY_MS / 1000)
@@ -2,14 +2,226 @@
 app/db/supabase.py
 Complete Supabase client configuration and helper functions
 """
-from supabase import create_client, Client
+from supabase import Client
+from supabase.lib.client_options import ClientOptions
+from postgrest import SyncPostgrestClient
+from postgrest.exceptions import APIError
+from postgrest.utils import SyncClient
 from app.core.config import settings
+from app.db.instrumentation import record_query, record_bytes, table_from_path
+from app.db.cache import reference_cache, REFERENCE_TABLES
+from app.db.local_backend import create_local_client
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Callable, Tuple
+import asyncio
+import base64
+import contextvars
+import importlib.util
+import json
+import threading
+import time
+import httpx
 import logging
 
 logger = logging.getLogger(__name__)
 
+# ============================================
+# CONNECTION POOL
+# ============================================
+
+class PooledTransport(httpx.HTTPTransport):
+    """
+    httpx transport with explicit pool limits and occupancy statistics
+
+    Pool wait is measured from the moment a request enters the transport
+    until httpcore reports the first connection-level event, i.e. until a
+    connection was handed to it (new or reused).
+    """
+
+    def __init__(self, name: str, **kwargs: Any):
+        """
+        Initialize PooledTransport
+
+        Args:
+            name: Label used in statistics ("anon" / "admin")
+            **kwargs: Passed through to httpx.HTTPTransport
+        """
+        super().__init__(**kwargs)
+        self.name = name
+        self.limits: httpx.Limits = kwargs["limits"]
+        self.http2 = kwargs.get("http2", False)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._pool_timeouts = 0
+        self._connect_errors = 0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        acquired: List[float] = []
+        outer_trace = request.extensions.get("trace")
+
+        def trace(event_name: str, info: Dict[str, Any]):
+            if not acquired:
+                acquired.append(time.perf_counter())
+            if outer_trace is not None:
+                outer_trace(event_name, info)
+
+        request.extensions["trace"] = trace
+        try:
+            response = super().handle_request(request)
+            response.stream = _CountingStream(response.stream, table_from_path(request.url.path))
+            return response
+        except httpx.PoolTimeout:
+            with self._lock:
+                self._pool_timeouts += 1
+            raise
+        except httpx.ConnectError:
+            with self._lock:
+                self._connect_errors += 1
+            raise
+        finally:
+            wait = (acquired[0] if acquired else time.perf_counter()) - started
+            with self._lock:
+                self._requests += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Connection pool statistics
+
+        Returns:
+            dict: Pool limits, active/idle connections and pool wait times
+        """
+        connections = self._pool.connections
+        idle = sum(1 for c in connections if c.is_idle())
+        with self._lock:
+            return {
+                "http2": self.http2,
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "connections": len(connections),
+                "active": len(connections) - idle,
+                "idle": idle,
+                "requests": self._requests,
+                "avg_pool_wait_ms": round(
+                    self._total_wait / self._requests * 1000, 3
+                ) if self._requests else 0.0,
+                "max_pool_wait_ms": round(self._max_wait * 1000, 3),
+                "pool_timeouts": self._pool_timeouts,
+                "connect_errors": self._connect_errors
+            }
+
+
+class _CountingStream(httpx.SyncByteStream):
+    """Response stream that reports payload size to the request statistics"""
+
+    def __init__(self, stream: Any, table: str):
+        self._stream = stream
+        self._table = table
+
+    def __iter__(self):
+        nbytes = 0
+        try:
+            for chunk in self._stream:
+                nbytes += len(chunk)
+                yield chunk
+        finally:
+            record_bytes(self._table, nbytes)
+
+    def close(self):
+        self._stream.close()
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """PostgREST client whose session runs on a shared PooledTransport"""
+
+    def __init__(self, base_url: str, *, transport: PooledTransport, **kwargs: Any):
+        self._transport = transport
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url: str, headers: Dict[str, str], timeout: Any) -> SyncClient:
+        return SyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=self._transport
+        )
+
+
+class PooledClient(Client):
+    """
+    Supabase client with a tuned, observable PostgREST transport
+
+    supabase-py rebuilds its PostgREST client on auth events; every rebuild
+    reuses the same transport, so the connection pool survives and is only
+    closed by `close()`.
+    """
+
+    transport: PooledTransport
+
+    def _init_postgrest_client(
+        self,
+        rest_url: str,
+        headers: Dict[str, str],
+        schema: str,
+        timeout: Any = None
+    ) -> SyncPostgrestClient:
+        return PooledPostgrestClient(
+            rest_url,
+            transport=self.transport,
+            headers=headers,
+            schema=schema,
+            timeout=_http_timeout()
+        )
+
+    def close(self):
+        """Close pooled connections (called on application shutdown)"""
+        self.transport.close()
+
+
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        settings.SUPABASE_READ_TIMEOUT,
+        connect=settings.SUPABASE_CONNECT_TIMEOUT,
+        pool=settings.SUPABASE_POOL_TIMEOUT
+    )
+
+
+def _build_transport(name: str) -> PooledTransport:
+    http2 = settings.SUPABASE_HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("SUPABASE_HTTP2 is enabled but the h2 package is not installed; using HTTP/1.1")
+        http2 = False
+
+    return PooledTransport(
+        name,
+        http2=http2,
+        retries=settings.SUPABASE_CONNECT_RETRIES,
+        limits=httpx.Limits(
+            max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY
+        )
+    )
+
+
+def _create_pooled_client(name: str, supabase_key: str) -> PooledClient:
+    # A fresh ClientOptions per client: supabase-py's default instance is
+    # shared, so the anon and admin clients would overwrite each other's
+    # auth headers.
+    client = PooledClient.create(
+        supabase_url=settings.SUPABASE_URL,
+        supabase_key=supabase_key,
+        options=ClientOptions(postgrest_client_timeout=_http_timeout())
+    )
+    client.transport = _build_transport(name)
+    return client
+
+
 # ============================================
 # CLIENT FACTORY FUNCTIONS
 # ============================================
@@ -19,6 +231,7 @@ def get_supabase_client() -> Client:
     """
     Get Supabase client instance (cached)
     Uses the anon/public key - for regular operations
+    With DATABASE_BACKEND=local an in-memory LocalClient is returned instead
     
     Returns:
         Client: Supabase client instance
@@ -27,10 +240,9 @@ def get_supabase_client() -> Client:
         Exception: If client creation fails
     """
     try:
-        supabase: Client = create_client(
-            supabase_url=settings.SUPABASE_URL,
-            supabase_key=settings.SUPABASE_KEY
-        )
+        if settings.DATABASE_BACKEND == "local":
+            return create_local_client("anon")
+        supabase: Client = _create_pooled_client("anon", settings.SUPABASE_KEY)
         logger.info("Supabase client created successfully")
         return supabase
     except Exception as e:
@@ -51,10 +263,9 @@ def get_supabase_admin_client() -> Client:
         Exception: If admin client creation fails
     """
     try:
-        supabase: Client = create_client(
-            supabase_url=settings.SUPABASE_URL,
-            supabase_key=settings.SUPABASE_SERVICE_KEY
-        )
+        if settings.DATABASE_BACKEND == "local":
+            return create_local_client("admin")
+        supabase: Client = _create_pooled_client("admin", settings.SUPABASE_SERVICE_KEY)
         logger.info("Supabase admin client created successfully")
         return supabase
     except Exception as e:
@@ -62,6 +273,427 @@ def get_supabase_admin_client() -> Client:
         raise Exception(f"Supabase admin connection failed: {str(e)}")
 
 
+def _created_clients() -> List[Client]:
+    # Only clients that were actually created; never instantiate here
+    return [
+        factory()
+        for factory in (get_supabase_client, get_supabase_admin_client)
+        if factory.cache_info().currsize
+    ]
+
+
+def connection_pool_stats() -> Dict[str, Any]:
+    """
+    Connection pool statistics for every client created in this worker
+
+    Returns:
+        dict: Mapping of client name ("anon"/"admin") to pool statistics
+    """
+    return {
+        client.transport.name: client.transport.stats()
+        for client in _created_clients()
+        if isinstance(client, PooledClient)
+    }
+
+
+def close_supabase_clients():
+    """
+    Close the cached clients and their connection pools
+    Run this on application shutdown
+    """
+    for client in _created_clients():
+        client.close()
+    get_supabase_client.cache_clear()
+    get_supabase_admin_client.cache_clear()
+    logger.info("Supabase clients closed")
+
+
+# ============================================
+# ASYNC EXECUTION LAYER
+# ============================================
+
+class QueryExecutor:
+    """
+    Runs blocking PostgREST requests on a bounded thread pool
+
+    The supabase-py client is synchronous, so calling `.execute()` directly
+    inside an async endpoint stalls the event loop for the whole round trip.
+    Every query goes through `run()` instead, which offloads the HTTP call to
+    a worker thread. At most `max_workers` requests hit the network at once;
+    anything beyond that waits in the pool queue without blocking the loop.
+    """
+
+    def __init__(self, max_workers: int):
+        """
+        Initialize QueryExecutor
+
+        Args:
+            max_workers: Maximum number of queries executing concurrently
+        """
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._active = 0
+        self._peak_in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="supabase-query"
+                )
+            return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a blocking callable on the pool and await its result
+
+        Args:
+            fn: Blocking callable, usually a builder's `execute`
+            *args: Positional arguments for `fn`
+
+        Returns:
+            Whatever `fn` returns
+        """
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        # Carry the request context (statistics collector) into the worker
+        context = contextvars.copy_context()
+
+        def call():
+            with self._lock:
+                self._active += 1
+                self._total_wait += time.perf_counter() - submitted
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+        with self._lock:
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            return await loop.run_in_executor(self._get_pool(), context.run, call)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Pool saturation statistics
+
+        Returns:
+            dict: Capacity, running/queued counts and average queue wait
+        """
+        with self._lock:
+            queued = max(self._in_flight - self._active, 0)
+            return {
+                "max_concurrency": self.max_workers,
+                "running": self._active,
+                "queued": queued,
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "saturation": round(self._active / self.max_workers, 3),
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_queue_wait_ms": round(
+                    self._total_wait / self._completed * 1000, 3
+                ) if self._completed else 0.0
+            }
+
+    def shutdown(self):
+        """Stop the worker threads (called on application shutdown)"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+query_executor = QueryExecutor(settings.DB_MAX_CONCURRENCY)
+
+
+async def run_query(query: Any) -> Any:
+    """
+    Execute a built PostgREST query without blocking the event loop
+
+    Args:
+        query: Any supabase-py builder that has an `execute()` method
+
+    Returns:
+        APIResponse: The response returned by `execute()`
+
+    Example:
+        >>> response = await run_query(
+        ...     supabase.table("students").select("*").eq("class_id", "uuid")
+        ... )
+    """
+    started = time.perf_counter()
+    rows = 0
+    try:
+        response = await query_executor.run(query.execute)
+        if isinstance(response.data, list):
+            rows = len(response.data)
+        elif response.data is not None:
+            rows = 1
+        return response
+    finally:
+        record_query(table_from_path(query.path), time.perf_counter() - started, rows)
+
+
+def _execute_head(query: Any) -> Any:
+    # postgrest-py turns a column-less select() into HEAD but then discards
+    # the headers, so send the request ourselves to keep Content-Range.
+    response = query.session.request(
+        "HEAD",
+        query.path,
+        params=query.params,
+        headers=query.headers
+    )
+    if not 200 <= response.status_code <= 299:
+        raise APIError({
+            "message": f"HEAD {query.path} failed",
+            "code": str(response.status_code)
+        })
+    return response
+
+
+async def run_head(query: Any) -> str:
+    """
+    Execute a column-less select as a HEAD request (no response body)
+
+    Args:
+        query: A builder created with `select()` or `select(count=...)`
+
+    Returns:
+        str: The Content-Range header, e.g. "0-0/42", "*/42" or "*/*"
+
+    Example:
+        >>> content_range = await run_head(
+        ...     supabase.table("students").select(count="exact").eq("class_id", "uuid")
+        ... )
+    """
+    started = time.perf_counter()
+    try:
+        response = await query_executor.run(_execute_head, query)
+        return response.headers.get("content-range", "")
+    finally:
+        record_query(table_from_path(query.path), time.perf_counter() - started, 0)
+
+
+# ============================================
+# BATCHED LOOKUPS
+# ============================================
+
+class BatchLoader:
+    """
+    Request-scoped DataLoader for primary-key lookups
+
+    Every `load()` issued during the same event-loop tick is collected and
+    resolved with a single `in_()` query per (table, id_column). Results are
+    memoised for the lifetime of the loader, so asking for the same row twice
+    never costs a second round trip.
+
+    Create one loader per request (SupabaseQueries does this lazily) so the
+    memo never serves data across requests.
+    """
+
+    def __init__(self, client: Client):
+        """
+        Initialize BatchLoader
+
+        Args:
+            client: Supabase client used to run the batched queries
+        """
+        self.client = client
+        self._cache: Dict[Tuple[str, str], Dict[str, asyncio.Future]] = {}
+        self._pending: Dict[Tuple[str, str], Dict[str, asyncio.Future]] = {}
+        self._scheduled = False
+
+    def load(self, table: str, id_column: str, id_value: Any) -> asyncio.Future:
+        """
+        Queue a lookup and return a future for the matching row
+
+        Args:
+            table: Table name
+            id_column: Name of the ID column
+            id_value: Value of the ID
+
+        Returns:
+            Future: Resolves to the record, or None if it does not exist
+        """
+        loop = asyncio.get_running_loop()
+        batch_key = (table, id_column)
+        key = str(id_value)
+
+        cached = self._cache.setdefault(batch_key, {})
+        future = cached.get(key)
+        if future is not None:
+            return future
+
+        future = loop.create_future()
+        cached[key] = future
+
+        if reference_cache.handles(table, id_column):
+            row = reference_cache.get(table, id_value)
+            if row is not None:
+                future.set_result(row)
+                return future
+
+        self._pending.setdefault(batch_key, {})[key] = future
+
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._dispatch)
+        return future
+
+    def _dispatch(self):
+        pending, self._pending = self._pending, {}
+        self._scheduled = False
+        for batch_key, futures in pending.items():
+            asyncio.ensure_future(self._fetch(batch_key, futures))
+
+    async def _fetch(self, batch_key: Tuple[str, str], futures: Dict[str, asyncio.Future]):
+        table, id_column = batch_key
+        try:
+            data = await SupabaseQueries(self.client).select_in(table, id_column, list(futures))
+            rows = {str(row[id_column]): row for row in data}
+            logger.info(f"Batch loaded {len(rows)}/{len(futures)} records from {table}")
+            if reference_cache.handles(table, id_column):
+                reference_cache.put_many(table, data)
+        except Exception as e:
+            logger.error(f"Error batch loading from {table}: {e}")
+            cached = self._cache.get(batch_key, {})
+            for key, future in futures.items():
+                cached.pop(key, None)
+                if not future.done():
+                    future.set_exception(
+                        Exception(f"Failed to select from {table}: {str(e)}")
+                    )
+            return
+
+        for key, future in futures.items():
+            if not future.done():
+                future.set_result(rows.get(key))
+
+
+# ============================================
+# KEYSET CURSORS
+# ============================================
+
+def encode_cursor(order_value: Any, key_value: Any) -> str:
+    """
+    Build an opaque cursor pointing just after a row
+
+    Args:
+        order_value: Value of the row's order_by column (None if unordered)
+        key_value: Value of the row's primary key
+
+    Returns:
+        str: URL-safe token to hand back to the client
+    """
+    raw = json.dumps([order_value, key_value], default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """
+    Decode a cursor produced by `encode_cursor`
+
+    Args:
+        cursor: Token received from the client
+
+    Returns:
+        tuple: (order_value, key_value)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        order_value, key_value = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return order_value, key_value
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _filter_literal(value: Any) -> str:
+    # Double-quote values inside or=() trees so commas, dots and
+    # parentheses in names do not break the PostgREST parser
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def _keyset_filter(
+    order_by: Optional[str],
+    key_column: str,
+    order_value: Any,
+    key_value: Any,
+    ascending: bool
+) -> str:
+    """Build the or=() condition selecting rows after (order_value, key_value)"""
+    op = "gt" if ascending else "lt"
+    key_after = f"{key_column}.{op}.{_filter_literal(key_value)}"
+
+    if not order_by:
+        return key_after
+
+    # Postgres sorts NULLs last for ASC and first for DESC
+    if order_value is None:
+        tie = f"and({order_by}.is.null,{key_after})"
+        return tie if ascending else f"{order_by}.not.is.null,{tie}"
+
+    literal = _filter_literal(order_value)
+    conditions = [
+        f"{order_by}.{op}.{literal}",
+        f"and({order_by}.eq.{literal},{key_after})"
+    ]
+    if ascending:
+        conditions.append(f"{order_by}.is.null")
+    return ",".join(conditions)
+
+
+def _apply_or(query: Any, conditions: str) -> Any:
+    # postgrest-py 0.13 (pinned by supabase 2.3) has no or_() builder
+    query.params = query.params.add("or", f"({conditions})")
+    return query
+
+
+async def _select_pages(build: Callable[[], Any], key_column: str) -> List[Dict[str, Any]]:
+    # PostgREST silently truncates every response at max-rows, so reads that
+    # can exceed it walk the key in pages of DB_MAX_ROWS instead
+    page_size = settings.DB_MAX_ROWS
+    rows: List[Dict[str, Any]] = []
+    after = None
+    while True:
+        query = build()
+        if after is not None:
+            query = query.gt(key_column, after)
+        page = (await run_query(query.order(key_column).limit(page_size))).data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        after = page[-1][key_column]
+
+
+def _sort_rows(rows: List[Dict[str, Any]], order_by: str, ascending: bool) -> List[Dict[str, Any]]:
+    # Same NULL placement as Postgres: last for ASC, first for DESC
+    present = [r for r in rows if r.get(order_by) is not None]
+    missing = [r for r in rows if r.get(order_by) is None]
+    present.sort(key=lambda r: r[order_by], reverse=not ascending)
+    return present + missing if ascending else missing + present
+
+
 # ============================================
 # HELPER CLASS FOR COMMON QUERIES
 # ============================================
@@ -80,14 +712,30 @@ class SupabaseQueries:
             client: Optional Supabase client. If not provided, creates a new one.
         """
         self.client = client or get_supabase_client()
-    
+        self._loader: Optional[BatchLoader] = None
+
+    @staticmethod
+    def _invalidate_reference(table: str, id_column: Optional[str] = None, id_value: Any = None):
+        # Keep the reference cache in step with writes: drop a single row
+        # for primary-key writes, the whole table when we cannot tell
+        # which rows changed
+        if table not in REFERENCE_TABLES:
+            return
+        if id_value is not None and reference_cache.handles(table, id_column):
+            reference_cache.invalidate(table, id_value)
+        else:
+            reference_cache.invalidate(table)
+
     # ============================================
     # CREATE OPERATIONS
     # ============================================
     
     async def insert_one(self, table: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         try:
-            response = self.client.table(table).insert(data).execute()
+            response = await run_query(self.client.table(table).insert(data))
+            
+            if table in REFERENCE_TABLES:
+                reference_cache.put_many(table, response.data or [])
             
             if response.data and len(response.data) > 0:
                 logger.info(f"Inserted record into {table}")
@@ -121,7 +769,9 @@ class SupabaseQueries:
             ... ])
         """
         try:
-            response = self.client.table(table).insert(data).execute()
+            response = await run_query(self.client.table(table).insert(data))
+            if table in REFERENCE_TABLES:
+                reference_cache.put_many(table, response.data)
             logger.info(f"Bulk inserted {len(response.data)} records into {table}")
             return response.data
             
@@ -129,6 +779,45 @@ class SupabaseQueries:
             logger.error(f"Error bulk inserting into {table}: {e}")
             raise Exception(f"Failed to bulk insert into {table}: {str(e)}")
     
+    async def upsert_many(
+        self,
+        table: str,
+        data: List[Dict[str, Any]],
+        on_conflict: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert records, updating the existing ones that share a unique key
+        
+        One request however many rows. All rows must have the same keys
+        (PostgREST takes the columns from the first one).
+        
+        Args:
+            table: Table name
+            data: List of dictionaries containing the data to write
+            on_conflict: Comma-separated columns of a unique constraint
+            
+        Returns:
+            list: Inserted and updated records
+            
+        Raises:
+            Exception: If the upsert operation fails
+            
+        Example:
+            >>> marks = await db.upsert_many("marks", [
+            ...     {"exam_id": exam_id, "student_id": student_id, "marks_scored": 42, "remarks": None}
+            ... ], on_conflict="exam_id,student_id")
+        """
+        try:
+            response = await run_query(self.client.table(table).upsert(data, on_conflict=on_conflict))
+            if table in REFERENCE_TABLES:
+                reference_cache.put_many(table, response.data)
+            logger.info(f"Upserted {len(response.data)} records into {table}")
+            return response.data
+            
+        except Exception as e:
+            logger.error(f"Error upserting into {table}: {e}")
+            raise Exception(f"Failed to upsert into {table}: {str(e)}")
+    
     # ============================================
     # READ OPERATIONS
     # ============================================
@@ -139,17 +828,25 @@ class SupabaseQueries:
         filters: Optional[Dict[str, Any]] = None,
         order_by: Optional[str] = None,
         ascending: bool = True,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        columns: str = "*",
+        page_by: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Select all records from a table with optional filters
         
+        A single response is capped at PostgREST max-rows; pass `page_by`
+        (a unique column, included in `columns`) when the table can hold more
+        matching rows, and they are read in keyset pages of DB_MAX_ROWS.
+        
         Args:
             table: Table name
             filters: Dictionary of column:value pairs to filter by
             order_by: Column name to order results by
             ascending: Sort direction (True for ASC, False for DESC)
             limit: Maximum number of records to return
+            columns: Columns to return (PostgREST select syntax)
+            page_by: Unique column to page by, so no rows are cut at max-rows
             
         Returns:
             list: List of records matching the criteria
@@ -161,14 +858,35 @@ class SupabaseQueries:
             ...     filters={"class_id": "some-uuid"},
             ...     order_by="name"
             ... )
+            >>> # Only the ids
+            >>> rows = await db.select_all(
+            ...     "students",
+            ...     filters={"class_id": "some-uuid"},
+            ...     columns="student_id"
+            ... )
+            >>> # Every student of the school, however many
+            >>> rows = await db.select_all(
+            ...     "students",
+            ...     columns="student_id, name",
+            ...     page_by="student_id"
+            ... )
         """
         try:
-            query = self.client.table(table).select("*")
-            
-            # Apply filters
-            if filters:
-                for key, value in filters.items():
+            def build() -> Any:
+                query = self.client.table(table).select(columns)
+                for key, value in (filters or {}).items():
                     query = query.eq(key, value)
+                return query
+            
+            if page_by:
+                rows = await _select_pages(build, page_by)
+                if order_by:
+                    rows = _sort_rows(rows, order_by, ascending)
+                rows = rows[:limit] if limit else rows
+                logger.info(f"Selected {len(rows)} records from {table} in pages")
+                return rows
+            
+            query = build()
             
             # Apply ordering
             if order_by:
@@ -178,7 +896,7 @@ class SupabaseQueries:
             if limit:
                 query = query.limit(limit)
             
-            response = query.execute()
+            response = await run_query(query)
             logger.info(f"Selected {len(response.data)} records from {table}")
             return response.data
             
@@ -190,7 +908,8 @@ class SupabaseQueries:
         self, 
         table: str, 
         id_column: str, 
-        id_value: Any
+        id_value: Any,
+        columns: str = "*"
     ) -> Optional[Dict[str, Any]]:
         """
         Select a single record by its ID
@@ -199,6 +918,7 @@ class SupabaseQueries:
             table: Table name
             id_column: Name of the ID column (e.g., "student_id")
             id_value: Value of the ID to search for
+            columns: Columns to return (PostgREST select syntax)
             
         Returns:
             dict: The record if found, None otherwise
@@ -210,11 +930,19 @@ class SupabaseQueries:
             ...     "uuid-here"
             ... )
         """
+        cacheable = columns == "*" and reference_cache.handles(table, id_column)
+        if cacheable:
+            cached = reference_cache.get(table, id_value)
+            if cached is not None:
+                return cached
+        
         try:
-            response = self.client.table(table).select("*").eq(id_column, id_value).execute()
+            response = await run_query(self.client.table(table).select(columns).eq(id_column, id_value))
             
             if response.data and len(response.data) > 0:
                 logger.info(f"Found record in {table} with {id_column}={id_value}")
+                if cacheable:
+                    reference_cache.put(table, response.data[0])
                 return response.data[0]
             else:
                 logger.info(f"No record found in {table} with {id_column}={id_value}")
@@ -223,11 +951,50 @@ class SupabaseQueries:
         except Exception as e:
             logger.error(f"Error selecting from {table} by ID: {e}")
             raise Exception(f"Failed to select from {table}: {str(e)}")
-    
+
+    @property
+    def loader(self) -> BatchLoader:
+        """Batch loader scoped to this SupabaseQueries instance"""
+        if self._loader is None:
+            self._loader = BatchLoader(self.client)
+        return self._loader
+
+    async def load_by_id(
+        self,
+        table: str,
+        id_column: str,
+        id_value: Any
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Select a single record by its ID through the batch loader
+
+        Lookups issued concurrently (e.g. from `asyncio.gather`) are merged
+        into one `in_()` query per table, and repeated IDs are served from
+        the loader's memo.
+
+        Args:
+            table: Table name
+            id_column: Name of the ID column (e.g., "student_id")
+            id_value: Value of the ID to search for
+
+        Returns:
+            dict: The record if found, None otherwise
+
+        Example:
+            >>> students = await asyncio.gather(*(
+            ...     db.load_by_id("students", "student_id", m["student_id"])
+            ...     for m in marks
+            ... ))
+        """
+        if id_value is None:
+            return None
+        return await self.loader.load(table, id_column, id_value)
+
     async def select_one(
         self, 
         table: str, 
-        filters: Dict[str, Any]
+        filters: Dict[str, Any],
+        columns: str = "*"
     ) -> Optional[Dict[str, Any]]:
         """
         Select a single record matching the filters
@@ -235,6 +1002,7 @@ class SupabaseQueries:
         Args:
             table: Table name
             filters: Dictionary of column:value pairs to filter by
+            columns: Columns to return (PostgREST select syntax)
             
         Returns:
             dict: The first matching record, None if no match
@@ -246,12 +1014,12 @@ class SupabaseQueries:
             ... )
         """
         try:
-            query = self.client.table(table).select("*")
+            query = self.client.table(table).select(columns)
             
             for key, value in filters.items():
                 query = query.eq(key, value)
             
-            response = query.limit(1).execute()
+            response = await run_query(query.limit(1))
             
             if response.data and len(response.data) > 0:
                 return response.data[0]
@@ -260,6 +1028,171 @@ class SupabaseQueries:
         except Exception as e:
             logger.error(f"Error selecting one from {table}: {e}")
             raise Exception(f"Failed to select from {table}: {str(e)}")
+
+    async def select_in(
+        self,
+        table: str,
+        column: str,
+        values: List[Any],
+        filters: Optional[Dict[str, Any]] = None,
+        columns: str = "*",
+        order_by: Optional[str] = None,
+        ascending: bool = True,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        refine: Optional[Callable[[Any], Any]] = None,
+        chunk_size: Optional[int] = None,
+        page_by: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Select records whose column is in a (possibly very large) list of values
+        
+        The values are split into chunks of IN_FILTER_CHUNK_SIZE so the URL
+        stays bounded, and the chunk queries run concurrently. Each chunk
+        fetches at most `offset + limit` rows; the merged result is re-sorted
+        and windowed, so ordering and limit/offset behave as for a single
+        query (NULLs last for ASC, first for DESC, like Postgres).
+        
+        With `page_by` (a unique column, included in `columns`) each chunk is
+        read in keyset pages of DB_MAX_ROWS, so chunks matching more rows than
+        PostgREST max-rows are not truncated.
+        
+        Args:
+            table: Table name
+            column: Column to match against `values`
+            values: Values to match (duplicates are ignored)
+            filters: Dictionary of column:value pairs to filter by
+            columns: Columns to return (PostgREST select syntax)
+            order_by: Column name to order results by
+            ascending: Sort direction (True for ASC, False for DESC)
+            limit: Maximum number of records to return
+            offset: Number of records to skip
+            refine: Callable applying extra filters (gte, lte, ...) to each chunk query
+            chunk_size: Override IN_FILTER_CHUNK_SIZE
+            page_by: Unique column to page each chunk by, so no rows are cut at max-rows
+            
+        Returns:
+            list: List of records matching the criteria
+            
+        Example:
+            >>> records = await db.select_in(
+            ...     "attendance", "student_id", student_ids,
+            ...     columns="status",
+            ...     refine=lambda q: q.gte("date", "2024-01-01")
+            ... )
+        """
+        unique_values = list(dict.fromkeys(values))
+        if not unique_values or limit == 0:
+            return []
+        
+        size = chunk_size or settings.IN_FILTER_CHUNK_SIZE
+        chunks = [unique_values[i:i + size] for i in range(0, len(unique_values), size)]
+        window = offset + limit if limit is not None else None
+        
+        def filtered(chunk: List[Any]) -> Any:
+            query = self.client.table(table).select(columns).in_(column, chunk)
+            for key, value in (filters or {}).items():
+                query = query.eq(key, value)
+            return refine(query) if refine else query
+        
+        def build(chunk: List[Any]) -> Any:
+            query = filtered(chunk)
+            if order_by:
+                query = query.order(order_by, desc=not ascending)
+            if len(chunks) == 1:
+                if limit is not None:
+                    query = query.limit(limit)
+                return query.offset(offset) if offset else query
+            return query.limit(window) if window is not None else query
+        
+        try:
+            if page_by:
+                pages = await asyncio.gather(*(
+                    _select_pages(lambda chunk=chunk: filtered(chunk), page_by) for chunk in chunks
+                ))
+                rows = [row for page in pages for row in page]
+                if order_by:
+                    rows = _sort_rows(rows, order_by, ascending)
+                rows = rows[offset:window]
+                logger.info(f"Selected {len(rows)} records from {table} in {len(chunks)} paged chunks")
+                return rows
+            
+            responses = await asyncio.gather(*(run_query(build(chunk)) for chunk in chunks))
+            if len(chunks) == 1:
+                return responses[0].data
+            
+            rows = [row for response in responses for row in response.data]
+            if order_by:
+                rows = _sort_rows(rows, order_by, ascending)
+            rows = rows[offset:window]
+            logger.info(f"Selected {len(rows)} records from {table} in {len(chunks)} chunks")
+            return rows
+            
+        except Exception as e:
+            logger.error(f"Error selecting from {table} by {column} list: {e}")
+            raise Exception(f"Failed to select from {table}: {str(e)}")
+    
+    # ============================================
+    # AGGREGATES
+    # ============================================
+    
+    async def aggregate(
+        self,
+        table: str,
+        group_by: Optional[List[str]] = None,
+        metrics: Optional[Dict[str, str]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        conditions: Optional[List[Tuple[str, str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Group and aggregate rows in the database (rpc/aggregate_rows)
+        
+        Only one row per group crosses the network, however many rows match.
+        Filters travel in the request body, so `in` lists of any size are fine.
+        
+        Args:
+            table: Table name
+            group_by: Columns to group by (None for a single total row)
+            metrics: Output name -> "count", "count:col", "sum:col",
+                "avg:col", "min:col" or "max:col" (default {"count": "count"})
+            filters: Dictionary of column:value pairs (list values mean `in`)
+            conditions: Extra (column, op, value) filters, op one of
+                eq, neq, gt, gte, lt, lte, in, is
+            
+        Returns:
+            list: One dict per group with the group columns and metrics
+            
+        Example:
+            >>> await db.aggregate(
+            ...     "fees",
+            ...     group_by=["status"],
+            ...     metrics={"count": "count", "expected": "sum:amount"},
+            ...     filters={"academic_year": "2024-25"}
+            ... )
+            [{"status": "paid", "count": 120, "expected": 600000}, ...]
+        """
+        filter_list = [
+            {"column": column, "op": "in" if isinstance(value, (list, tuple, set)) else "eq",
+             "value": list(value) if isinstance(value, (list, tuple, set)) else value}
+            for column, value in (filters or {}).items()
+        ]
+        filter_list += [
+            {"column": column, "op": op, "value": list(value) if op == "in" else value}
+            for column, op, value in conditions or []
+        ]
+        
+        try:
+            response = await run_query(self.client.rpc("aggregate_rows", {
+                "p_table": table,
+                "p_group_by": group_by or [],
+                "p_metrics": metrics or {"count": "count"},
+                "p_filters": filter_list
+            }))
+            return response.data or []
+            
+        except Exception as e:
+            logger.error(f"Error aggregating {table}: {e}")
+            raise Exception(f"Failed to aggregate {table}: {str(e)}")
     
     # ============================================
     # UPDATE OPERATIONS
@@ -293,7 +1226,10 @@ class SupabaseQueries:
             ... )
         """
         try:
-            response = self.client.table(table).update(data).eq(id_column, id_value).execute()
+            response = await run_query(self.client.table(table).update(data).eq(id_column, id_value))
+            self._invalidate_reference(table, id_column, id_value)
+            if table in REFERENCE_TABLES:
+                reference_cache.put_many(table, response.data or [])
             
             if response.data and len(response.data) > 0:
                 logger.info(f"Updated record in {table} with {id_column}={id_value}")
@@ -337,7 +1273,8 @@ class SupabaseQueries:
             for key, value in filters.items():
                 query = query.eq(key, value)
             
-            response = query.execute()
+            response = await run_query(query)
+            self._invalidate_reference(table)
             logger.info(f"Updated {len(response.data)} records in {table}")
             return response.data
             
@@ -374,7 +1311,8 @@ class SupabaseQueries:
             ... )
         """
         try:
-            response = self.client.table(table).delete().eq(id_column, id_value).execute()
+            response = await run_query(self.client.table(table).delete().eq(id_column, id_value))
+            self._invalidate_reference(table, id_column, id_value)
             logger.info(f"Deleted record from {table} with {id_column}={id_value}")
             return response.data
             
@@ -410,7 +1348,8 @@ class SupabaseQueries:
             for key, value in filters.items():
                 query = query.eq(key, value)
             
-            response = query.execute()
+            response = await run_query(query)
+            self._invalidate_reference(table)
             logger.info(f"Deleted {len(response.data)} records from {table}")
             return response.data
             
@@ -429,21 +1368,45 @@ class SupabaseQueries:
         page_size: int = 20,
         filters: Optional[Dict[str, Any]] = None,
         order_by: Optional[str] = None,
-        ascending: bool = True
+        ascending: bool = True,
+        columns: str = "*",
+        key_column: Optional[str] = None,
+        cursor: Optional[str] = None,
+        count: Optional[str] = "exact"
     ) -> Dict[str, Any]:
         """
         Paginate records from a table
         
+        Two modes are supported:
+        - Offset (default): `page`/`page_size` translated to a range. Cost
+          grows with the page number.
+        - Keyset: pass `key_column` (the primary key) and the `cursor` from
+          the previous page. Rows are read with a WHERE on
+          (order_by, key_column), so every page costs the same.
+        
+        When `key_column` is given, both modes return a `next_cursor`, so a
+        client can start with page 1 and continue with cursors.
+        
         Args:
             table: Table name
-            page: Page number (1-indexed)
+            page: Page number (1-indexed), ignored when `cursor` is given
             page_size: Number of records per page
             filters: Optional filters to apply
             order_by: Column to order by
             ascending: Sort direction
+            columns: Columns to return (must include order_by/key_column
+                when paginating by cursor)
+            key_column: Unique tie-breaker column, enables cursors
+            cursor: Opaque token from a previous page's `next_cursor`
+            count: "exact", "planned", "estimated" or None to skip counting
             
         Returns:
-            dict: Contains 'data', 'count', 'page', 'page_size', 'total_pages'
+            dict: Contains 'data', 'count', 'page', 'page_size',
+                'total_pages' and 'next_cursor'. 'count' and
+                'total_pages' are None when counting is disabled.
+            
+        Raises:
+            ValueError: If the cursor is malformed
             
         Example:
             >>> result = await db.paginate(
@@ -456,39 +1419,80 @@ class SupabaseQueries:
             >>> print(f"Total: {result['count']}, Page: {result['page']}")
             >>> for student in result['data']:
             ...     print(student['name'])
+            >>> # Constant-cost scrolling
+            >>> result = await db.paginate(
+            ...     "students",
+            ...     page_size=50,
+            ...     order_by="name",
+            ...     key_column="student_id",
+            ...     cursor=previous["next_cursor"],
+            ...     count=None
+            ... )
         """
+        if cursor is not None and not key_column:
+            raise ValueError("Cursor pagination requires key_column")
+        after = decode_cursor(cursor) if cursor else None
+        
         try:
-            # Calculate range for pagination
-            start = (page - 1) * page_size
-            end = start + page_size - 1
-            
-            # Build query with count
-            query = self.client.table(table).select("*", count="exact")
+            # Build query, with a count only if requested
+            if count:
+                query = self.client.table(table).select(columns, count=count)
+            else:
+                query = self.client.table(table).select(columns)
             
             # Apply filters
             if filters:
                 for key, value in filters.items():
                     query = query.eq(key, value)
             
-            # Apply ordering
-            if order_by:
-                query = query.order(order_by, desc=not ascending)
+            # Apply ordering. The key column makes the order total; it has
+            # to go in the same order= parameter because postgrest-py emits
+            # one parameter per .order() call.
+            sort_columns = list(dict.fromkeys(c for c in (order_by, key_column) if c))
+            if sort_columns:
+                direction = "asc" if ascending else "desc"
+                query.params = query.params.add(
+                    "order", ",".join(f"{c}.{direction}" for c in sort_columns)
+                )
             
-            # Apply pagination range
-            response = query.range(start, end).execute()
+            # Fetch one extra row to know whether another page exists
+            fetch_size = page_size + 1 if key_column else page_size
+            # (limit/offset rather than range(): postgrest-py treats the
+            # range end as exclusive, which made every page one row short)
+            if after is not None:
+                query = _apply_or(query, _keyset_filter(order_by, key_column, after[0], after[1], ascending))
+                response = await run_query(query.limit(fetch_size))
+            else:
+                start = (page - 1) * page_size
+                response = await run_query(query.limit(fetch_size).offset(start))
+            
+            rows = response.data
+            next_cursor = None
+            if key_column and len(rows) > page_size:
+                rows = rows[:page_size]
+                last = rows[-1]
+                next_cursor = encode_cursor(
+                    last.get(order_by) if order_by else None,
+                    last[key_column]
+                )
             
             # Calculate total pages
-            total_count = response.count if response.count else 0
-            total_pages = (total_count + page_size - 1) // page_size if total_count > 0 else 0
+            if count:
+                total_count = response.count if response.count else 0
+                total_pages = (total_count + page_size - 1) // page_size if total_count > 0 else 0
+            else:
+                total_count = None
+                total_pages = None
             
-            logger.info(f"Paginated {table}: page {page}/{total_pages}, {len(response.data)} records")
+            logger.info(f"Paginated {table}: page {page}/{total_pages}, {len(rows)} records")
             
             return {
-                "data": response.data,
+                "data": rows,
                 "count": total_count,
                 "page": page,
                 "page_size": page_size,
-                "total_pages": total_pages
+                "total_pages": total_pages,
+                "next_cursor": next_cursor
             }
             
         except Exception as e:
@@ -507,6 +1511,8 @@ class SupabaseQueries:
         """
         Count records in a table
         
+        Issued as a HEAD request, so no rows are transferred.
+        
         Args:
             table: Table name
             filters: Optional filters to apply
@@ -522,14 +1528,15 @@ class SupabaseQueries:
             ... )
         """
         try:
-            query = self.client.table(table).select("*", count="exact")
+            query = self.client.table(table).select(count="exact")
             
             if filters:
                 for key, value in filters.items():
                     query = query.eq(key, value)
             
-            response = query.limit(0).execute()
-            count = response.count if response.count else 0
+            content_range = await run_head(query)
+            total = content_range.rsplit("/", 1)[-1]
+            count = int(total) if total.isdigit() else 0
             
             logger.info(f"Counted {count} records in {table}")
             return count
@@ -546,6 +1553,9 @@ class SupabaseQueries:
         """
         Check if a record exists
         
+        Issued as a HEAD request limited to one row and without a count,
+        so the database can stop at the first match.
+        
         Args:
             table: Table name
             filters: Dictionary of column:value pairs to check
@@ -560,13 +1570,14 @@ class SupabaseQueries:
             ... )
         """
         try:
-            query = self.client.table(table).select("*")
+            query = self.client.table(table).select()
             
             for key, value in filters.items():
                 query = query.eq(key, value)
             
-            response = query.limit(1).execute()
-            exists = len(response.data) > 0
+            # Content-Range is "0-0/*" when a row matched and "*/*" otherwise
+            content_range = await run_head(query.limit(1))
+            exists = bool(content_range) and not content_range.startswith("*")
             
             logger.info(f"Record {'exists' if exists else 'does not exist'} in {table}")
             return exists
@@ -589,9 +1600,9 @@ class SupabaseQueries:
         Example:
             >>> db = SupabaseQueries()
             >>> # Complex custom query
-            >>> response = db.raw_query().table("students").select(
+            >>> response = await run_query(db.raw_query().table("students").select(
             ...     "*, classes(class_name), marks(marks_scored)"
-            ... ).eq("class_id", "uuid").execute()
+            ... ).eq("class_id", "uuid"))
         """
         return self.client
 
@@ -610,7 +1621,7 @@ async def test_connection() -> bool:
     try:
         client = get_supabase_client()
         # Try a simple query
-        response = client.table("users").select("user_id").limit(1).execute()
+        response = await run_query(client.table("users").select("user_id").limit(1))
         logger.info("✓ Supabase connection test successful")
         return True
     except Exception as e:
@@ -657,7 +1668,16 @@ async def initialize_database():
 __all__ = [
     'get_supabase_client',
     'get_supabase_admin_client',
+    'close_supabase_clients',
+    'connection_pool_stats',
     'SupabaseQueries',
+    'QueryExecutor',
+    'query_executor',
+    'run_query',
+    'run_head',
+    'encode_cursor',
+    'decode_cursor',
+    'BatchLoader',
     'test_connection',
     'initialize_database'
 ]
\ No newline at end of file
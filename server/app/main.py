@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from contextlib import asynccontextmanager
@@ -8,8 +8,20 @@ from app.api.v1.endpoints import auth, students, teachers, parents, classes
 from app.api.v1.endpoints import admin
 from app.api.v1.endpoints import attendance, exams, marks, homework, fees
 from app.api.v1.endpoints import timetable, announcements, leave_requests, dashboard
+from app.api.v1.endpoints import reports
 from app.core.config import settings
-from app.db.supabase import get_supabase_client
+from app.models.schemas import TokenPayload
+from app.core.security import password_hasher, token_cache, require_admin
+from app.core.dependencies import principal_cache
+from app.core.rate_limit import login_throttle
+from app.db.instrumentation import start_request_stats, finish_request_stats, route_metrics
+from app.db.cache import reference_cache
+from app.services.attendance_index import attendance_index
+from app.services.exam_analytics import exam_analytics_cache
+from app.services.report_service import report_renderer
+from app.db.supabase import (
+    get_supabase_client, close_supabase_clients, connection_pool_stats, query_executor
+)
 
 # Configure logging
 logging.basicConfig(
@@ -36,6 +48,10 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down School Management System API...")
+    query_executor.shutdown()
+    password_hasher.shutdown()
+    report_renderer.shutdown()
+    close_supabase_clients()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -54,8 +70,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Server-Timing", "X-DB-Queries", "Idempotent-Replayed"],
 )
 
+# Database instrumentation: query count/latency per request and N+1 detection
+@app.middleware("http")
+async def db_instrumentation(request: Request, call_next):
+    stats = start_request_stats()
+    response = await call_next(request)
+    
+    route = request.scope.get("route")
+    route_name = f"{request.method} {route.path}" if route else "unmatched"
+    finish_request_stats(route_name, stats, settings.DB_N_PLUS_ONE_THRESHOLD)
+    
+    response.headers["Server-Timing"] = stats.server_timing()
+    response.headers["X-DB-Queries"] = str(stats.queries)
+    return response
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -66,6 +97,25 @@ async def health_check():
         "environment": settings.ENVIRONMENT
     }
 
+@app.get("/health/stats")
+async def health_stats(current_user: TokenPayload = Depends(require_admin)):
+    """Runtime statistics for the database execution layer and authentication (Admin only)"""
+    return {
+        "database": {
+            "executor": query_executor.stats(),
+            "pool": connection_pool_stats(),
+            "reference_cache": reference_cache.stats()
+        },
+        "password_hasher": password_hasher.stats(),
+        "token_cache": token_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "login_throttle": login_throttle.stats(),
+        "attendance_index": attendance_index.stats(),
+        "exam_analytics_cache": exam_analytics_cache.stats(),
+        "report_renderer": report_renderer.stats(),
+        "routes": route_metrics.snapshot()
+    }
+
 # Include API routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin Management (Master)"])
@@ -82,6 +132,7 @@ app.include_router(timetable.router, prefix="/api/v1/timetable", tags=["Timetabl
 app.include_router(announcements.router, prefix="/api/v1/announcements", tags=["Announcements"])
 app.include_router(leave_requests.router, prefix="/api/v1/leave-requests", tags=["Leave Requests"])
 app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["Dashboard"])
+app.include_router(reports.router, prefix="/api/v1/reports", tags=["Reports"])
 
 @app.get("/")
 async def root():
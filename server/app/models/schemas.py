@@ -77,6 +77,29 @@ class TokenPayload(BaseModel):
     sub: str  # Changed from UUID to str
     role: UserRole
     exp: datetime
+    # Scope claims (access tokens minted by login/refresh); absent on older tokens
+    scope_version: Optional[int] = None
+    student_id: Optional[str] = None
+    teacher_id: Optional[str] = None
+    parent_id: Optional[str] = None
+    child_ids: List[str] = []
+    class_ids: List[str] = []
+
+
+class Principal(BaseModel):
+    """The caller's identity resolved to their profile rows"""
+    user_id: str
+    role: UserRole
+    student_id: Optional[str] = None
+    teacher_id: Optional[str] = None
+    parent_id: Optional[str] = None
+    child_ids: List[str] = []  # parents: linked students
+    class_ids: List[str] = []  # students: own class, parents: children's classes
+
+    @property
+    def student_ids(self) -> List[str]:
+        """Students whose records the caller may see (own record or children)"""
+        return [self.student_id] if self.student_id else list(self.child_ids)
 
 
 class Token(BaseModel):
@@ -410,6 +433,18 @@ class FeePayment(BaseModel):
     transaction_id: Optional[str] = None
 
 
+class FeePaymentRecord(BaseModel):
+    payment_id: str
+    fee_id: str
+    amount: float
+    payment_method: str
+    transaction_id: Optional[str] = None
+    recorded_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    model_config = {"from_attributes": True}
+
+
 class FeeResponse(FeeBase):
     fee_id: str
     student_name: Optional[str] = None
@@ -0,0 +1,407 @@
+"""
+app/services/attendance_index.py
+Bit-packed in-memory attendance index for range analytics
+"""
+from datetime import date, timedelta
+from typing import Optional, Dict, List, Any, Iterable, Tuple, Union
+from app.core.config import settings
+from app.db.supabase import SupabaseQueries, run_query
+from app.services.attendance_rollups import academic_year
+import asyncio
+import time
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 2-bit status codes, stored as two bit planes (low / high bit)
+STATUS_CODES = {"present": 0, "absent": 1, "late": 2, "excused": 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+# Set bits per byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+DateLike = Union[date, str]
+
+
+def _as_date(day: DateLike) -> date:
+    return day if isinstance(day, date) else date.fromisoformat(str(day)[:10])
+
+
+def year_bounds(year: str) -> Tuple[date, date]:
+    """
+    First and last date of an academic year label
+
+    Args:
+        year: e.g. "2026-27"
+
+    Returns:
+        tuple: (first day, last day)
+    """
+    start_year = int(year[:4])
+    first = date(start_year, settings.ACADEMIC_YEAR_START_MONTH, 1)
+    return first, date(start_year + 1, settings.ACADEMIC_YEAR_START_MONTH, 1) - timedelta(days=1)
+
+
+# ============================================
+# INDEX
+# ============================================
+
+class AttendanceIndex:
+    """
+    One academic year of attendance, one bit-packed row per student
+
+    Days are addressed by their ordinal from the first day of the year.
+    Three packed bit planes of (students x days) hold the status code of
+    each day (low and high bit, see STATUS_CODES) and whether the day was
+    recorded at all, i.e. 3 bits per student-day (~140 bytes per student
+    per year). Days nobody was marked on (weekends, holidays) are simply
+    never set.
+
+    Queries select the rows of the requested students and mask the byte
+    range of the requested dates, so a whole-school query is a handful of
+    numpy operations over a few hundred KB. Instances are not
+    thread-safe; they are used from the event loop.
+    """
+
+    def __init__(self, year: str, capacity: int = 256):
+        """
+        Initialize AttendanceIndex
+
+        Args:
+            year: Academic year label, e.g. "2026-27"
+            capacity: Student rows to allocate up front (grows as needed)
+        """
+        self.year = year
+        self.first_day, self.last_day = year_bounds(year)
+        self.days = (self.last_day - self.first_day).days + 1
+        self.width = (self.days + 7) // 8
+        self._rows: Dict[str, int] = {}
+        self._marked = np.zeros((capacity, self.width), dtype=np.uint8)
+        self._low = np.zeros_like(self._marked)
+        self._high = np.zeros_like(self._marked)
+
+    # --- Writes -------------------------------
+
+    def _ordinal(self, day: DateLike) -> int:
+        ordinal = (_as_date(day) - self.first_day).days
+        if not 0 <= ordinal < self.days:
+            raise ValueError(f"{day} is outside academic year {self.year}")
+        return ordinal
+
+    def _row(self, student_id: str) -> int:
+        row = self._rows.get(student_id)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self._marked):
+                grow = lambda plane: np.vstack([plane, np.zeros_like(plane)])
+                self._marked, self._low, self._high = grow(self._marked), grow(self._low), grow(self._high)
+            self._rows[student_id] = row
+        return row
+
+    def set(self, student_id: str, day: DateLike, status: str):
+        """Record a student's status on a day (replaces an earlier one)"""
+        code = STATUS_CODES.get(getattr(status, "value", status))
+        if code is None:
+            return
+        row, ordinal = self._row(student_id), self._ordinal(day)
+        byte, bit = ordinal >> 3, np.uint8(1 << (ordinal & 7))
+        self._marked[row, byte] |= bit
+        for plane, on in ((self._low, code & 1), (self._high, code & 2)):
+            if on:
+                plane[row, byte] |= bit
+            else:
+                plane[row, byte] &= ~bit
+
+    def set_many(self, records: List[Dict[str, Any]]):
+        """
+        Record many attendance rows at once (vectorised, for bulk loads)
+
+        Args:
+            records: Rows with student_id, date and status
+        """
+        records = [r for r in records if r.get("status") in STATUS_CODES]
+        if not records:
+            return
+        rows = np.fromiter((self._row(r["student_id"]) for r in records), dtype=np.int64, count=len(records))
+        ordinals = np.fromiter((self._ordinal(r["date"]) for r in records), dtype=np.int64, count=len(records))
+        codes = np.fromiter((STATUS_CODES[r["status"]] for r in records), dtype=np.uint8, count=len(records))
+        where = (rows, ordinals >> 3)
+        bits = (1 << (ordinals & 7)).astype(np.uint8)
+
+        np.bitwise_or.at(self._marked, where, bits)
+        for plane, on in ((self._low, (codes & 1).astype(bool)), (self._high, (codes & 2).astype(bool))):
+            np.bitwise_and.at(plane, where, ~bits)
+            np.bitwise_or.at(plane, (rows[on], ordinals[on] >> 3), bits[on])
+
+    def clear(self, student_id: str, day: DateLike):
+        """Forget a student's status on a day"""
+        row, ordinal = self._rows.get(student_id), self._ordinal(day)
+        if row is not None:
+            bit = np.uint8(1 << (ordinal & 7))
+            for plane in (self._marked, self._low, self._high):
+                plane[row, ordinal >> 3] &= ~bit
+
+    def apply(self, change: Dict[str, Any]):
+        """
+        Apply one attendance change (see attendance_rollups.attendance_change)
+
+        A delta of -1 clears the day, +1 sets it, so an update passed as
+        (-1 old, +1 new) ends with the new status.
+        """
+        if change["delta"] > 0:
+            self.set(change["student_id"], change["date"], change["status"])
+        elif change["delta"] < 0:
+            self.clear(change["student_id"], change["date"])
+
+    # --- Selection ----------------------------
+
+    def _select(self, student_ids: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Row numbers for the students plus a mask of those that have one"""
+        rows = np.fromiter((self._rows.get(s, -1) for s in student_ids), dtype=np.int64, count=len(student_ids))
+        known = rows >= 0
+        return np.where(known, rows, 0), known
+
+    def _range(self, start: Optional[DateLike], end: Optional[DateLike]) -> Tuple[slice, np.ndarray, int, int]:
+        first = self._ordinal(start) if start else 0
+        last = self._ordinal(end) if end else self.days - 1
+        if last < first:
+            raise ValueError("end date is before start date")
+        bits = np.zeros(self.width * 8, dtype=bool)
+        bits[first:last + 1] = True
+        columns = slice(first >> 3, (last >> 3) + 1)
+        mask = np.packbits(bits, bitorder="little")[columns]
+        return columns, mask, first & 7, last - first + 1
+
+    def _planes(self, rows: np.ndarray, known: np.ndarray, columns: slice) -> Tuple[np.ndarray, ...]:
+        planes = [plane[rows, columns] for plane in (self._marked, self._low, self._high)]
+        # Students without a row read as never marked
+        planes[0] = planes[0] * known[:, None].astype(np.uint8)
+        return tuple(planes)
+
+    # --- Queries ------------------------------
+
+    def counts(
+        self,
+        student_ids: List[str],
+        start: Optional[DateLike] = None,
+        end: Optional[DateLike] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Days per status for each student
+
+        Args:
+            student_ids: Students, defining the output order
+            start: First date (default: start of the year)
+            end: Last date (default: end of the year)
+
+        Returns:
+            dict: status -> int array aligned with student_ids, plus "total"
+        """
+        rows, known = self._select(student_ids)
+        columns, mask, _, _ = self._range(start, end)
+        marked, low, high = self._planes(rows, known, columns)
+        marked = marked & mask
+
+        result = {
+            "present": marked & ~low & ~high,
+            "absent": marked & low & ~high,
+            "late": marked & ~low & high,
+            "excused": marked & low & high,
+            "total": marked
+        }
+        return {name: _POPCOUNT[bits].sum(axis=1) for name, bits in result.items()}
+
+    def longest_absence_streak(
+        self,
+        student_ids: List[str],
+        start: Optional[DateLike] = None,
+        end: Optional[DateLike] = None
+    ) -> np.ndarray:
+        """
+        Longest run of consecutive recorded absences per student
+
+        Days without a record (weekends, holidays) neither extend nor break
+        a run; any other recorded status ends it.
+
+        Returns:
+            np.ndarray: Days, aligned with student_ids
+        """
+        rows, known = self._select(student_ids)
+        columns, _, offset, length = self._range(start, end)
+        marked, low, high = self._planes(rows, known, columns)
+        unpack = lambda bits: np.unpackbits(bits, axis=1, bitorder="little")[:, offset:offset + length].astype(bool)
+        marked, low, high = unpack(marked), unpack(low), unpack(high)
+
+        absent = marked & low & ~high
+        breaks = marked & ~absent
+        absences = np.cumsum(absent, axis=1)
+        # Absences counted up to the most recent break, carried forward
+        at_break = np.maximum.accumulate(np.where(breaks, absences, 0), axis=1)
+        runs = absences - at_break
+        return runs.max(axis=1) if length else np.zeros(len(student_ids), dtype=np.int64)
+
+    def snapshot(self, student_ids: List[str], day: DateLike) -> List[Optional[str]]:
+        """
+        Status of each student on one day
+
+        Returns:
+            list: Status name or None (not marked), aligned with student_ids
+        """
+        rows, known = self._select(student_ids)
+        ordinal = self._ordinal(day)
+        byte, bit = ordinal >> 3, ordinal & 7
+        marked = ((self._marked[rows, byte] >> bit) & 1).astype(bool) & known
+        codes = ((self._low[rows, byte] >> bit) & 1) | (((self._high[rows, byte] >> bit) & 1) << 1)
+        return [STATUS_NAMES[int(c)] if m else None for c, m in zip(codes, marked)]
+
+    def absent_on(self, student_ids: List[str], days: Iterable[DateLike]) -> np.ndarray:
+        """
+        Which students were recorded absent on every one of the given days
+
+        Returns:
+            np.ndarray: Boolean mask aligned with student_ids
+        """
+        rows, known = self._select(student_ids)
+        result = known.copy()
+        for day in days:
+            ordinal = self._ordinal(day)
+            byte, bit = ordinal >> 3, ordinal & 7
+            absent = self._marked[rows, byte] & self._low[rows, byte] & ~self._high[rows, byte]
+            result &= ((absent >> bit) & 1).astype(bool)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "students": len(self._rows),
+            "bytes": int(self._marked.nbytes * 3)
+        }
+
+
+# ============================================
+# STORE
+# ============================================
+
+class AttendanceIndexStore:
+    """
+    Lazily built AttendanceIndex per academic year
+
+    An index is loaded from the attendance table on first use and rebuilt
+    after ATTENDANCE_INDEX_TTL_SECONDS, which bounds how long writes made
+    by other workers stay invisible. Writes made by this worker are
+    applied immediately via `apply_changes`, including while a rebuild is
+    in flight.
+    """
+
+    def __init__(self, ttl: float, max_years: int):
+        """
+        Initialize AttendanceIndexStore
+
+        Args:
+            ttl: Seconds before an index is rebuilt
+            max_years: Academic years kept in memory (least recently used dropped)
+        """
+        self.ttl = ttl
+        self.max_years = max_years
+        self._indexes: Dict[str, Tuple[float, AttendanceIndex]] = {}
+        self._building: Dict[str, List[Dict[str, Any]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.builds = 0
+        self.hits = 0
+
+    async def get(self, db: SupabaseQueries, year: str) -> AttendanceIndex:
+        """
+        Index of an academic year, building it if missing or expired
+
+        Args:
+            db: Query helper
+            year: Academic year label, e.g. "2026-27"
+
+        Returns:
+            AttendanceIndex: Current index
+        """
+        entry = self._indexes.get(year)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            self._indexes[year] = self._indexes.pop(year)  # most recently used
+            return entry[1]
+
+        async with self._locks.setdefault(year, asyncio.Lock()):
+            entry = self._indexes.get(year)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+
+            self._building[year] = []
+            try:
+                index = await self._build(db, year)
+                for change in self._building[year]:
+                    index.apply(change)
+            finally:
+                self._building.pop(year, None)
+
+            self._indexes.pop(year, None)
+            self._indexes[year] = (time.monotonic() + self.ttl, index)
+            while len(self._indexes) > self.max_years:
+                self._indexes.pop(next(iter(self._indexes)))
+            self.builds += 1
+            return index
+
+    async def _build(self, db: SupabaseQueries, year: str) -> AttendanceIndex:
+        first, last = year_bounds(year)
+        index = AttendanceIndex(year)
+        page_size = settings.DB_MAX_ROWS
+        started = time.perf_counter()
+        rows, after = 0, None
+
+        # Keyset pages of DB_MAX_ROWS over the year's rows (PostgREST caps
+        # response size), applied as they arrive rather than held as one list
+        while True:
+            query = db.raw_query().table("attendance").select(
+                "attendance_id, student_id, date, status"
+            ).gte("date", str(first)).lte("date", str(last))
+            if after is not None:
+                query = query.gt("attendance_id", after)
+            page = (await run_query(query.order("attendance_id").limit(page_size))).data
+            index.set_many(page)
+            rows += len(page)
+            if len(page) < page_size:
+                break
+            after = page[-1]["attendance_id"]
+
+        logger.info(
+            f"Attendance index {year} built from {rows} rows in {time.perf_counter() - started:.2f}s"
+        )
+        return index
+
+    def apply_changes(self, changes: List[Dict[str, Any]]):
+        """
+        Apply attendance changes made by this worker to the loaded indexes
+
+        Args:
+            changes: Entries from attendance_rollups.attendance_change
+
+        Clears (-1) are applied before sets (+1), so an update ends with the
+        new status whichever order its two entries come in.
+        """
+        for change in sorted(changes, key=lambda c: c["delta"]):
+            year = change.get("academic_year") or academic_year(change["date"])
+            entry = self._indexes.get(year)
+            if entry is not None:
+                entry[1].apply(change)
+            if year in self._building:
+                self._building[year].append(change)
+
+    def clear(self):
+        """Drop all indexes"""
+        self._indexes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "years": {year: index.stats() for year, (_, index) in self._indexes.items()},
+            "ttl_seconds": self.ttl,
+            "builds": self.builds,
+            "hits": self.hits
+        }
+
+
+attendance_index = AttendanceIndexStore(settings.ATTENDANCE_INDEX_TTL_SECONDS, settings.ATTENDANCE_INDEX_MAX_YEARS)
@@ -0,0 +1,197 @@
+"""
+app/services/attendance_rollups.py
+Per-status attendance counts per (class, date) and (student, academic year)
+
+The rollup tables are kept up to date by the attendance endpoints, which
+pass every insert/update/delete through `record_attendance_changes`.
+Read paths sum a few rollup rows instead of counting attendance rows.
+"""
+from datetime import date
+from typing import Optional, Dict, List, Any, Iterable, Union
+from app.core.config import settings
+from app.db.supabase import SupabaseQueries, run_query
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLASS_DAILY = "attendance_class_daily"
+STUDENT_YEARLY = "attendance_student_yearly"
+STATUSES = ("present", "absent", "late", "excused")
+COUNT_COLUMNS = ", ".join(STATUSES)
+
+# ============================================
+# HELPERS
+# ============================================
+
+def academic_year(day: Union[date, str]) -> str:
+    """
+    Academic year label of a date
+
+    Args:
+        day: Date (or ISO date string)
+
+    Returns:
+        str: e.g. "2026-27" for 2026-06-01 .. 2027-05-31 with the default
+             ACADEMIC_YEAR_START_MONTH of 6
+    """
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    start = day.year if day.month >= settings.ACADEMIC_YEAR_START_MONTH else day.year - 1
+    return f"{start}-{str(start + 1)[-2:]}"
+
+
+def attendance_change(record: Dict[str, Any], class_id: Optional[str], delta: int) -> Dict[str, Any]:
+    """
+    One rollup delta for an attendance row
+
+    Args:
+        record: Attendance row (student_id, date, status)
+        class_id: The student's class
+        delta: +1 when the row is added, -1 when it is removed
+
+    Returns:
+        dict: Entry for record_attendance_changes
+    """
+    status = record["status"]
+    return {
+        "class_id": class_id,
+        "student_id": record["student_id"],
+        "date": str(record["date"])[:10],
+        "academic_year": academic_year(record["date"]),
+        "status": getattr(status, "value", status),
+        "delta": delta
+    }
+
+
+def summarize(rows: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Add up rollup rows
+
+    Args:
+        rows: Rows of either rollup table
+
+    Returns:
+        dict: present/absent/late/excused counts plus "total"
+    """
+    counts = {s: 0 for s in STATUSES}
+    for row in rows:
+        for s in STATUSES:
+            counts[s] += row.get(s) or 0
+    counts["total"] = sum(counts.values())
+    return counts
+
+
+def attendance_percentage(counts: Dict[str, int]) -> float:
+    """Present days as a percentage of all marked days (0 when none)"""
+    return round(counts["present"] / counts["total"] * 100, 2) if counts["total"] > 0 else 0
+
+
+# ============================================
+# WRITES
+# ============================================
+
+async def record_attendance_changes(db: SupabaseQueries, changes: List[Dict[str, Any]]):
+    """
+    Apply attendance deltas to the rollups (rpc/apply_attendance_deltas)
+
+    Call after the attendance rows were written. A failure is logged rather
+    than raised, since the attendance change itself has already been
+    stored; POST /attendance/rollups/rebuild repairs the counts.
+
+    Args:
+        db: Query helper
+        changes: Entries from attendance_change
+
+    Example:
+        >>> await record_attendance_changes(db, [
+        ...     attendance_change(old, class_id, -1),
+        ...     attendance_change(new, class_id, +1)
+        ... ])
+    """
+    changes = [c for c in changes if c["delta"]]
+    if not changes:
+        return
+    try:
+        await run_query(db.raw_query().rpc("apply_attendance_deltas", {"p_deltas": changes}))
+    except Exception as e:
+        logger.error(f"Attendance rollup update error (rebuild the rollups to repair): {e}")
+
+
+async def rebuild_attendance_rollups(db: SupabaseQueries, class_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Recompute the rollups from the attendance table
+
+    Args:
+        db: Query helper
+        class_ids: Only these classes and their students (None = all)
+
+    Returns:
+        dict: Number of class_days and student_years rows written
+    """
+    response = await run_query(db.raw_query().rpc("rebuild_attendance_rollups", {
+        "p_class_ids": [c for c in dict.fromkeys(class_ids) if c] if class_ids is not None else None,
+        "p_start_month": settings.ACADEMIC_YEAR_START_MONTH
+    }))
+    logger.info(f"Attendance rollups rebuilt for {'all classes' if class_ids is None else class_ids}")
+    return response.data
+
+
+# ============================================
+# READS
+# ============================================
+
+async def class_attendance_counts(
+    db: SupabaseQueries,
+    class_id: Optional[str] = None,
+    day: Optional[Union[date, str]] = None
+) -> Dict[str, int]:
+    """
+    Attendance counts of one class (or all classes), optionally for one day
+
+    The per-day rollup rows are summed in the database (rpc/aggregate_rows),
+    so one row crosses the network however many school days are counted.
+
+    Args:
+        db: Query helper
+        class_id: Class to count (None = whole school)
+        day: Single date (None = all dates)
+
+    Returns:
+        dict: present/absent/late/excused/total
+    """
+    filters = {}
+    if class_id:
+        filters["class_id"] = class_id
+    if day:
+        filters["date"] = str(day)
+    return summarize(await db.aggregate(
+        CLASS_DAILY, metrics={s: f"sum:{s}" for s in STATUSES}, filters=filters or None
+    ))
+
+
+async def student_attendance_counts(
+    db: SupabaseQueries,
+    student_ids: List[str],
+    year: Optional[str] = None
+) -> Dict[str, Dict[str, int]]:
+    """
+    Attendance counts per student
+
+    Args:
+        db: Query helper
+        student_ids: Students to count
+        year: Academic year label (None = all years)
+
+    Returns:
+        dict: student_id -> present/absent/late/excused/total (zeros for
+              students without attendance)
+    """
+    rows = await db.select_in(
+        STUDENT_YEARLY, "student_id", student_ids,
+        filters={"academic_year": year} if year else None,
+        columns=f"student_id, {COUNT_COLUMNS}"
+    )
+    by_student: Dict[str, List[Dict[str, Any]]] = {s: [] for s in student_ids}
+    for row in rows:
+        by_student.setdefault(row["student_id"], []).append(row)
+    return {student_id: summarize(student_rows) for student_id, student_rows in by_student.items()}
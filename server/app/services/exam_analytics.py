@@ -0,0 +1,136 @@
+"""
+app/services/exam_analytics.py
+Result statistics for one exam, computed with NumPy and cached per exam
+"""
+from typing import Optional, Dict, List, Any
+from app.core.config import settings
+from app.db.cache import TTLCache
+from app.db.supabase import SupabaseQueries
+import asyncio
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+
+# Analytics per exam_id. Mark writes of this worker invalidate the entry;
+# other workers pick the change up after the TTL.
+exam_analytics_cache = TTLCache(settings.EXAM_ANALYTICS_CACHE_MAX_ENTRIES, settings.EXAM_ANALYTICS_CACHE_TTL_SECONDS)
+
+# Invalidations so far; a computation that overlapped one is not cached
+_invalidations = 0
+
+
+def invalidate_exam_analytics(exam_id: Optional[str]):
+    """Drop the cached analytics of an exam (after its marks changed)"""
+    global _invalidations
+    if exam_id:
+        _invalidations += 1
+        exam_analytics_cache.delete(str(exam_id))
+
+
+def compute_exam_analytics(
+    exam: Dict[str, Any],
+    marks: List[Dict[str, Any]],
+    names: Dict[str, str]
+) -> Dict[str, Any]:
+    """
+    Summary statistics, histogram and ranking of an exam's marks
+
+    Args:
+        exam: Exam row (exam_id, exam_name, max_marks)
+        marks: Mark rows (student_id, marks_scored)
+        names: student_id -> name
+
+    Returns:
+        dict: Statistics, a histogram over 0..max_marks and the students
+              ranked by score (ties share a rank: 1, 2, 2, 4)
+    """
+    max_marks = float(exam.get("max_marks") or 0)
+    pass_mark = max_marks * settings.EXAM_PASS_PERCENTAGE / 100
+    result: Dict[str, Any] = {
+        "exam_id": exam["exam_id"],
+        "exam_name": exam.get("exam_name"),
+        "max_marks": exam.get("max_marks"),
+        "pass_mark": round(pass_mark, 2),
+        "count": len(marks)
+    }
+    if not marks:
+        return {**result, "statistics": None, "histogram": [], "ranks": []}
+
+    scores = np.fromiter((m["marks_scored"] for m in marks), dtype=np.float64, count=len(marks))
+    percentiles = np.percentile(scores, PERCENTILES)
+
+    edges = np.linspace(0, max_marks or scores.max() or 1, HISTOGRAM_BINS + 1)
+    counts, _ = np.histogram(scores, bins=edges)
+
+    # Competition ranking: 1 + number of strictly higher scores
+    ascending = np.sort(scores)
+    ranks = len(scores) - np.searchsorted(ascending, scores, side="right") + 1
+    # Share of students scoring at or below each score
+    percentile_of = np.searchsorted(ascending, scores, side="right") / len(scores) * 100
+    order = np.lexsort((np.arange(len(scores)), -scores))
+
+    result["statistics"] = {
+        "mean": round(float(scores.mean()), 2),
+        "median": round(float(np.median(scores)), 2),
+        "std_dev": round(float(scores.std()), 2),
+        "min": float(scores.min()),
+        "max": float(scores.max()),
+        "percentiles": {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, percentiles)},
+        "pass_count": int((scores >= pass_mark).sum()),
+        "pass_rate": round(float((scores >= pass_mark).mean() * 100), 2)
+    }
+    result["histogram"] = [
+        {"from": round(float(edges[i]), 2), "to": round(float(edges[i + 1]), 2), "count": int(counts[i])}
+        for i in range(HISTOGRAM_BINS)
+    ]
+    result["ranks"] = [
+        {
+            "rank": int(ranks[i]),
+            "student_id": marks[i]["student_id"],
+            "student_name": names.get(marks[i]["student_id"]),
+            "marks_scored": float(scores[i]),
+            "percentage": round(float(scores[i] / max_marks * 100), 2) if max_marks else None,
+            "percentile": round(float(percentile_of[i]), 2),
+            "passed": bool(scores[i] >= pass_mark)
+        }
+        for i in order
+    ]
+    return result
+
+
+async def get_exam_analytics(db: SupabaseQueries, exam_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Analytics of an exam, from the cache when possible
+
+    Args:
+        db: Query helper
+        exam_id: Exam ID
+
+    Returns:
+        dict: See compute_exam_analytics, None if the exam does not exist
+    """
+    cached = exam_analytics_cache.get(exam_id)
+    if cached is not None:
+        return cached
+    invalidations = _invalidations
+
+    exam, marks = await asyncio.gather(
+        db.select_by_id("exams", "exam_id", exam_id, columns="exam_id, exam_name, max_marks"),
+        db.select_all("marks", {"exam_id": exam_id}, columns="student_id, marks_scored")
+    )
+    if not exam:
+        return None
+
+    students = await db.select_in("students", "student_id", [m["student_id"] for m in marks], columns="student_id, name")
+    names = {s["student_id"]: s["name"] for s in students}
+
+    # Ranking a few thousand marks is quick, but keep it off the event loop
+    analytics = await asyncio.to_thread(compute_exam_analytics, exam, marks, names)
+    if invalidations == _invalidations:
+        exam_analytics_cache.set(exam_id, analytics)
+    logger.info(f"Exam analytics computed for {exam_id} ({len(marks)} marks)")
+    return analytics
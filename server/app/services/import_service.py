@@ -0,0 +1,278 @@
+"""
+app/services/import_service.py
+Bulk student onboarding from CSV / XLSX uploads
+"""
+from datetime import datetime
+from itertools import islice
+from typing import Optional, Dict, List, Any, Iterator, Tuple, IO
+from fastapi import HTTPException
+from pydantic import ValidationError
+from app.core.config import settings
+from app.core.security import hash_passwords_async
+from app.db.supabase import SupabaseQueries, run_query
+from app.models.schemas import StudentCreate
+import asyncio
+import csv
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Accepted spellings of header columns
+COLUMN_ALIASES = {
+    "student_name": "name",
+    "full_name": "name",
+    "date_of_birth": "dob",
+    "birth_date": "dob",
+    "email_address": "email",
+    "class": "class_name",
+    "guardian": "guardian_name",
+}
+
+HASH_RETRIES = 3
+
+Row = Tuple[int, Dict[str, Any]]
+
+# ============================================
+# FILE READERS
+# ============================================
+
+def _column(header: Any) -> str:
+    name = str(header or "").strip().lower().replace(" ", "_").replace("-", "_")
+    return COLUMN_ALIASES.get(name, name)
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)  # e.g. phone numbers stored as numbers
+    if isinstance(value, str):
+        return value.strip() or None
+    return value
+
+
+def iter_csv_rows(fileobj: IO[bytes]) -> Iterator[Row]:
+    """
+    Stream rows of a CSV upload
+
+    Args:
+        fileobj: Binary file object (UTF-8, optional BOM, header row first)
+
+    Yields:
+        tuple: (line number, {column: value}) for every non-empty row
+    """
+    reader = csv.reader(io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline=""))
+    header = [_column(h) for h in next(reader, [])]
+    for row_number, values in enumerate(reader, start=2):
+        if any(v.strip() for v in values):
+            yield row_number, {col: _cell(v) for col, v in zip(header, values) if col}
+
+
+def iter_xlsx_rows(fileobj: IO[bytes]) -> Iterator[Row]:
+    """
+    Stream rows of the first worksheet of an XLSX upload
+
+    The workbook is opened read-only, so rows are parsed as they are
+    consumed instead of loading the whole sheet.
+
+    Args:
+        fileobj: Binary file object (header row first)
+
+    Yields:
+        tuple: (row number, {column: value}) for every non-empty row
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [_column(h) for h in next(rows, ())]
+        for row_number, values in enumerate(rows, start=2):
+            if any(v is not None and str(v).strip() for v in values):
+                yield row_number, {col: _cell(v) for col, v in zip(header, values) if col}
+    finally:
+        workbook.close()
+
+
+# ============================================
+# IMPORTER
+# ============================================
+
+class StudentImporter:
+    """
+    Creates `users` + `students` rows for an upload, one batch at a time
+
+    Per batch: rows are validated, duplicate emails are checked with a
+    single query (plus against earlier rows of the same file), initial
+    passwords (the DOB, as in create_student) are hashed in parallel on the
+    hashing pool, and users and students are inserted with one request
+    each. Rows that fail are reported and skipped; the rest still load.
+    """
+
+    def __init__(self, db: SupabaseQueries, batch_size: Optional[int] = None):
+        """
+        Initialize StudentImporter
+
+        Args:
+            db: Query helper
+            batch_size: Rows per batch (default STUDENT_IMPORT_BATCH_SIZE)
+        """
+        self.db = db
+        self.batch_size = batch_size or settings.STUDENT_IMPORT_BATCH_SIZE
+        self.total_rows = 0
+        self.created = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._seen_emails: Dict[str, int] = {}
+        self._classes_by_id: Dict[str, Dict[str, Any]] = {}
+        self._classes_by_name: Dict[Tuple[str, Optional[str]], List[Dict[str, Any]]] = {}
+
+    async def run(self, rows: Iterator[Row]) -> Dict[str, Any]:
+        """
+        Import all rows
+
+        Args:
+            rows: (row number, values) pairs, e.g. from iter_csv_rows
+
+        Returns:
+            dict: total_rows, created_count, error_count and per-row errors
+        """
+        await self._load_classes()
+
+        while True:
+            # Parsing (XLSX especially) is CPU work; keep it off the event loop
+            batch = await asyncio.to_thread(lambda: list(islice(rows, self.batch_size)))
+            if not batch:
+                break
+            self.total_rows += len(batch)
+            await self._import_batch(batch)
+
+        logger.info(
+            f"Student import: {self.created} created, {len(self.errors)} failed of {self.total_rows} rows"
+        )
+        return {
+            "total_rows": self.total_rows,
+            "created_count": self.created,
+            "error_count": len(self.errors),
+            "errors": self.errors
+        }
+
+    # --- Steps -------------------------------
+
+    async def _load_classes(self):
+        for school_class in await self.db.select_all("classes", columns="class_id, class_name, section"):
+            self._classes_by_id[str(school_class["class_id"])] = school_class
+            name = str(school_class["class_name"]).strip().lower()
+            section = str(school_class.get("section") or "").strip().lower()
+            self._classes_by_name.setdefault((name, section), []).append(school_class)
+            self._classes_by_name.setdefault((name, None), []).append(school_class)
+
+    def _fail(self, row_number: int, values: Dict[str, Any], *messages: str):
+        self.errors.append({"row": row_number, "email": values.get("email"), "errors": list(messages)})
+
+    def _resolve_class(self, values: Dict[str, Any]) -> Optional[str]:
+        if values.get("class_id"):
+            if str(values["class_id"]) not in self._classes_by_id:
+                raise ValueError(f"class_id: class {values['class_id']} not found")
+            return str(values["class_id"])
+        if values.get("class_name"):
+            section = values.get("section")
+            key = (str(values["class_name"]).lower(), str(section).lower() if section else None)
+            matches = self._classes_by_name.get(key, [])
+            if len(matches) != 1:
+                label = f"{values['class_name']}" + (f" - {section}" if section else "")
+                reason = "not found" if not matches else "is ambiguous, add a section column"
+                raise ValueError(f"class_name: class {label} {reason}")
+            return str(matches[0]["class_id"])
+        return None
+
+    def _validate(self, batch: List[Row]) -> List[Tuple[int, Dict[str, Any], StudentCreate]]:
+        valid = []
+        for row_number, values in batch:
+            try:
+                class_id = self._resolve_class(values)
+                student = StudentCreate(
+                    **{k: v for k, v in values.items() if k in StudentCreate.model_fields and k not in ("user_id", "class_id")},
+                    class_id=class_id
+                )
+            except ValidationError as e:
+                self._fail(row_number, values, *(
+                    f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+                ))
+                continue
+            except ValueError as e:
+                self._fail(row_number, values, str(e))
+                continue
+
+            if not student.email:
+                self._fail(row_number, values, "email: required to create the login")
+                continue
+            first_row = self._seen_emails.setdefault(student.email.lower(), row_number)
+            if first_row != row_number:
+                self._fail(row_number, values, f"email: duplicate of row {first_row}")
+                continue
+            valid.append((row_number, values, student))
+        return valid
+
+    async def _hash_initial_passwords(self, students: List[StudentCreate]) -> List[str]:
+        passwords = [student.dob.isoformat() for student in students]
+        for attempt in range(HASH_RETRIES):
+            try:
+                return await hash_passwords_async(passwords)
+            except HTTPException as e:
+                # Hashing pool saturated (503); back off like a client would
+                if e.status_code != 503 or attempt == HASH_RETRIES - 1:
+                    raise
+                await asyncio.sleep(float((e.headers or {}).get("Retry-After", 1)))
+
+    async def _import_batch(self, batch: List[Row]):
+        valid = self._validate(batch)
+        if not valid:
+            return
+
+        # One query for the whole batch instead of one per row. Emails are
+        # stored as written, so existing users are matched on lower(email)
+        emails = [student.email for _, _, student in valid]
+        response = await run_query(self.db.raw_query().rpc("existing_user_emails", {"p_emails": emails}))
+        existing = {email.lower() for email in response.data or []}
+        rows = []
+        for row_number, values, student in valid:
+            if student.email.lower() in existing:
+                self._fail(row_number, values, "email: a user with this email already exists")
+            else:
+                rows.append((row_number, values, student))
+        if not rows:
+            return
+
+        try:
+            hashes = await self._hash_initial_passwords([student for _, _, student in rows])
+            users = await self.db.insert_many("users", [
+                {"email": student.email, "password_hash": password_hash, "role": "student", "is_active": True}
+                for (_, _, student), password_hash in zip(rows, hashes)
+            ])
+        except Exception as e:
+            logger.error(f"Student import batch error: {e}")
+            for row_number, values, _ in rows:
+                self._fail(row_number, values, f"Failed to create user: {e}")
+            return
+
+        user_ids = {user["email"].lower(): str(user["user_id"]) for user in users}
+        student_rows = []
+        for _, _, student in rows:
+            student_dict = student.model_dump(mode="json")
+            student_dict["user_id"] = user_ids[student.email.lower()]
+            student_rows.append(student_dict)
+
+        try:
+            await self.db.insert_many("students", student_rows)
+        except Exception as e:
+            logger.error(f"Student import batch error: {e}")
+            # No transactions over PostgREST: remove the users created above
+            await run_query(self.db.raw_query().table("users").delete().in_("user_id", list(user_ids.values())))
+            for row_number, values, _ in rows:
+                self._fail(row_number, values, f"Failed to create student: {e}")
+            return
+
+        self.created += len(rows)
@@ -0,0 +1,396 @@
+"""
+app/services/report_service.py
+Report cards: one PDF per student, rendered on a process pool and streamed as a ZIP
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Optional, Dict, List, Any, AsyncIterator, Tuple
+from app.core.config import settings
+from app.db.supabase import SupabaseQueries
+from app.services.attendance_index import year_bounds
+from app.services.attendance_rollups import academic_year, attendance_percentage, student_attendance_counts
+import asyncio
+import io
+import re
+import threading
+import zipfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lower bound of each grade, as a percentage of max marks
+GRADE_BANDS = [(90, "A+"), (80, "A"), (70, "B+"), (60, "B"), (50, "C"), (35, "D"), (0, "F")]
+
+ReportFile = Tuple[str, bytes]
+
+# ============================================
+# DATA
+# ============================================
+
+def grade_for(percentage: Optional[float]) -> str:
+    """Letter grade of a percentage ("-" when there is nothing to grade)"""
+    if percentage is None:
+        return "-"
+    return next(grade for lower, grade in GRADE_BANDS if percentage >= lower)
+
+
+def report_filename(card: Dict[str, Any]) -> str:
+    """ZIP entry name of a report card, e.g. "Grade_5-A/Asha_Rao_3f2a9c1e.pdf\""""
+    folder = re.sub(r"[^A-Za-z0-9]+", "_", card["class_name"] or "Unassigned").strip("_")
+    name = re.sub(r"[^A-Za-z0-9]+", "_", card["name"] or "student").strip("_")
+    return f"{folder}/{name}_{str(card['student_id'])[:8]}.pdf"
+
+
+async def load_report_cards(
+    db: SupabaseQueries,
+    class_ids: Optional[List[str]] = None,
+    student_ids: Optional[List[str]] = None,
+    year: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Fetch everything the report cards of a set of students need
+
+    The students' exams, marks, subjects and attendance are loaded for all
+    of them together (a fixed number of queries, however many students),
+    then grouped per student.
+
+    Args:
+        db: Query helper
+        class_ids: Classes to report on
+        student_ids: Students to report on (takes precedence over class_ids)
+        year: Academic year label (default: the current one)
+
+    Returns:
+        list: One plain dict per student (picklable, ready for the render
+              processes), ordered by class and name
+
+    Example:
+        >>> cards = await load_report_cards(db, class_ids=[class_id])
+        >>> cards[0]["subjects"][0]["exams"][0]["grade"]
+        'A'
+    """
+    year = year or academic_year(date.today())
+    start, end = year_bounds(year)
+    columns = "student_id, name, dob, class_id"
+
+    # A whole school has more students, exams and marks than PostgREST
+    # returns in one response (max-rows), so those reads are keyset-paged
+    if student_ids is not None:
+        students = await db.select_in("students", "student_id", student_ids, columns=columns)
+    elif class_ids is not None:
+        students = await db.select_in("students", "class_id", class_ids, columns=columns, page_by="student_id")
+    else:
+        students = await db.select_all("students", columns=columns, page_by="student_id")
+    if not students:
+        return []
+
+    ids = [s["student_id"] for s in students]
+    student_class_ids = list(dict.fromkeys(s["class_id"] for s in students if s.get("class_id")))
+    classes, exams, attendance = await asyncio.gather(
+        db.select_in("classes", "class_id", student_class_ids, columns="class_id, class_name, section"),
+        db.select_in(
+            "exams", "class_id", student_class_ids,
+            columns="exam_id, class_id, subject_id, exam_name, date, max_marks",
+            refine=lambda q: q.gte("date", str(start)).lte("date", str(end)),
+            page_by="exam_id"
+        ),
+        student_attendance_counts(db, ids, year)
+    )
+    exam_ids = [e["exam_id"] for e in exams]
+    subjects, marks = await asyncio.gather(
+        db.select_in("subjects", "subject_id", [e["subject_id"] for e in exams], columns="subject_id, subject_name"),
+        db.select_in(
+            "marks", "exam_id", exam_ids,
+            filters={"student_id": ids[0]} if len(ids) == 1 else None,
+            columns="mark_id, exam_id, student_id, marks_scored, remarks",
+            page_by="mark_id"
+        )
+    )
+
+    class_names = {c["class_id"]: f"{c['class_name']}-{c['section']}" for c in classes}
+    subject_names = {s["subject_id"]: s["subject_name"] for s in subjects}
+    exams_by_class: Dict[str, List[Dict[str, Any]]] = {}
+    for exam in sorted(exams, key=lambda e: (str(e.get("date")), e["exam_name"])):
+        exams_by_class.setdefault(exam["class_id"], []).append(exam)
+    marks_by_student = {(m["student_id"], m["exam_id"]): m for m in marks}
+
+    cards = []
+    for student in students:
+        by_subject: Dict[str, List[Dict[str, Any]]] = {}
+        scored = maximum = 0.0
+        for exam in exams_by_class.get(student.get("class_id"), []):
+            mark = marks_by_student.get((student["student_id"], exam["exam_id"]))
+            percentage = None
+            if mark is not None and exam.get("max_marks"):
+                percentage = round(mark["marks_scored"] / exam["max_marks"] * 100, 2)
+                scored += mark["marks_scored"]
+                maximum += exam["max_marks"]
+            by_subject.setdefault(subject_names.get(exam["subject_id"], "Unknown subject"), []).append({
+                "exam_name": exam["exam_name"],
+                "date": str(exam.get("date") or ""),
+                "max_marks": exam.get("max_marks"),
+                "marks_scored": mark["marks_scored"] if mark else None,
+                "percentage": percentage,
+                "grade": grade_for(percentage) if mark else "-",
+                "remarks": mark.get("remarks") if mark else None
+            })
+
+        counts = attendance[student["student_id"]]
+        overall = round(scored / maximum * 100, 2) if maximum else None
+        cards.append({
+            "student_id": student["student_id"],
+            "name": student["name"],
+            "dob": str(student.get("dob") or ""),
+            "class_name": class_names.get(student.get("class_id")),
+            "academic_year": year,
+            "subjects": [{"subject": name, "exams": rows} for name, rows in sorted(by_subject.items())],
+            "total_scored": scored,
+            "total_max": maximum,
+            "overall_percentage": overall,
+            "overall_grade": grade_for(overall),
+            "attendance": {**counts, "percentage": attendance_percentage(counts) if counts["total"] else None}
+        })
+
+    cards.sort(key=lambda c: (c["class_name"] or "", c["name"] or ""))
+    return cards
+
+
+# ============================================
+# RENDERING (runs in the worker processes)
+# ============================================
+
+def render_report_card(card: Dict[str, Any]) -> bytes:
+    """
+    Render one report card
+
+    Args:
+        card: A dict from load_report_cards
+
+    Returns:
+        bytes: The PDF document
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    buffer = io.BytesIO()
+    document = SimpleDocTemplate(
+        buffer, pagesize=A4, leftMargin=18 * mm, rightMargin=18 * mm, topMargin=16 * mm, bottomMargin=16 * mm,
+        title=f"Report card - {card['name']}", author=settings.PROJECT_NAME
+    )
+
+    def number(value: Any) -> str:
+        return "-" if value is None else f"{value:g}"
+
+    story = [
+        Paragraph(settings.PROJECT_NAME, styles["Title"]),
+        Paragraph(f"Report card {card['academic_year']}", styles["Heading2"]),
+        Table(
+            [["Student", card["name"], "Class", card["class_name"] or "-"],
+             ["Date of birth", card["dob"] or "-", "Student ID", str(card["student_id"])[:8]]],
+            colWidths=[28 * mm, 62 * mm, 24 * mm, 60 * mm],
+            style=TableStyle([("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
+                              ("FONTNAME", (2, 0), (2, -1), "Helvetica-Bold")])
+        ),
+        Spacer(1, 6 * mm)
+    ]
+
+    rows = [["Subject", "Exam", "Date", "Marks", "Max", "%", "Grade"]]
+    for subject in card["subjects"]:
+        for i, exam in enumerate(subject["exams"]):
+            rows.append([
+                subject["subject"] if i == 0 else "", exam["exam_name"], exam["date"],
+                number(exam["marks_scored"]), number(exam["max_marks"]), number(exam["percentage"]), exam["grade"]
+            ])
+    rows.append(["Overall", "", "", number(card["total_scored"]), number(card["total_max"]),
+                 number(card["overall_percentage"]), card["overall_grade"]])
+    story.append(Table(rows, repeatRows=1, colWidths=[36 * mm, 46 * mm, 24 * mm, 18 * mm, 16 * mm, 18 * mm, 16 * mm], style=TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1f4e79")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
+        ("LINEABOVE", (0, -1), (-1, -1), 0.8, colors.black),
+        ("GRID", (0, 0), (-1, -2), 0.25, colors.grey),
+        ("ALIGN", (3, 0), (-1, -1), "RIGHT")
+    ])))
+
+    counts = card["attendance"]
+    story += [
+        Spacer(1, 6 * mm),
+        Paragraph("Attendance", styles["Heading3"]),
+        Table(
+            [["Days marked", "Present", "Absent", "Late", "Excused", "Attendance %"],
+             [counts["total"], counts["present"], counts["absent"], counts["late"], counts["excused"],
+              number(counts["percentage"])]],
+            style=TableStyle([("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+                              ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold")])
+        )
+    ]
+    document.build(story)
+    return buffer.getvalue()
+
+
+def render_report_cards(cards: List[Dict[str, Any]]) -> List[ReportFile]:
+    """Render several report cards (one pool job per chunk of a bundle)"""
+    return [(report_filename(card), render_report_card(card)) for card in cards]
+
+
+# ============================================
+# RENDERING EXECUTOR
+# ============================================
+
+class _ZipStream:
+    """Write-only file object that hands the ZIP bytes written so far to the response"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ReportRenderer:
+    """
+    Renders report cards on a dedicated process pool
+
+    reportlab is pure Python: a report card costs tens of milliseconds of
+    CPU, so a class or a whole school rendered on the event loop (or on
+    threads, under the GIL) would stall every other request on the worker.
+    Bundles are split into chunks of `chunk_size` cards, one pool job each.
+    With max_workers=0 rendering runs on a thread instead (for debugging).
+    """
+
+    def __init__(self, max_workers: int, chunk_size: int):
+        """
+        Initialize ReportRenderer
+
+        Args:
+            max_workers: Rendering processes (0 = render on a thread)
+            chunk_size: Report cards per pool job
+        """
+        self.max_workers = max_workers
+        self.chunk_size = max(1, chunk_size)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._jobs = 0
+        self._documents = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    async def _render(self, cards: List[Dict[str, Any]]) -> List[ReportFile]:
+        with self._lock:
+            self._in_flight += 1
+        try:
+            if self.max_workers <= 0:
+                return await asyncio.to_thread(render_report_cards, cards)
+            pool = self._get_pool()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, render_report_cards, cards)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool next time
+                logger.error("Report rendering pool broken, recreating")
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = None
+                pool.shutdown(wait=False)
+                raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._jobs += 1
+                self._documents += len(cards)
+
+    async def render_one(self, card: Dict[str, Any]) -> ReportFile:
+        """
+        Render a single report card
+
+        Args:
+            card: A dict from load_report_cards
+
+        Returns:
+            tuple: (file name, PDF bytes)
+        """
+        return (await self._render([card]))[0]
+
+    async def stream_zip(self, cards: List[Dict[str, Any]]) -> AsyncIterator[bytes]:
+        """
+        Render report cards and yield them as a ZIP archive, piece by piece
+
+        At most two chunks per rendering process are in flight; finished
+        chunks are written to the archive in order and their PDFs dropped,
+        so memory stays bounded however large the bundle is.
+
+        Args:
+            cards: Dicts from load_report_cards
+
+        Yields:
+            bytes: Consecutive pieces of the ZIP file
+        """
+        chunks = [cards[i:i + self.chunk_size] for i in range(0, len(cards), self.chunk_size)]
+        window = max(1, self.max_workers) * 2
+        pending: deque = deque()
+        output = _ZipStream()
+        # PDF page streams are already compressed; deflating them again buys little
+        archive = zipfile.ZipFile(output, mode="w", compression=zipfile.ZIP_STORED)
+        try:
+            for chunk in chunks:
+                pending.append(asyncio.ensure_future(self._render(chunk)))
+                if len(pending) >= window:
+                    for name, pdf in await pending.popleft():
+                        archive.writestr(name, pdf)
+                    yield output.drain()
+            while pending:
+                for name, pdf in await pending.popleft():
+                    archive.writestr(name, pdf)
+                yield output.drain()
+            archive.close()
+            yield output.drain()
+        finally:
+            # Client went away mid-download: don't leave jobs running for nothing
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Rendering pool statistics
+
+        Returns:
+            dict: Capacity, jobs in flight and totals
+        """
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "chunk_size": self.chunk_size,
+                "in_flight": self._in_flight,
+                "jobs": self._jobs,
+                "documents": self._documents
+            }
+
+    def shutdown(self):
+        """Stop the rendering processes (called on application shutdown)"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+report_renderer = ReportRenderer(settings.REPORT_RENDER_WORKERS, settings.REPORT_RENDER_CHUNK_SIZE)
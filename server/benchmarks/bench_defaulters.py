@@ -0,0 +1,119 @@
+"""
+benchmarks/bench_defaulters.py
+Attendance defaulters report: one query per student vs. one aggregate
+
+Seeds the local database backend with `--students` x `--days` attendance
+rows and times GET /attendance/defaulters against the previous
+implementation (an attendance query per student). Every local query costs
+`--latency-ms` of simulated round trip, as a Supabase query would. The
+per-student loop is timed on a sample of students and extrapolated, since
+the in-memory backend scans the whole table for every query.
+
+Usage (from server/):
+    python -m benchmarks.bench_defaulters --students 2000 --days 200 --latency-ms 5
+"""
+import os
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "benchmark")
+os.environ["DATABASE_BACKEND"] = "local"
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.db.local_backend import local_database
+from app.db.supabase import get_supabase_client, run_query
+from app.main import app
+
+STATUSES = ["present"] * 8 + ["absent", "late"]
+
+
+def seed(students: int, days: int):
+    random.seed(7)
+    school_class = local_database.seed("classes", [{"class_name": "Grade 5", "section": "A"}])[0]
+    rows = local_database.seed("students", [
+        {"name": f"Student {i:04d}", "class_id": school_class["class_id"]} for i in range(students)
+    ])
+    start = date(2026, 1, 1)
+    for student in rows:
+        local_database.seed("attendance", [
+            {"student_id": student["student_id"], "date": str(start + timedelta(days=d)), "status": random.choice(STATUSES)}
+            for d in range(days)
+        ])
+    return rows
+
+
+async def per_student(students, threshold: int):
+    """The previous implementation: one attendance query per student"""
+    supabase = get_supabase_client()
+    defaulters = []
+    for student in students:
+        records = (await run_query(
+            supabase.table("attendance").select("status").eq("student_id", student["student_id"])
+        )).data
+        if records:
+            percentage = round(sum(1 for r in records if r["status"] == "present") / len(records) * 100, 2)
+            if percentage < threshold:
+                defaulters.append(student["student_id"])
+    return defaulters
+
+
+async def aggregated(threshold: int):
+    token = create_access_token({"sub": "bench", "role": "admin"})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        response = await client.get(
+            "/api/v1/attendance/defaulters",
+            params={"threshold": threshold},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200, response.text
+        return response.json(), response.headers.get("X-DB-Queries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=200)
+    parser.add_argument("--threshold", type=int, default=80)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="simulated round trip per query")
+    parser.add_argument("--sample", type=int, default=25, help="students timed with the per-student loop")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    started = time.perf_counter()
+    students = seed(args.students, args.days)
+    print(f"seeded {args.students} students x {args.days} days in {time.perf_counter() - started:.1f}s")
+    settings.LOCAL_DB_LATENCY_MS = args.latency_ms
+    # Clients are created lazily with the latency setting of the time
+    from app.db import supabase as supabase_module
+    supabase_module.close_supabase_clients()
+
+    sample = students[:args.sample]
+    started = time.perf_counter()
+    asyncio.run(per_student(sample, args.threshold))
+    per_query = (time.perf_counter() - started) / len(sample)
+
+    started = time.perf_counter()
+    body, queries = asyncio.run(aggregated(args.threshold))
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{'mode':<36}{'queries':>10}{'seconds':>10}")
+    print(f"{'per-student queries (before)':<36}{args.students + 1:>10}{per_query * args.students:>10.1f}"
+          f"   (extrapolated from {len(sample)} students)")
+    print(f"{'aggregate + numpy (after)':<36}{queries or '?':>10}{elapsed:>10.2f}")
+    print(f"\n{body['total_defaulters']} defaulters below {args.threshold}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+benchmarks/bench_login.py
+Login throughput per worker: bcrypt inline on the event loop vs. the hashing pool
+
+Runs the app in-process on the local database backend (no network, no
+Supabase project) and fires concurrent logins at it. A probe hits /health
+every few milliseconds meanwhile; its latency shows how long other requests
+are stalled while passwords are being verified.
+
+Usage (from server/):
+    python -m benchmarks.bench_login --logins 64 --concurrency 16 --workers 4
+"""
+import os
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "benchmark")
+os.environ["DATABASE_BACKEND"] = "local"
+# Measure hashing, not the login throttle: one client logging in many times
+os.environ.setdefault("LOGIN_IP_BURST", "1000000")
+os.environ.setdefault("LOGIN_ACCOUNT_BURST", "1000000")
+os.environ.setdefault("LOGIN_MAX_CONCURRENT_VERIFICATIONS", "0")
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+import httpx
+
+from app.core import security
+from app.core.security import PasswordHasher, pwd_context
+from app.db.local_backend import local_database
+from app.main import app
+
+PASSWORD = "correct-horse-battery"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(logins: int, concurrency: int, users: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        login_latencies, probe_latencies = [], []
+        done = asyncio.Event()
+
+        async def login(i: int):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/v1/auth/login", json={
+                    "email": f"user{i % users}@example.com",
+                    "password": PASSWORD
+                })
+                assert response.status_code == 200, response.text
+                login_latencies.append(time.perf_counter() - started)
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/health")
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.005)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return {
+        "logins_per_s": logins / elapsed,
+        "login_p50_ms": statistics.median(login_latencies) * 1000,
+        "login_p95_ms": percentile(login_latencies, 95) * 1000,
+        "probe_p50_ms": statistics.median(probe_latencies) * 1000,
+        "probe_max_ms": max(probe_latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="hashing processes")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    password_hash = pwd_context.hash(PASSWORD)
+    local_database.seed("users", [
+        {"email": f"user{i}@example.com", "password_hash": password_hash, "role": "teacher", "is_active": True}
+        for i in range(args.users)
+    ])
+
+    modes = [("inline (before)", 0), (f"process pool x{args.workers} (after)", args.workers)]
+    print(f"{args.logins} logins, concurrency {args.concurrency}\n")
+    print(f"{'mode':<28}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'probe p50':>11}{'probe max':>11}")
+    for label, workers in modes:
+        security.password_hasher = PasswordHasher(workers, args.concurrency)
+        try:
+            result = asyncio.run(run(args.logins, args.concurrency, args.users))
+        finally:
+            security.password_hasher.shutdown()
+        print(
+            f"{label:<28}{result['logins_per_s']:>10.1f}{result['login_p50_ms']:>10.0f}"
+            f"{result['login_p95_ms']:>10.0f}{result['probe_p50_ms']:>11.1f}{result['probe_max_ms']:>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
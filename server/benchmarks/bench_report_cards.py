@@ -0,0 +1,126 @@
+"""
+benchmarks/bench_report_cards.py
+Report card bundles: rendering on the event loop vs. the process pool
+
+Seeds the local database backend with a school of `--classes` classes x
+`--class-size` students, each class with `--subjects` subjects x
+`--exams` exams plus attendance rollups, then times the report card bundle of:
+
+  - a single class (GET /reports/classes/{id}/report-cards)
+  - the whole school (GET /reports/report-cards)
+
+once with every PDF rendered in turn on one thread (REPORT_RENDER_WORKERS=0)
+and once on the process pool. Reported: queries, data loading time, time
+to the first ZIP bytes, total time and the largest piece handed to the
+response (what is held in memory at once).
+
+Usage (from server/):
+    python -m benchmarks.bench_report_cards --classes 38 --class-size 40 --workers 4
+"""
+import os
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "benchmark")
+os.environ["DATABASE_BACKEND"] = "local"
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from datetime import date, timedelta
+
+from app.core.config import settings
+from app.db.instrumentation import start_request_stats
+from app.db.local_backend import local_database
+from app.db.supabase import SupabaseQueries, get_supabase_client
+from app.services.report_service import ReportRenderer, load_report_cards
+
+
+def seed(classes: int, class_size: int, subjects: int, exams: int):
+    random.seed(7)
+    class_rows = local_database.seed("classes", [
+        {"class_name": f"Grade {1 + i // 4}", "section": "ABCD"[i % 4], "academic_year": "2026-27"} for i in range(classes)
+    ])
+    for school_class in class_rows:
+        class_id = school_class["class_id"]
+        students = local_database.seed("students", [
+            {"name": f"Student {i:04d}", "dob": "2014-01-01", "class_id": class_id} for i in range(class_size)
+        ])
+        subject_rows = local_database.seed("subjects", [
+            {"subject_name": f"Subject {s}", "class_id": class_id} for s in range(subjects)
+        ])
+        exam_rows = local_database.seed("exams", [
+            {"class_id": class_id, "subject_id": subject["subject_id"], "exam_name": f"Test {e + 1}",
+             "date": str(date(2026, 7, 1) + timedelta(days=30 * e)), "max_marks": 100}
+            for subject in subject_rows for e in range(exams)
+        ])
+        local_database.seed("marks", [
+            {"exam_id": exam["exam_id"], "student_id": student["student_id"], "marks_scored": random.randint(20, 100)}
+            for exam in exam_rows for student in students
+        ])
+        local_database.seed("attendance_student_yearly", [
+            {"student_id": student["student_id"], "academic_year": "2026-27",
+             "present": random.randint(150, 190), "absent": random.randint(0, 20), "late": random.randint(0, 5), "excused": 0}
+            for student in students
+        ])
+    return class_rows
+
+
+async def bundle(renderer: ReportRenderer, class_ids):
+    """Load the cards like the endpoints do, then consume the ZIP stream"""
+    stats = start_request_stats()
+    started = time.perf_counter()
+    cards = await load_report_cards(SupabaseQueries(get_supabase_client()), class_ids=class_ids, year="2026-27")
+    loaded = time.perf_counter() - started
+    first_byte = None
+    size = largest = 0
+    async for piece in renderer.stream_zip(cards):
+        if first_byte is None and piece:
+            first_byte = time.perf_counter() - started
+        size += len(piece)
+        largest = max(largest, len(piece))
+    return {
+        "students": len(cards),
+        "queries": stats.queries,
+        "load": loaded,
+        "first_byte": first_byte,
+        "seconds": time.perf_counter() - started,
+        "megabytes": size / 1e6,
+        "largest_piece": largest / 1e6
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--classes", type=int, default=38)
+    parser.add_argument("--class-size", type=int, default=40)
+    parser.add_argument("--subjects", type=int, default=6)
+    parser.add_argument("--exams", type=int, default=3, help="exams per subject")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="rendering processes")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    started = time.perf_counter()
+    classes = seed(args.classes, args.class_size, args.subjects, args.exams)
+    print(f"seeded {args.classes} classes x {args.class_size} students in {time.perf_counter() - started:.1f}s")
+
+    cases = [("one class", [classes[0]["class_id"]]), ("whole school", None)]
+    print(f"\n{'bundle':<14}{'renderer':<22}{'students':>9}{'queries':>9}{'load':>8}"
+          f"{'first byte':>12}{'seconds':>9}{'MB':>7}{'max piece MB':>14}")
+    for label, class_ids in cases:
+        for workers in (0, args.workers):
+            renderer = ReportRenderer(workers, settings.REPORT_RENDER_CHUNK_SIZE)
+            result = asyncio.run(bundle(renderer, class_ids))
+            renderer.shutdown()
+            name = "1 thread" if workers == 0 else f"{workers} processes"
+            print(f"{label:<14}{name:<22}{result['students']:>9}{result['queries']:>9}{result['load']:>7.2f}s"
+                  f"{result['first_byte']:>11.2f}s{result['seconds']:>9.2f}{result['megabytes']:>7.1f}"
+                  f"{result['largest_piece']:>14.2f}")
+    print("\nThe process pool only pays off with as many free CPU cores as --workers.")
+
+
+if __name__ == "__main__":
+    main()
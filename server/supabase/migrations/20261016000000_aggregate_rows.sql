@@ -0,0 +1,119 @@
+-- ============================================
+-- aggregate_rows: server-side GROUP BY for statistics endpoints
+-- ============================================
+-- Called through PostgREST as rpc/aggregate_rows (SupabaseQueries.aggregate).
+-- Returns one JSON object per group, e.g.
+--   select aggregate_rows(
+--       'attendance',
+--       array['status'],
+--       '{"count": "count"}',
+--       '[{"column": "date", "op": "gte", "value": "2024-01-01"}]'
+--   );
+--   => [{"status": "present", "count": 412}, {"status": "absent", "count": 31}]
+--
+-- p_metrics maps an output name to "count", "count:<column>" or
+-- "<sum|avg|min|max>:<column>". p_filters is a list of
+-- {"column", "op", "value"} with op one of eq, neq, gt, gte, lt, lte, in, is.
+-- Identifiers are quoted with %I and values passed as literals (%L), and only
+-- whitelisted tables are accepted. The function runs as the caller, so row
+-- level security applies as for a regular select.
+
+create or replace function public.aggregate_rows(
+    p_table text,
+    p_group_by text[] default '{}',
+    p_metrics jsonb default '{"count": "count"}',
+    p_filters jsonb default '[]'
+)
+returns jsonb
+language plpgsql
+stable
+security invoker
+set search_path = public
+as $$
+declare
+    v_select text[] := '{}';
+    v_where text[] := '{}';
+    v_group text[] := '{}';
+    v_column text;
+    v_metric record;
+    v_filter jsonb;
+    v_fn text;
+    v_op text;
+    v_value text;
+    v_sql text;
+    v_result jsonb;
+begin
+    if p_table not in (
+        'users', 'students', 'teachers', 'parents', 'parent_student', 'classes',
+        'subjects', 'attendance', 'exams', 'marks', 'homework', 'submissions',
+        'fees', 'timetable', 'announcements', 'leave_requests',
+        'attendance_class_daily', 'attendance_student_yearly'
+    ) then
+        raise exception 'aggregate_rows: table % is not allowed', p_table
+            using errcode = '42501';
+    end if;
+
+    foreach v_column in array coalesce(p_group_by, '{}') loop
+        v_select := v_select || format('%I', v_column);
+        v_group := v_group || format('%I', v_column);
+    end loop;
+
+    for v_metric in select key, value from jsonb_each_text(p_metrics) loop
+        v_fn := lower(split_part(v_metric.value, ':', 1));
+        v_column := nullif(split_part(v_metric.value, ':', 2), '');
+
+        if v_fn = 'count' and v_column is null then
+            v_select := v_select || format('count(*) as %I', v_metric.key);
+        elsif v_fn in ('count', 'sum', 'avg', 'min', 'max') and v_column is not null then
+            v_select := v_select || format('%s(%I) as %I', v_fn, v_column, v_metric.key);
+        else
+            raise exception 'aggregate_rows: invalid metric %', v_metric.value
+                using errcode = '22023';
+        end if;
+    end loop;
+
+    for v_filter in select * from jsonb_array_elements(p_filters) loop
+        v_column := v_filter->>'column';
+        v_op := v_filter->>'op';
+        v_value := v_filter->>'value';
+
+        v_where := v_where || case v_op
+            when 'eq' then format('%I = %L', v_column, v_value)
+            when 'neq' then format('%I <> %L', v_column, v_value)
+            when 'gt' then format('%I > %L', v_column, v_value)
+            when 'gte' then format('%I >= %L', v_column, v_value)
+            when 'lt' then format('%I < %L', v_column, v_value)
+            when 'lte' then format('%I <= %L', v_column, v_value)
+            when 'in' then format(
+                '%I = any(%L)', v_column,
+                array(select jsonb_array_elements_text(v_filter->'value'))
+            )
+            when 'is' then format('%I is %s', v_column, case lower(v_value)
+                when 'true' then 'true'
+                when 'false' then 'false'
+                else 'null'
+            end)
+        end;
+
+        if v_where[array_length(v_where, 1)] is null then
+            raise exception 'aggregate_rows: invalid filter operator %', v_op
+                using errcode = '22023';
+        end if;
+    end loop;
+
+    v_sql := format(
+        'select coalesce(jsonb_agg(to_jsonb(t)), ''[]''::jsonb) from (select %s from %I %s %s) t',
+        array_to_string(v_select, ', '),
+        p_table,
+        case when cardinality(v_where) > 0
+            then 'where ' || array_to_string(v_where, ' and ') else '' end,
+        case when cardinality(v_group) > 0
+            then 'group by ' || array_to_string(v_group, ', ') else '' end
+    );
+
+    execute v_sql into v_result;
+    return v_result;
+end;
+$$;
+
+grant execute on function public.aggregate_rows(text, text[], jsonb, jsonb) to anon, authenticated, service_role;
@@ -0,0 +1,34 @@
+-- ============================================
+-- users.scope_version: invalidates scope claims in access tokens
+-- ============================================
+-- Access tokens carry the caller's student/teacher/parent IDs, linked
+-- children and classes, plus the scope_version they were minted with
+-- ("sv"). The API rejects tokens whose sv is older than the stored value,
+-- forcing a refresh. Bump it whenever a user's scope changes, e.g. a
+-- parent is linked to or unlinked from a student, or a student changes
+-- class (SupabaseQueries callers use rpc/bump_scope_version).
+
+alter table public.users
+    add column if not exists scope_version integer not null default 0;
+
+
+-- Increment the scope version of several users in one statement.
+-- Returns the new versions, e.g.
+--   select bump_scope_version(array['8c1e...']::uuid[]);
+--   => [{"user_id": "8c1e...", "scope_version": 3}]
+create or replace function public.bump_scope_version(p_user_ids uuid[])
+returns jsonb
+language sql
+volatile
+security invoker
+as $$
+    with bumped as (
+        update public.users
+        set scope_version = scope_version + 1
+        where user_id = any(p_user_ids)
+        returning user_id, scope_version
+    )
+    select coalesce(jsonb_agg(to_jsonb(bumped)), '[]'::jsonb) from bumped;
+$$;
+
+grant execute on function public.bump_scope_version(uuid[]) to anon, authenticated, service_role;
@@ -0,0 +1,175 @@
+-- ============================================
+-- Attendance rollups: per-status counts kept next to the raw rows
+-- ============================================
+-- attendance_class_daily holds one row per (class, date) and
+-- attendance_student_yearly one row per (student, academic year), each
+-- with a count per status. The API applies +1/-1 deltas through
+-- rpc/apply_attendance_deltas whenever it inserts, updates or deletes
+-- attendance (app/services/attendance_rollups.py), so summaries and
+-- dashboards read a handful of rollup rows instead of counting a year of
+-- attendance. rpc/rebuild_attendance_rollups recomputes them from scratch
+-- (all classes, or only some after students move between classes).
+--
+-- Rows are counted under the student's class (the API rebuilds both
+-- classes when a student moves); the academic year is derived from the
+-- date ("2026-27" for dates from the start month of 2026 on, see
+-- ACADEMIC_YEAR_START_MONTH).
+--
+-- The migration ends by filling the rollups from the existing attendance
+-- rows, so summaries and dashboards keep their history after the deploy.
+
+create table if not exists public.attendance_class_daily (
+    class_id uuid not null references public.classes(class_id) on delete cascade,
+    date date not null,
+    present integer not null default 0,
+    absent integer not null default 0,
+    late integer not null default 0,
+    excused integer not null default 0,
+    primary key (class_id, date)
+);
+
+create index if not exists attendance_class_daily_date_idx
+    on public.attendance_class_daily (date);
+
+create table if not exists public.attendance_student_yearly (
+    student_id uuid not null references public.students(student_id) on delete cascade,
+    academic_year text not null,
+    present integer not null default 0,
+    absent integer not null default 0,
+    late integer not null default 0,
+    excused integer not null default 0,
+    primary key (student_id, academic_year)
+);
+
+
+-- Add signed counts to the rollups in one statement. p_deltas is a list of
+--   {"class_id", "student_id", "date", "academic_year", "status", "delta"}
+-- e.g. a status change from absent to present is two entries with delta
+-- -1 (absent) and +1 (present). Rows are upserted, so concurrent callers
+-- never lose increments. Returns the number of deltas applied.
+create or replace function public.apply_attendance_deltas(p_deltas jsonb)
+returns integer
+language plpgsql
+volatile
+security invoker
+set search_path = public
+as $$
+begin
+    with d as (
+        select * from jsonb_to_recordset(p_deltas) as x(
+            class_id uuid, student_id uuid, date date,
+            academic_year text, status text, delta integer
+        )
+    )
+    insert into attendance_class_daily (class_id, date, present, absent, late, excused)
+    select
+        class_id, date,
+        coalesce(sum(delta) filter (where status = 'present'), 0),
+        coalesce(sum(delta) filter (where status = 'absent'), 0),
+        coalesce(sum(delta) filter (where status = 'late'), 0),
+        coalesce(sum(delta) filter (where status = 'excused'), 0)
+    from d
+    where class_id is not null
+    group by class_id, date
+    on conflict (class_id, date) do update set
+        present = attendance_class_daily.present + excluded.present,
+        absent = attendance_class_daily.absent + excluded.absent,
+        late = attendance_class_daily.late + excluded.late,
+        excused = attendance_class_daily.excused + excluded.excused;
+
+    with d as (
+        select * from jsonb_to_recordset(p_deltas) as x(
+            class_id uuid, student_id uuid, date date,
+            academic_year text, status text, delta integer
+        )
+    )
+    insert into attendance_student_yearly (student_id, academic_year, present, absent, late, excused)
+    select
+        student_id, academic_year,
+        coalesce(sum(delta) filter (where status = 'present'), 0),
+        coalesce(sum(delta) filter (where status = 'absent'), 0),
+        coalesce(sum(delta) filter (where status = 'late'), 0),
+        coalesce(sum(delta) filter (where status = 'excused'), 0)
+    from d
+    group by student_id, academic_year
+    on conflict (student_id, academic_year) do update set
+        present = attendance_student_yearly.present + excluded.present,
+        absent = attendance_student_yearly.absent + excluded.absent,
+        late = attendance_student_yearly.late + excluded.late,
+        excused = attendance_student_yearly.excused + excluded.excused;
+
+    return jsonb_array_length(p_deltas);
+end;
+$$;
+
+
+-- Recompute the rollups from the attendance table, counting every row
+-- under the student's current class. p_class_ids limits the rebuild to
+-- those classes and their students (null = everything).
+--   select rebuild_attendance_rollups(null, 6);
+create or replace function public.rebuild_attendance_rollups(
+    p_class_ids uuid[] default null,
+    p_start_month integer default 6
+)
+returns jsonb
+language plpgsql
+volatile
+security invoker
+set search_path = public
+as $$
+declare
+    v_classes integer;
+    v_students integer;
+begin
+    delete from attendance_class_daily
+    where p_class_ids is null or class_id = any(p_class_ids);
+
+    delete from attendance_student_yearly y
+    where p_class_ids is null
+       or y.student_id in (select student_id from students where class_id = any(p_class_ids));
+
+    insert into attendance_class_daily (class_id, date, present, absent, late, excused)
+    select
+        s.class_id, a.date,
+        count(*) filter (where a.status = 'present'),
+        count(*) filter (where a.status = 'absent'),
+        count(*) filter (where a.status = 'late'),
+        count(*) filter (where a.status = 'excused')
+    from attendance a
+    join students s on s.student_id = a.student_id
+    where s.class_id is not null
+      and (p_class_ids is null or s.class_id = any(p_class_ids))
+    group by s.class_id, a.date;
+    get diagnostics v_classes = row_count;
+
+    insert into attendance_student_yearly (student_id, academic_year, present, absent, late, excused)
+    select
+        a.student_id, y.academic_year,
+        count(*) filter (where a.status = 'present'),
+        count(*) filter (where a.status = 'absent'),
+        count(*) filter (where a.status = 'late'),
+        count(*) filter (where a.status = 'excused')
+    from attendance a
+    join students s on s.student_id = a.student_id
+    cross join lateral (
+        select extract(year from a.date - make_interval(months => p_start_month - 1))::integer as start_year
+    ) sy
+    cross join lateral (
+        select sy.start_year || '-' || right((sy.start_year + 1)::text, 2) as academic_year
+    ) y
+    where p_class_ids is null or s.class_id = any(p_class_ids)
+    group by a.student_id, y.academic_year;
+    get diagnostics v_students = row_count;
+
+    return jsonb_build_object('class_days', v_classes, 'student_years', v_students);
+end;
+$$;
+
+grant select on public.attendance_class_daily, public.attendance_student_yearly to anon, authenticated, service_role;
+grant execute on function public.apply_attendance_deltas(jsonb) to anon, authenticated, service_role;
+grant execute on function public.rebuild_attendance_rollups(uuid[], integer) to anon, authenticated, service_role;
+
+
+-- Backfill from the attendance already recorded (6 = the default
+-- ACADEMIC_YEAR_START_MONTH; rebuild again if the deployment uses another)
+select public.rebuild_attendance_rollups(null, 6);
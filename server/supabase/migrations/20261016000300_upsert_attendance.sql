@@ -0,0 +1,134 @@
+-- ============================================
+-- upsert_attendance: idempotent bulk marking for one class and date
+-- ============================================
+-- Called by POST /attendance/bulk?mode=upsert. Rows are keyed on
+-- (student_id, date): missing rows are inserted, rows whose status or
+-- remarks differ are updated, identical rows are left alone, so a
+-- resubmitted class register is safe to apply again. The attendance
+-- rollups are adjusted in the same transaction. Returns
+--   {"created": 3, "updated": 1, "unchanged": 36, "deltas": [...]}
+-- where "deltas" are the rollup changes applied (same format as the
+-- p_deltas argument of apply_attendance_deltas), every -1 before the
+-- +1s, so replaying them in order ends with the new statuses.
+
+-- The old check-then-insert marking could record a student twice on one
+-- day. The newest row of each pair is kept (rows without created_at count
+-- as oldest); the others are copied to attendance_duplicates_backup before
+-- they are deleted, so an operator can review or restore them:
+--   select * from public.attendance_duplicates_backup order by student_id, date;
+create table if not exists public.attendance_duplicates_backup (
+    like public.attendance,
+    backed_up_at timestamptz not null default now()
+);
+
+-- Not for the API: only the service role and operators read it
+revoke all on public.attendance_duplicates_backup from anon, authenticated;
+
+create temporary table attendance_older_duplicates as
+select attendance_id
+from (
+    select attendance_id, row_number() over (
+        partition by student_id, date
+        order by coalesce(created_at, '-infinity'::timestamptz) desc, attendance_id::text desc
+    ) as position
+    from public.attendance
+) ranked
+where position > 1;
+
+insert into public.attendance_duplicates_backup
+select a.*
+from public.attendance a
+join attendance_older_duplicates d on d.attendance_id = a.attendance_id;
+
+delete from public.attendance a
+using attendance_older_duplicates d
+where a.attendance_id = d.attendance_id;
+
+drop table attendance_older_duplicates;
+
+-- The rollups were backfilled before the duplicates were removed
+select public.rebuild_attendance_rollups(null, 6);
+
+-- One record per student and day (required by the on conflict below)
+create unique index if not exists attendance_student_id_date_key
+    on public.attendance (student_id, date);
+
+
+create or replace function public.upsert_attendance(
+    p_class_id uuid,
+    p_date date,
+    p_academic_year text,
+    p_records jsonb
+)
+returns jsonb
+language plpgsql
+volatile
+security invoker
+set search_path = public
+as $$
+declare
+    v_result jsonb;
+    v_deltas jsonb;
+begin
+    -- Serialise submissions for the same class and day, so the old
+    -- statuses read below are the ones being replaced
+    perform pg_advisory_xact_lock(hashtext('upsert_attendance'), hashtext(p_class_id::text || p_date::text));
+
+    with input as (
+        select student_id, status, remarks
+        from jsonb_to_recordset(p_records) as x(student_id uuid, status text, remarks text)
+    ),
+    old as (
+        select a.student_id, a.status
+        from attendance a
+        join input i on i.student_id = a.student_id
+        where a.date = p_date
+    ),
+    written as (
+        insert into attendance as a (student_id, date, status, remarks)
+        select student_id, p_date, status, remarks from input
+        on conflict (student_id, date) do update
+            set status = excluded.status, remarks = excluded.remarks
+            where (a.status, a.remarks) is distinct from (excluded.status, excluded.remarks)
+        returning a.student_id, a.status
+    ),
+    changes as (
+        select w.student_id, w.status, o.status as old_status
+        from written w
+        left join old o on o.student_id = w.student_id
+    ),
+    deltas as (
+        select student_id, status, 1 as delta from changes
+        where old_status is distinct from status
+        union all
+        select student_id, old_status, -1 from changes
+        where old_status is not null and old_status is distinct from status
+    )
+    select
+        jsonb_build_object(
+            'created', (select count(*) from changes where old_status is null),
+            'updated', (select count(*) from changes where old_status is not null),
+            'unchanged', (select count(*) from input) - (select count(*) from changes)
+        ),
+        coalesce((
+            select jsonb_agg(jsonb_build_object(
+                'class_id', p_class_id,
+                'student_id', d.student_id,
+                'date', p_date,
+                'academic_year', p_academic_year,
+                'status', d.status,
+                'delta', d.delta
+            ) order by d.delta)
+            from deltas d
+        ), '[]'::jsonb)
+    into v_result, v_deltas;
+
+    if jsonb_array_length(v_deltas) > 0 then
+        perform apply_attendance_deltas(v_deltas);
+    end if;
+
+    return v_result || jsonb_build_object('deltas', v_deltas);
+end;
+$$;
+
+grant execute on function public.upsert_attendance(uuid, date, text, jsonb) to anon, authenticated, service_role;
@@ -0,0 +1,44 @@
+-- ============================================
+-- marks: one row per exam and student
+-- ============================================
+-- POST /marks/bulk-upsert writes with on_conflict=exam_id,student_id,
+-- which needs a unique constraint on the pair. It also stops the plain
+-- bulk insert from silently duplicating a re-uploaded sheet.
+
+-- Earlier bulk uploads could duplicate a pair. The newest row of each pair
+-- is kept (rows without created_at count as oldest); the others are copied
+-- to marks_duplicates_backup before they are deleted, so an operator can
+-- review or restore them:
+--   select * from public.marks_duplicates_backup order by exam_id, student_id;
+create table if not exists public.marks_duplicates_backup (
+    like public.marks,
+    backed_up_at timestamptz not null default now()
+);
+
+-- Not for the API: only the service role and operators read it
+revoke all on public.marks_duplicates_backup from anon, authenticated;
+
+create temporary table marks_older_duplicates as
+select mark_id
+from (
+    select mark_id, row_number() over (
+        partition by exam_id, student_id
+        order by coalesce(created_at, '-infinity'::timestamptz) desc, mark_id::text desc
+    ) as position
+    from public.marks
+) ranked
+where position > 1;
+
+insert into public.marks_duplicates_backup
+select m.*
+from public.marks m
+join marks_older_duplicates d on d.mark_id = m.mark_id;
+
+delete from public.marks m
+using marks_older_duplicates d
+where m.mark_id = d.mark_id;
+
+drop table marks_older_duplicates;
+
+create unique index if not exists marks_exam_id_student_id_key
+    on public.marks (exam_id, student_id);
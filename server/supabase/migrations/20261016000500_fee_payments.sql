@@ -0,0 +1,109 @@
+-- ============================================
+-- fee_payments: append-only payment ledger
+-- ============================================
+-- POST /fees/payment calls rpc/record_fee_payment instead of reading
+-- fees.amount_paid, adding to it and writing it back (two counters taking
+-- payments for the same fee could lose one of them, and a retried request
+-- was charged twice). The function
+--   - locks the fee row, so payments for the same fee are applied one
+--     after the other while other fees are not blocked,
+--   - appends the payment to the ledger, at most once per idempotency key
+--     (the Idempotency-Key header, else the transaction_id),
+--   - moves fees.amount_paid / status in the same transaction.
+-- Returns {"outcome": ..., "fee": {...}, "payment": {...}} with outcome one of
+--   recorded     the payment was applied
+--   duplicate    the key was already used for this payment; nothing changed
+--   conflict     the key was already used for a different fee or amount
+--   overpayment  the payment exceeds the balance due
+--   not_found    no such fee
+
+create table if not exists public.fee_payments (
+    payment_id uuid primary key default gen_random_uuid(),
+    fee_id uuid not null references public.fees (fee_id) on delete cascade,
+    amount numeric(12, 2) not null check (amount > 0),
+    payment_method text not null,
+    transaction_id text,
+    idempotency_key text not null,
+    recorded_by uuid,
+    created_at timestamptz not null default now()
+);
+
+create unique index if not exists fee_payments_idempotency_key_key
+    on public.fee_payments (idempotency_key);
+
+create index if not exists fee_payments_fee_id_idx
+    on public.fee_payments (fee_id, created_at);
+
+-- Payments recorded before the ledger existed, as one entry per fee
+insert into public.fee_payments (fee_id, amount, payment_method, transaction_id, idempotency_key, created_at)
+select fee_id, amount_paid, coalesce(payment_method, 'unknown'), transaction_id,
+       'migrated:' || fee_id::text, coalesce(payment_date, created_at, now())
+from public.fees
+where coalesce(amount_paid, 0) > 0
+on conflict (idempotency_key) do nothing;
+
+
+create or replace function public.record_fee_payment(
+    p_fee_id uuid,
+    p_amount numeric,
+    p_payment_method text,
+    p_transaction_id text,
+    p_idempotency_key text,
+    p_recorded_by uuid default null
+)
+returns jsonb
+language plpgsql
+volatile
+security invoker
+set search_path = public
+as $$
+declare
+    v_fee fees;
+    v_payment fee_payments;
+    v_paid numeric;
+begin
+    select * into v_fee from fees where fee_id = p_fee_id for update;
+    if not found then
+        return jsonb_build_object('outcome', 'not_found');
+    end if;
+
+    -- Checked under the fee lock: a retry racing the original waits for it
+    select * into v_payment from fee_payments where idempotency_key = p_idempotency_key;
+    if found then
+        return jsonb_build_object(
+            'outcome', case when v_payment.fee_id = p_fee_id and v_payment.amount = p_amount
+                            then 'duplicate' else 'conflict' end,
+            'fee', to_jsonb(v_fee),
+            'payment', to_jsonb(v_payment)
+        );
+    end if;
+
+    v_paid := coalesce(v_fee.amount_paid, 0) + p_amount;
+    if v_paid > v_fee.amount then
+        return jsonb_build_object('outcome', 'overpayment', 'fee', to_jsonb(v_fee));
+    end if;
+
+    insert into fee_payments (fee_id, amount, payment_method, transaction_id, idempotency_key, recorded_by)
+    values (p_fee_id, p_amount, p_payment_method, p_transaction_id, p_idempotency_key, p_recorded_by)
+    on conflict (idempotency_key) do nothing
+    returning * into v_payment;
+    if not found then
+        -- Same key used concurrently for another fee
+        select * into v_payment from fee_payments where idempotency_key = p_idempotency_key;
+        return jsonb_build_object('outcome', 'conflict', 'fee', to_jsonb(v_fee), 'payment', to_jsonb(v_payment));
+    end if;
+
+    update fees
+    set amount_paid = v_paid,
+        status = case when v_paid >= amount then 'paid' else 'partial' end,
+        payment_date = now(),
+        payment_method = p_payment_method,
+        transaction_id = coalesce(p_transaction_id, transaction_id)
+    where fee_id = p_fee_id
+    returning * into v_fee;
+
+    return jsonb_build_object('outcome', 'recorded', 'fee', to_jsonb(v_fee), 'payment', to_jsonb(v_payment));
+end;
+$$;
+
+grant execute on function public.record_fee_payment(uuid, numeric, text, text, text, uuid) to anon, authenticated, service_role;
@@ -0,0 +1,26 @@
+-- ============================================
+-- existing_user_emails: case-insensitive email lookup for bulk import
+-- ============================================
+-- Called by POST /students/import once per batch. Emails are stored as
+-- written, so Asha@X.com and asha@x.com are different values to an eq or
+-- in filter; this matches them on lower(email) instead. Returns the
+-- stored spelling of every user whose email matches one of p_emails, e.g.
+--   select existing_user_emails(array['Asha@X.com']);
+--   => ["asha@x.com"]
+
+create index if not exists users_email_lower_idx
+    on public.users (lower(email));
+
+
+create or replace function public.existing_user_emails(p_emails text[])
+returns jsonb
+language sql
+stable
+security invoker
+as $$
+    select coalesce(jsonb_agg(email), '[]'::jsonb)
+    from public.users
+    where lower(email) in (select lower(e) from unnest(p_emails) as e);
+$$;
+
+grant execute on function public.existing_user_emails(text[]) to anon, authenticated, service_role;
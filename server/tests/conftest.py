@@ -0,0 +1,73 @@
+"""
+tests/conftest.py
+Shared fixtures: the app runs against the in-memory local database backend
+"""
+import os
+
+# Must be set before the app (and its settings) are imported
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test-anon-key")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
+os.environ["DATABASE_BACKEND"] = "local"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.config import settings
+from app.core.dependencies import principal_cache, scope_version_cache
+from app.core.rate_limit import login_throttle
+from app.core.security import create_access_token
+from app.db.cache import reference_cache
+from app.db.local_backend import local_database
+from app.services.attendance_index import attendance_index
+from app.services.exam_analytics import exam_analytics_cache
+
+
+@pytest.fixture(autouse=True)
+def db():
+    """Empty local database (and in-process caches and limits) for every test"""
+    local_database.reset()
+    login_throttle.reset()
+    reference_cache.clear()
+    principal_cache.clear()
+    scope_version_cache.clear()
+    attendance_index.clear()
+    exam_analytics_cache.clear()
+    yield local_database
+    local_database.reset()
+    reference_cache.clear()
+    principal_cache.clear()
+    scope_version_cache.clear()
+    attendance_index.clear()
+    exam_analytics_cache.clear()
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def max_rows(monkeypatch):
+    """Cap local responses at 2 rows, like PostgREST max-rows (reads page at that size)"""
+    monkeypatch.setattr(settings, "LOCAL_DB_MAX_ROWS", 2)
+    monkeypatch.setattr(settings, "DB_MAX_ROWS", 2)
+    return 2
+
+
+@pytest.fixture
+def auth_headers():
+    """Factory for Authorization headers of an arbitrary user/role"""
+    def make(user_id: str, role: str) -> dict:
+        token = create_access_token({"sub": user_id, "role": role})
+        return {"Authorization": f"Bearer {token}"}
+    return make
+
+
+@pytest.fixture
+def admin_headers(db, auth_headers):
+    admin = db.seed("users", [{"email": "admin@example.com", "role": "admin", "is_active": True}])[0]
+    return auth_headers(admin["user_id"], "admin")
@@ -0,0 +1,268 @@
+"""
+tests/test_attendance.py
+Attendance reports
+"""
+from app.core.config import settings
+from app.services.attendance_index import attendance_index
+
+
+def _seed_attendance(db, student, statuses, start_day=1):
+    db.seed("attendance", [
+        {"student_id": student["student_id"], "date": f"2026-09-{day:02d}", "status": status}
+        for day, status in enumerate(statuses, start=start_day)
+    ])
+
+
+def test_defaulters_aggregate_filter_sort_and_paginate(client, db, auth_headers, max_rows):
+    # More students than a single response may hold: all of them are evaluated
+    classes = db.seed("classes", [{"class_name": "Grade 5", "section": s} for s in "AB"])
+    students = db.seed("students", [
+        {"name": name, "class_id": classes[0 if name != "Eli" else 1]["class_id"]}
+        for name in ["Asha", "Bo", "Chen", "Dev", "Eli"]
+    ])
+    asha, bo, chen, dev, eli = students
+    _seed_attendance(db, asha, ["present"] * 4)                             # 100%
+    _seed_attendance(db, bo, ["present", "absent", "absent", "late"])       # 25%
+    _seed_attendance(db, chen, ["present", "present", "absent", "excused"])  # 50%
+    _seed_attendance(db, eli, ["absent"] * 4)                               # 0%, other class
+    # Dev has no records and is not a defaulter
+    headers = auth_headers("t1", "teacher")
+
+    response = client.get("/api/v1/attendance/defaulters", params={"threshold": 75}, headers=headers)
+    body = response.json()
+    assert body["total_defaulters"] == 3
+    assert [(d["name"], d["present_days"], d["total_days"], d["attendance_percentage"]) for d in body["defaulters"]] == [
+        ("Eli", 0, 4, 0.0), ("Bo", 1, 4, 25.0), ("Chen", 2, 4, 50.0)
+    ]
+
+    response = client.get("/api/v1/attendance/defaulters", params={
+        "class_id": classes[0]["class_id"], "page": 2, "page_size": 1
+    }, headers=headers)
+    body = response.json()
+    assert body["total_defaulters"] == 2
+    assert [d["name"] for d in body["defaulters"]] == ["Chen"]
+
+    response = client.get("/api/v1/attendance/defaulters", params={
+        "end_date": "2026-09-02", "threshold": 60
+    }, headers=headers)
+    assert [d["name"] for d in response.json()["defaulters"]] == ["Eli", "Bo"]
+
+
+def test_rollups_follow_attendance_writes(client, db, auth_headers, admin_headers):
+    school_class = db.seed("classes", [{"class_name": "Grade 6", "section": "A", "academic_year": "2026-27"}])[0]
+    class_id = school_class["class_id"]
+    students = db.seed("students", [{"name": name, "class_id": class_id} for name in ["Fay", "Gus", "Hal"]])
+    headers = auth_headers("t1", "teacher")
+
+    response = client.post("/api/v1/attendance/bulk", json={
+        "class_id": class_id,
+        "date": "2026-09-01",
+        "attendance_records": [
+            {"student_id": s["student_id"], "status": status}
+            for s, status in zip(students, ["present", "absent", "late"])
+        ]
+    }, headers=headers)
+    assert response.status_code == 201, response.text
+    response = client.post("/api/v1/attendance/", json={
+        "student_id": students[0]["student_id"], "date": "2026-09-02", "status": "present"
+    }, headers=headers)
+    assert response.status_code == 201, response.text
+    gus_record = next(r for r in db.rows("attendance") if r["student_id"] == students[1]["student_id"])
+    assert client.put(
+        f"/api/v1/attendance/{gus_record['attendance_id']}", params={"status": "present"}, headers=headers
+    ).status_code == 200
+    hal_record = next(r for r in db.rows("attendance") if r["student_id"] == students[2]["student_id"])
+    assert client.delete(f"/api/v1/attendance/{hal_record['attendance_id']}", headers=headers).status_code == 204
+
+    # Fay 2/2, Gus 1/1, Hal none: 3 present of 3 marked
+    summary = client.get(f"/api/v1/classes/{class_id}/attendance/summary", headers=headers).json()
+    assert (summary["total_records"], summary["present"], summary["absent"], summary["late"]) == (3, 3, 0, 0)
+    day = client.get(f"/api/v1/classes/{class_id}/attendance/summary", params={"date": "2026-09-01"}, headers=headers).json()
+    assert (day["total_records"], day["present"]) == (2, 2)
+
+    def rollups():
+        return (
+            sorted((r["date"], r["present"], r["absent"], r["late"], r["excused"]) for r in db.rows("attendance_class_daily")),
+            sorted((r["student_id"], r["academic_year"], r["present"], r["absent"], r["late"]) for r in db.rows("attendance_student_yearly"))
+        )
+
+    incremental = rollups()
+    assert ("2026-09-01", 2, 0, 0, 0) in incremental[0]
+    assert (students[0]["student_id"], "2026-27", 2, 0, 0) in incremental[1]
+
+    response = client.post("/api/v1/attendance/rollups/rebuild", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    rebuilt = rollups()
+    # Rebuilding drops the zeroed rows of Hal; the counts are the same
+    assert rebuilt[0] == incremental[0]
+    assert rebuilt[1] == [row for row in incremental[1] if row[2:] != (0, 0, 0)]
+
+
+def test_class_attendance_summary_sums_every_day(client, db, auth_headers, max_rows):
+    # More rollup days than a single response may hold
+    school_class = db.seed("classes", [{"class_name": "Grade 6", "section": "B"}])[0]
+    db.seed("students", [{"name": "Ina", "class_id": school_class["class_id"]}])
+    db.seed("attendance_class_daily", [
+        {"class_id": school_class["class_id"], "date": f"2026-09-0{day}", "present": 1, "absent": 0, "late": 0, "excused": 0}
+        for day in range(1, 6)
+    ])
+    headers = auth_headers("t1", "teacher")
+
+    summary = client.get(f"/api/v1/classes/{school_class['class_id']}/attendance/summary", headers=headers).json()
+    assert (summary["total_records"], summary["present"]) == (5, 5)
+
+
+def test_attendance_index_analytics_snapshot_and_absentees(client, db, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "DB_MAX_ROWS", 3)  # build from several pages
+    builds = attendance_index.builds
+    classes = db.seed("classes", [{"class_name": "Grade 7", "section": s} for s in "AB"])
+    ivy, jay, kim = db.seed("students", [
+        {"name": "Ivy", "class_id": classes[0]["class_id"]},
+        {"name": "Jay", "class_id": classes[0]["class_id"]},
+        {"name": "Kim", "class_id": classes[1]["class_id"]},
+    ])
+    # Sept 5-6 2026 is a weekend: unmarked days do not break Jay's streak
+    _seed_attendance(db, ivy, ["present", "absent", "present", "late"])
+    _seed_attendance(db, jay, ["present", "absent", "absent", "absent"])
+    _seed_attendance(db, jay, ["absent", "present"], start_day=7)
+    _seed_attendance(db, kim, ["absent", "absent", "excused", "present"])
+    headers = auth_headers("t1", "teacher")
+
+    body = client.get("/api/v1/attendance/analytics", params={
+        "start_date": "2026-09-01", "end_date": "2026-09-30"
+    }, headers=headers).json()
+    assert body["academic_year"] == "2026-27"
+    assert body["total_records"] == 14
+    by_name = {s["name"]: s for s in body["students"]}
+    assert (by_name["Ivy"]["present_days"], by_name["Ivy"]["total_days"], by_name["Ivy"]["longest_absence_streak"]) == (2, 4, 1)
+    assert (by_name["Jay"]["absent_days"], by_name["Jay"]["attendance_percentage"], by_name["Jay"]["longest_absence_streak"]) == (4, 33.33, 4)
+    assert by_name["Kim"]["longest_absence_streak"] == 2
+
+    body = client.get("/api/v1/attendance/analytics", params={
+        "class_id": classes[0]["class_id"], "start_date": "2026-09-03", "end_date": "2026-09-04"
+    }, headers=headers).json()
+    assert [(s["name"], s["total_days"], s["longest_absence_streak"]) for s in body["students"]] == [("Ivy", 2, 0), ("Jay", 2, 2)]
+
+    body = client.get("/api/v1/attendance/snapshot", params={"date": "2026-09-03"}, headers=headers).json()
+    assert body["summary"] == {"present": 1, "absent": 1, "late": 0, "excused": 1, "not_marked": 0}
+
+    body = client.get("/api/v1/attendance/absentees", params=[("dates", "2026-09-02"), ("dates", "2026-09-03")], headers=headers).json()
+    assert [s["name"] for s in body["students"]] == ["Jay"]
+
+    # Writes through the API update the loaded index in place
+    ivy_day = next(r for r in db.rows("attendance") if r["student_id"] == ivy["student_id"] and r["date"] == "2026-09-03")
+    assert client.put(f"/api/v1/attendance/{ivy_day['attendance_id']}", params={"status": "absent"}, headers=headers).status_code == 200
+    body = client.get("/api/v1/attendance/absentees", params=[("dates", "2026-09-02"), ("dates", "2026-09-03")], headers=headers).json()
+    assert [s["name"] for s in body["students"]] == ["Ivy", "Jay"]
+    assert attendance_index.builds == builds + 1
+
+    response = client.get("/api/v1/attendance/analytics", params={
+        "start_date": "2026-05-01", "end_date": "2026-09-30"
+    }, headers=headers)
+    assert response.status_code == 400
+
+
+def test_attendance_index_builds_past_max_rows(client, db, auth_headers, max_rows):
+    school_class = db.seed("classes", [{"class_name": "Grade 7", "section": "C"}])[0]
+    ivy, jay = db.seed("students", [
+        {"name": name, "class_id": school_class["class_id"]} for name in ["Ivy", "Jay"]
+    ])
+    _seed_attendance(db, ivy, ["absent"] * 3)
+    _seed_attendance(db, jay, ["absent"] * 2)
+    headers = auth_headers("t1", "teacher")
+
+    body = client.get("/api/v1/attendance/analytics", params={
+        "start_date": "2026-09-01", "end_date": "2026-09-30"
+    }, headers=headers).json()
+    assert body["total_records"] == 5
+    assert sorted(s["absent_days"] for s in body["students"]) == [2, 3]
+
+
+def test_attendance_index_endpoints_read_every_student(client, db, auth_headers, max_rows):
+    # The whole-school students fetch is paged past max-rows
+    school_class = db.seed("classes", [{"class_name": "Grade 7", "section": "C"}])[0]
+    students = db.seed("students", [
+        {"name": name, "class_id": school_class["class_id"]} for name in ["Ivy", "Jay", "Kim", "Lia", "Max"]
+    ])
+    for student in students:
+        _seed_attendance(db, student, ["absent"])
+    headers = auth_headers("t1", "teacher")
+
+    body = client.get("/api/v1/attendance/snapshot", params={"date": "2026-09-01"}, headers=headers).json()
+    assert len(body["students"]) == 5
+    assert body["summary"]["absent"] == 5
+
+    body = client.get("/api/v1/attendance/absentees", params={"dates": "2026-09-01"}, headers=headers).json()
+    assert [s["name"] for s in body["students"]] == ["Ivy", "Jay", "Kim", "Lia", "Max"]
+
+    body = client.get("/api/v1/attendance/analytics", params={
+        "start_date": "2026-09-01", "end_date": "2026-09-30"
+    }, headers=headers).json()
+    assert len(body["students"]) == 5
+
+
+def test_bulk_attendance_upsert_is_idempotent(client, db, auth_headers):
+    school_class = db.seed("classes", [{"class_name": "Grade 8", "section": "A"}])[0]
+    students = db.seed("students", [
+        {"name": f"Student {i}", "class_id": school_class["class_id"]} for i in range(40)
+    ])
+    headers = auth_headers("t1", "teacher")
+    register = {
+        "class_id": school_class["class_id"],
+        "date": "2026-09-01",
+        "attendance_records": [{"student_id": s["student_id"], "status": "present"} for s in students]
+    }
+
+    response = client.post("/api/v1/attendance/bulk", params={"mode": "upsert"}, json=register, headers=headers)
+    assert response.status_code == 201, response.text
+    assert (response.json()["records_created"], response.json()["records_updated"]) == (40, 0)
+    # Plain insert mode still refuses a second submission
+    assert client.post("/api/v1/attendance/bulk", json=register, headers=headers).status_code == 400
+
+    register["attendance_records"][0]["status"] = "absent"
+    register["attendance_records"][1]["remarks"] = "Left early"
+    response = client.post("/api/v1/attendance/bulk", params={"mode": "upsert"}, json=register, headers=headers)
+    body = response.json()
+    assert (body["records_created"], body["records_updated"], body["records_unchanged"]) == (0, 2, 38)
+    # Class membership check plus the upsert itself
+    assert response.headers["X-DB-Queries"] == "2"
+    assert len(db.rows("attendance")) == 40
+
+    day = db.rows("attendance_class_daily")
+    assert [(r["present"], r["absent"]) for r in day] == [(39, 1)]
+
+    register["attendance_records"][2]["status"] = "sleeping"
+    response = client.post("/api/v1/attendance/bulk", params={"mode": "upsert"}, json=register, headers=headers)
+    assert response.status_code == 400
+
+
+def test_bulk_attendance_upsert_updates_the_loaded_index(client, db, auth_headers):
+    school_class = db.seed("classes", [{"class_name": "Grade 8", "section": "B"}])[0]
+    students = db.seed("students", [
+        {"name": name, "class_id": school_class["class_id"]} for name in ["Lia", "Max", "Noor"]
+    ])
+    headers = auth_headers("t1", "teacher")
+    register = {
+        "class_id": school_class["class_id"],
+        "date": "2026-09-01",
+        "attendance_records": [{"student_id": s["student_id"], "status": "present"} for s in students]
+    }
+    assert client.post("/api/v1/attendance/bulk", params={"mode": "upsert"}, json=register, headers=headers).status_code == 201
+    builds = attendance_index.builds
+    body = client.get("/api/v1/attendance/snapshot", params={"date": "2026-09-01"}, headers=headers).json()
+    assert body["summary"]["present"] == 3
+
+    # Re-marking a student replaces the status in the loaded index
+    register["attendance_records"][0]["status"] = "absent"
+    assert client.post("/api/v1/attendance/bulk", params={"mode": "upsert"}, json=register, headers=headers).status_code == 201
+    body = client.get("/api/v1/attendance/snapshot", params={"date": "2026-09-01"}, headers=headers).json()
+    assert body["summary"] == {"present": 2, "absent": 1, "late": 0, "excused": 0, "not_marked": 0}
+    body = client.get("/api/v1/attendance/absentees", params={"dates": "2026-09-01"}, headers=headers).json()
+    assert [s["name"] for s in body["students"]] == ["Lia"]
+
+    register["attendance_records"][0]["status"] = "present"
+    assert client.post("/api/v1/attendance/bulk", params={"mode": "upsert"}, json=register, headers=headers).status_code == 201
+    body = client.get("/api/v1/attendance/snapshot", params={"date": "2026-09-01"}, headers=headers).json()
+    assert body["summary"]["present"] == 3
+    assert client.get("/api/v1/attendance/absentees", params={"dates": "2026-09-01"}, headers=headers).json()["students"] == []
+    assert attendance_index.builds == builds + 1
@@ -0,0 +1,163 @@
+"""
+tests/test_auth.py
+Authentication endpoints
+"""
+import asyncio
+import pytest
+from fastapi import HTTPException
+from datetime import timedelta
+from app.core.config import settings
+from app.core.rate_limit import RateLimitBackend, TokenBucketLimiter, login_throttle
+from app.core.security import PasswordHasher, verify_password, verify_token, create_access_token, token_cache, password_hasher
+
+USER = {"email": "teacher@example.com", "password": "s3cret-pass", "role": "teacher"}
+
+
+def test_register_and_login(client):
+    response = client.post("/api/v1/auth/register", json=USER)
+    assert response.status_code == 201
+    assert response.json()["email"] == USER["email"]
+
+    response = client.post("/api/v1/auth/login", json={"email": USER["email"], "password": USER["password"]})
+    assert response.status_code == 200
+    token = response.json()["access_token"]
+
+    response = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["role"] == "teacher"
+
+
+def test_register_duplicate_email(client):
+    assert client.post("/api/v1/auth/register", json=USER).status_code == 201
+    response = client.post("/api/v1/auth/register", json=USER)
+    assert response.status_code == 400
+
+
+def test_login_wrong_password(client):
+    client.post("/api/v1/auth/register", json=USER)
+    response = client.post("/api/v1/auth/login", json={"email": USER["email"], "password": "wrong-password"})
+    assert response.status_code == 401
+
+
+def test_login_inactive_account(client, db):
+    client.post("/api/v1/auth/register", json={**USER, "is_active": False})
+    response = client.post("/api/v1/auth/login", json={"email": USER["email"], "password": USER["password"]})
+    assert response.status_code == 403
+
+
+def test_me_requires_token(client):
+    assert client.get("/api/v1/auth/me").status_code == 403
+
+
+def test_password_hasher_rejects_when_queue_is_full():
+    hasher = PasswordHasher(max_workers=1, max_queue=0)
+
+    async def burst():
+        return await asyncio.gather(hasher.hash("first-pass"), hasher.hash("second-pass"), return_exceptions=True)
+
+    try:
+        hashed, rejected = asyncio.run(burst())
+    finally:
+        hasher.shutdown()
+
+    assert verify_password("first-pass", hashed)
+    assert isinstance(rejected, HTTPException) and rejected.status_code == 503
+    assert rejected.headers["Retry-After"]
+    assert hasher.stats()["rejected"] == 1
+
+
+def test_hash_many_submits_small_jobs_a_few_at_a_time(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_BATCH_JOB_SIZE", 2)
+    hasher = PasswordHasher(max_workers=2, max_queue=0)
+    jobs, in_flight, peak = [], 0, 0
+
+    async def fake_run(fn, chunk):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        jobs.append(len(chunk))
+        await asyncio.sleep(0)
+        in_flight -= 1
+        return [f"hashed-{p}" for p in chunk]
+
+    monkeypatch.setattr(hasher, "_run", fake_run)
+    passwords = [f"pass-{i}" for i in range(7)]
+
+    # Never more jobs than processes, so a login waits behind one short job
+    assert asyncio.run(hasher.hash_many(passwords)) == [f"hashed-{p}" for p in passwords]
+    assert jobs == [2, 2, 2, 1]
+    assert peak == 2
+
+
+def test_verified_tokens_are_cached_until_expiry():
+    token = create_access_token({"sub": "user-1", "role": "teacher"})
+    hits = token_cache.hits
+
+    first, second = verify_token(token), verify_token(token)
+    assert second is first
+    assert token_cache.hits == hits + 1
+
+    with pytest.raises(HTTPException) as exc:
+        verify_token(token[:-2] + ("AA" if not token.endswith("AA") else "BB"))
+    assert exc.value.status_code == 401
+
+    expired = create_access_token({"sub": "user-1", "role": "teacher"}, timedelta(seconds=-1))
+    with pytest.raises(HTTPException):
+        verify_token(expired)
+
+
+def test_login_throttled_per_account_before_hashing(client):
+    client.post("/api/v1/auth/register", json=USER)
+    wrong = {"email": USER["email"], "password": "wrong-password"}
+    for _ in range(settings.LOGIN_ACCOUNT_BURST):
+        assert client.post("/api/v1/auth/login", json=wrong).status_code == 401
+    completed = password_hasher.stats()["completed"]
+
+    response = client.post("/api/v1/auth/login", json=wrong)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert password_hasher.stats()["completed"] == completed
+    assert login_throttle.stats()["shed"]["login"]["account"] == 1
+
+
+def test_login_rejected_when_verification_slots_are_taken(client, monkeypatch):
+    client.post("/api/v1/auth/register", json=USER)
+    monkeypatch.setattr(login_throttle.verifications, "limit", 1)
+    assert login_throttle.verifications.try_acquire()
+    try:
+        response = client.post("/api/v1/auth/login", json={"email": USER["email"], "password": USER["password"]})
+    finally:
+        login_throttle.verifications.release()
+
+    assert response.status_code == 429
+    assert login_throttle.stats()["shed"]["login"]["concurrency"] == 1
+
+
+def test_rate_limit_backend_must_implement_every_method():
+    class AcquireOnly(RateLimitBackend):
+        def acquire(self, key):
+            return 0.0
+
+    with pytest.raises(TypeError):
+        AcquireOnly()
+
+
+def test_token_bucket_refills_over_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.rate_limit.time.monotonic", lambda: now[0])
+    bucket = TokenBucketLimiter(rate_per_minute=60, burst=2)
+
+    assert bucket.acquire("k") == 0 and bucket.acquire("k") == 0
+    assert bucket.acquire("k") == pytest.approx(1.0)
+    now[0] += 1.0
+    assert bucket.acquire("k") == 0
+
+
+def test_health_stats_requires_admin(client, auth_headers, admin_headers):
+    assert client.get("/health").status_code == 200
+    assert client.get("/health/stats").status_code in (401, 403)
+    assert client.get("/health/stats", headers=auth_headers("t1", "teacher")).status_code == 403
+    response = client.get("/health/stats", headers=admin_headers)
+    assert response.status_code == 200
+    assert "routes" in response.json()
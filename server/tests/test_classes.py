@@ -0,0 +1,48 @@
+"""
+tests/test_classes.py
+Class gradebook
+"""
+
+
+def test_gradebook_matrix_and_aggregates(client, db, auth_headers):
+    school_class = db.seed("classes", [{"class_name": "Grade 8", "section": "A", "academic_year": "2026-27"}])[0]
+    class_id = school_class["class_id"]
+    maths = db.seed("subjects", [{"subject_name": "Mathematics", "class_id": class_id}])[0]
+    students = db.seed("students", [{"name": name, "class_id": class_id} for name in ["Bo", "Asha", "Chen"]])
+    bo, asha, chen = students
+    exams = db.seed("exams", [
+        {"class_id": class_id, "subject_id": maths["subject_id"], "exam_name": "Unit 2", "date": "2026-10-01", "max_marks": 50},
+        {"class_id": class_id, "subject_id": maths["subject_id"], "exam_name": "Unit 1", "date": "2026-09-01", "max_marks": 20},
+    ])
+    other_class_exam = db.seed("exams", [{"class_id": "other", "exam_name": "Other", "date": "2026-09-01", "max_marks": 10}])[0]
+    db.seed("marks", [
+        {"exam_id": exams[0]["exam_id"], "student_id": asha["student_id"], "marks_scored": 40},
+        {"exam_id": exams[0]["exam_id"], "student_id": bo["student_id"], "marks_scored": 25},
+        {"exam_id": exams[1]["exam_id"], "student_id": asha["student_id"], "marks_scored": 20},
+        {"exam_id": exams[1]["exam_id"], "student_id": "left-the-class", "marks_scored": 5},
+        {"exam_id": other_class_exam["exam_id"], "student_id": chen["student_id"], "marks_scored": 9},
+    ])
+    headers = auth_headers("t1", "teacher")
+
+    response = client.get(f"/api/v1/classes/{class_id}/gradebook", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.headers["X-DB-Queries"] == "3"
+    body = response.json()
+    assert body["students"]["names"] == ["Asha", "Bo", "Chen"]
+    assert body["exams"]["names"] == ["Unit 1", "Unit 2"]
+    assert body["exams"]["subjects"] == ["Mathematics", "Mathematics"]
+    assert body["exams"]["max_marks"] == [20, 50]
+    assert body["scores"] == [[20, 40], [None, 25], [None, None]]
+    assert "aggregates" not in body
+
+    body = client.get(f"/api/v1/classes/{class_id}/gradebook", params={"aggregates": True}, headers=headers).json()
+    aggregates = body["aggregates"]
+    assert aggregates["students"] == {
+        "exams_taken": [2, 1, 0],
+        "total_scored": [60.0, 25.0, None],
+        "average_percentage": [90.0, 50.0, None]
+    }
+    assert aggregates["exams"] == {"count": [1, 2], "mean": [20.0, 32.5], "min": [20.0, 25.0], "max": [20.0, 40.0]}
+
+    assert client.get("/api/v1/classes/missing/gradebook", headers=headers).status_code == 404
+    assert client.get(f"/api/v1/classes/{class_id}/gradebook", headers=auth_headers("s1", "student")).status_code == 403
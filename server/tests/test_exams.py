@@ -0,0 +1,44 @@
+"""
+tests/test_exams.py
+Exam result analytics
+"""
+
+
+def test_exam_analytics_statistics_ranks_and_cache(client, db, auth_headers):
+    exam = db.seed("exams", [{"exam_name": "Midterm", "max_marks": 100}])[0]
+    exam_id = exam["exam_id"]
+    students = db.seed("students", [{"name": name} for name in ["Asha", "Bo", "Chen", "Dev", "Eli"]])
+    marks = db.seed("marks", [
+        {"exam_id": exam_id, "student_id": s["student_id"], "marks_scored": score}
+        for s, score in zip(students, [90, 75, 75, 30, 60])
+    ])
+    headers = auth_headers("t1", "teacher")
+
+    response = client.get(f"/api/v1/exams/{exam_id}/analytics", headers=headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    stats = body["statistics"]
+    assert body["count"] == 5
+    assert (stats["mean"], stats["median"], stats["min"], stats["max"]) == (66.0, 75.0, 30.0, 90.0)
+    assert (stats["pass_count"], stats["pass_rate"]) == (4, 80.0)
+    assert stats["percentiles"]["p50"] == 75.0
+    assert sum(b["count"] for b in body["histogram"]) == 5
+    assert [(r["student_name"], r["rank"]) for r in body["ranks"]] == [
+        ("Asha", 1), ("Bo", 2), ("Chen", 2), ("Eli", 4), ("Dev", 5)
+    ]
+    assert body["ranks"][-1]["passed"] is False
+
+    # Second request is served from the cache
+    response = client.get(f"/api/v1/exams/{exam_id}/analytics", headers=headers)
+    assert response.headers["X-DB-Queries"] == "0"
+    assert response.json() == body
+
+    # Updating a mark invalidates the exam's analytics
+    assert client.put(
+        f"/api/v1/marks/{marks[3]['mark_id']}", json={"marks_scored": 95}, headers=headers
+    ).status_code == 200
+    body = client.get(f"/api/v1/exams/{exam_id}/analytics", headers=headers).json()
+    assert [(r["student_name"], r["rank"]) for r in body["ranks"][:2]] == [("Dev", 1), ("Asha", 2)]
+    assert body["statistics"]["pass_count"] == 5
+
+    assert client.get("/api/v1/exams/missing/analytics", headers=headers).status_code == 404
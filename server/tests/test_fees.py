@@ -0,0 +1,52 @@
+"""
+tests/test_fees.py
+Fee payment ledger
+"""
+import asyncio
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+
+
+def test_concurrent_and_retried_payments(client, db, auth_headers):
+    student = db.seed("students", [{"name": "Asha"}])[0]
+    fee = db.seed("fees", [{
+        "student_id": student["student_id"], "amount": 1000, "amount_paid": 0, "fee_type": "tuition",
+        "due_date": "2026-11-01", "status": "pending", "academic_year": "2026-27"
+    }])[0]
+    headers = auth_headers("cashier", "admin")
+
+    async def pay(counter: int):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as session:
+            return await session.post("/api/v1/fees/payment", json={
+                "fee_id": fee["fee_id"], "amount_paid": 100, "payment_method": "cash"
+            }, headers={**headers, "Idempotency-Key": f"counter-{counter}"})
+
+    async def pay_all():
+        return await asyncio.gather(*(pay(i) for i in range(8)))
+
+    assert all(r.status_code == 200 for r in asyncio.run(pay_all()))
+    body = client.get(f"/api/v1/fees/{fee['fee_id']}", headers=headers).json()
+    assert (body["amount_paid"], body["balance"], body["status"]) == (800, 200, "partial")
+
+    # A retry is applied once
+    payment = {"fee_id": fee["fee_id"], "amount_paid": 200, "payment_method": "card", "transaction_id": "TXN-1"}
+    first = client.post("/api/v1/fees/payment", json=payment, headers=headers)
+    retry = client.post("/api/v1/fees/payment", json=payment, headers={**headers, "Origin": settings.ALLOWED_ORIGINS[0]})
+    assert first.status_code == retry.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers and retry.headers["Idempotent-Replayed"] == "true"
+    # Readable by browser clients
+    assert "Idempotent-Replayed" in retry.headers["Access-Control-Expose-Headers"]
+    assert (retry.json()["amount_paid"], retry.json()["status"]) == (1000, "paid")
+
+    # Same transaction ID for another amount, and a payment beyond the balance
+    assert client.post("/api/v1/fees/payment", json={**payment, "amount_paid": 50}, headers=headers).status_code == 409
+    assert client.post("/api/v1/fees/payment", json={**payment, "transaction_id": "TXN-2"}, headers=headers).status_code == 400
+    assert client.post("/api/v1/fees/payment", json={**payment, "fee_id": "missing"}, headers=headers).status_code == 404
+
+    ledger = client.get(f"/api/v1/fees/{fee['fee_id']}/payments", headers=headers).json()
+    assert len(ledger) == 9 and sum(p["amount"] for p in ledger) == 1000
+    assert ledger[-1]["transaction_id"] == "TXN-1"
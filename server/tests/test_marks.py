@@ -0,0 +1,41 @@
+"""
+tests/test_marks.py
+Bulk marks upsert
+"""
+
+
+def test_bulk_upsert_many_exams(client, db, auth_headers, max_rows):
+    # More existing marks than a single response may hold: all are matched
+    exams = db.seed("exams", [{"exam_name": name, "max_marks": 50} for name in ["Maths", "Science"]])
+    students = db.seed("students", [{"name": name} for name in ["Asha", "Bo"]])
+    headers = auth_headers("t1", "teacher")
+    sheet = [
+        {"exam_id": e["exam_id"], "student_id": s["student_id"], "marks_scored": 40}
+        for e in exams for s in students
+    ]
+
+    response = client.post("/api/v1/marks/bulk-upsert", json=sheet, headers=headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    first_id = body["results"][0]["mark_id"]
+    assert (body["created_count"], body["error_count"]) == (4, 0)
+    assert response.headers["X-DB-Queries"] == "4"  # exams, students, existing marks, upsert
+    assert all(r["mark_id"] for r in body["results"])
+    assert len(db.rows("marks")) == 4
+
+    # Re-upload with one change, a duplicate pair and bad rows
+    sheet[0]["marks_scored"] = 45
+    sheet += [
+        {"exam_id": exams[1]["exam_id"], "student_id": students[1]["student_id"], "marks_scored": 30},
+        {"exam_id": exams[0]["exam_id"], "student_id": students[0]["student_id"], "marks_scored": 60},
+        {"exam_id": "missing", "student_id": students[0]["student_id"], "marks_scored": 10},
+    ]
+    body = client.post("/api/v1/marks/bulk-upsert", json=sheet, headers=headers).json()
+    assert [r["status"] for r in body["results"]] == [
+        "updated", "unchanged", "unchanged", "superseded", "updated", "error", "error"
+    ]
+    assert body["results"][0]["mark_id"] == first_id
+    marks = {(m["exam_id"], m["student_id"]): m["marks_scored"] for m in db.rows("marks")}
+    assert len(marks) == 4 and len(db.rows("marks")) == 4
+    assert marks[(exams[0]["exam_id"], students[0]["student_id"])] == 45
+    assert marks[(exams[1]["exam_id"], students[1]["student_id"])] == 30
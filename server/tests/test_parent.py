@@ -0,0 +1,131 @@
+"""
+tests/test_parent.py
+Parent-facing access: the cached Principal and its invalidation
+"""
+from jose import jwt
+from app.core.config import settings
+from app.core.dependencies import principal_cache
+from app.core.security import pwd_context
+
+
+def _family(db):
+    school_class = db.seed("classes", [{"class_name": "Grade 5", "section": "A"}])[0]
+    students = db.seed("students", [
+        {"name": name, "email": f"{name.lower()}@example.com", "class_id": school_class["class_id"]}
+        for name in ["Asha", "Bo"]
+    ])
+    user = db.seed("users", [{
+        "email": "parent@example.com", "password_hash": pwd_context.hash("parent-pass"),
+        "role": "parent", "is_active": True
+    }])[0]
+    parent = db.seed("parents", [{"name": "Mira", "email": "parent@example.com", "user_id": user["user_id"]}])[0]
+    db.seed("parent_student", [{"parent_id": parent["parent_id"], "student_id": students[0]["student_id"]}])
+    db.seed("leave_requests", [
+        {"student_id": s["student_id"], "start_date": "2026-10-01", "end_date": "2026-10-02", "reason": "Trip", "status": "pending"}
+        for s in students
+    ])
+    return user, parent, students
+
+
+def test_parent_sees_only_linked_children(client, db, auth_headers):
+    user, _, students = _family(db)
+    headers = auth_headers(user["user_id"], "parent")
+
+    response = client.get("/api/v1/leave-requests/", headers=headers)
+
+    assert response.status_code == 200
+    assert [r["student_name"] for r in response.json()] == ["Asha"]
+    forbidden = client.get("/api/v1/leave-requests/", params={"student_id": students[1]["student_id"]}, headers=headers)
+    assert forbidden.status_code == 403
+
+
+def test_principal_is_cached_across_requests(client, db, auth_headers):
+    user, _, _ = _family(db)
+    headers = auth_headers(user["user_id"], "parent")
+
+    before = principal_cache.stats()
+    client.get("/api/v1/leave-requests/", headers=headers)
+    client.get("/api/v1/leave-requests/", headers=headers)
+
+    after = principal_cache.stats()
+    assert (after["misses"] - before["misses"], after["hits"] - before["hits"]) == (1, 1)
+
+
+def test_link_and_unlink_invalidate_principal(client, db, auth_headers, admin_headers):
+    user, parent, students = _family(db)
+    headers = auth_headers(user["user_id"], "parent")
+    assert len(client.get("/api/v1/leave-requests/", headers=headers).json()) == 1
+
+    linked = client.post(
+        f"/api/v1/parents/{parent['parent_id']}/link-student/{students[1]['student_id']}",
+        headers=admin_headers
+    )
+    assert linked.status_code == 200
+    assert len(client.get("/api/v1/leave-requests/", headers=headers).json()) == 2
+
+    unlinked = client.delete(
+        f"/api/v1/parents/{parent['parent_id']}/unlink-student/{students[0]['student_id']}",
+        headers=admin_headers
+    )
+    assert unlinked.status_code == 200
+    assert [r["student_name"] for r in client.get("/api/v1/leave-requests/", headers=headers).json()] == ["Bo"]
+
+
+def test_class_change_invalidates_student_principal(client, db, auth_headers, admin_headers):
+    classes = db.seed("classes", [{"class_name": "Grade 5", "section": s} for s in "AB"])
+    user = db.seed("users", [{"email": "asha@example.com", "role": "student", "is_active": True}])[0]
+    student = db.seed("students", [{
+        "name": "Asha", "dob": "2012-03-04", "email": "asha@example.com",
+        "user_id": user["user_id"], "class_id": classes[0]["class_id"]
+    }])[0]
+    homework = db.seed("homework", [
+        {"class_id": c["class_id"], "teacher_id": "t1", "subject_id": "s1", "description": "Essay", "due_date": "2026-11-01"}
+        for c in classes
+    ])
+    headers = auth_headers(user["user_id"], "student")
+    assert client.get(f"/api/v1/homework/{homework[0]['hw_id']}", headers=headers).status_code == 200
+
+    response = client.put(
+        f"/api/v1/students/{student['student_id']}",
+        json={"class_id": classes[1]["class_id"]},
+        headers=admin_headers
+    )
+    assert response.status_code == 200
+
+    assert client.get(f"/api/v1/homework/{homework[0]['hw_id']}", headers=headers).status_code == 403
+    assert client.get(f"/api/v1/homework/{homework[1]['hw_id']}", headers=headers).status_code == 200
+
+
+def test_login_token_carries_scope_claims(client, db):
+    _, parent, students = _family(db)
+
+    tokens = client.post("/api/v1/auth/login", json={"email": "parent@example.com", "password": "parent-pass"}).json()
+    claims = jwt.decode(tokens["access_token"], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+    assert claims["parent_id"] == parent["parent_id"]
+    assert claims["child_ids"] == [students[0]["student_id"]]
+    assert claims["sv"] == 0
+
+    principal_cache.clear()
+    before = principal_cache.stats()
+    response = client.get("/api/v1/leave-requests/", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert [r["student_name"] for r in response.json()] == ["Asha"]
+    assert principal_cache.stats()["misses"] == before["misses"]  # authorized from the claims
+
+
+def test_link_change_forces_token_refresh(client, db, admin_headers):
+    _, parent, students = _family(db)
+    tokens = client.post("/api/v1/auth/login", json={"email": "parent@example.com", "password": "parent-pass"}).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/api/v1/leave-requests/", headers=headers).status_code == 200
+
+    client.post(f"/api/v1/parents/{parent['parent_id']}/link-student/{students[1]['student_id']}", headers=admin_headers)
+
+    stale = client.get("/api/v1/leave-requests/", headers=headers)
+    assert stale.status_code == 401
+    assert "refresh" in stale.json()["detail"]
+
+    refreshed = client.post("/api/v1/auth/refresh", params={"refresh_token": tokens["refresh_token"]})
+    assert refreshed.status_code == 200
+    headers = {"Authorization": f"Bearer {refreshed.json()['access_token']}"}
+    assert len(client.get("/api/v1/leave-requests/", headers=headers).json()) == 2
@@ -0,0 +1,79 @@
+"""
+tests/test_reports.py
+Report card PDFs and ZIP bundles
+"""
+import asyncio
+import io
+import zipfile
+
+from app.services.report_service import load_report_cards
+from app.db.supabase import SupabaseQueries, get_supabase_client
+
+
+def _seed_class(db):
+    school_class = db.seed("classes", [{"class_name": "Grade 7", "section": "B", "academic_year": "2026-27"}])[0]
+    class_id = school_class["class_id"]
+    students = db.seed("students", [
+        {"name": name, "dob": "2014-03-01", "class_id": class_id} for name in ["Asha", "Bo", "Chen"]
+    ])
+    maths, science = db.seed("subjects", [
+        {"subject_name": name, "class_id": class_id} for name in ["Mathematics", "Science"]
+    ])
+    exams = db.seed("exams", [
+        {"class_id": class_id, "subject_id": maths["subject_id"], "exam_name": "Midterm", "date": "2026-09-10", "max_marks": 50},
+        {"class_id": class_id, "subject_id": science["subject_id"], "exam_name": "Midterm", "date": "2026-09-12", "max_marks": 100},
+        # Previous academic year, not on the card
+        {"class_id": class_id, "subject_id": maths["subject_id"], "exam_name": "Finals", "date": "2026-04-01", "max_marks": 50},
+    ])
+    db.seed("marks", [
+        {"exam_id": exams[0]["exam_id"], "student_id": students[0]["student_id"], "marks_scored": 45},
+        {"exam_id": exams[1]["exam_id"], "student_id": students[0]["student_id"], "marks_scored": 62},
+        {"exam_id": exams[2]["exam_id"], "student_id": students[0]["student_id"], "marks_scored": 10},
+        {"exam_id": exams[0]["exam_id"], "student_id": students[1]["student_id"], "marks_scored": 20},
+    ])
+    db.seed("attendance_student_yearly", [{
+        "student_id": students[0]["student_id"], "academic_year": "2026-27",
+        "present": 18, "absent": 1, "late": 1, "excused": 0
+    }])
+    return class_id, students
+
+
+def test_report_cards_data_pdf_and_zip(client, db, auth_headers, max_rows):
+    # More students and marks than a single response may hold: none are dropped
+    class_id, students = _seed_class(db)
+    asha = students[0]
+
+    cards = asyncio.run(load_report_cards(SupabaseQueries(get_supabase_client()), class_ids=[class_id], year="2026-27"))
+    assert [c["name"] for c in cards] == ["Asha", "Bo", "Chen"]
+    card = cards[0]
+    assert [(s["subject"], [e["grade"] for e in s["exams"]]) for s in card["subjects"]] == [
+        ("Mathematics", ["A+"]), ("Science", ["B"])
+    ]
+    assert (card["total_scored"], card["total_max"], card["overall_percentage"], card["overall_grade"]) == (107, 150, 71.33, "B+")
+    assert (card["attendance"]["total"], card["attendance"]["percentage"]) == (20, 90.0)
+    assert cards[2]["overall_grade"] == "-" and cards[2]["attendance"]["percentage"] is None
+
+    headers = auth_headers("t1", "teacher")
+    response = client.get(
+        f"/api/v1/reports/classes/{class_id}/report-cards", params={"academic_year": "2026-27"}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    names = archive.namelist()
+    assert len(names) == 3 and all(n.startswith("Grade_7_B/") for n in names)
+    assert all(archive.read(n).startswith(b"%PDF") for n in names)
+
+    response = client.get(f"/api/v1/reports/students/{asha['student_id']}/report-card", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.content.startswith(b"%PDF")
+
+    # Students only get their own
+    user = db.seed("users", [{"email": "dev@example.com", "role": "student"}])[0]
+    dev = db.seed("students", [{"name": "Dev", "dob": "2014-05-01", "class_id": class_id, "user_id": user["user_id"]}])[0]
+    student_headers = auth_headers(user["user_id"], "student")
+    assert client.get(f"/api/v1/reports/students/{asha['student_id']}/report-card", headers=student_headers).status_code == 403
+    assert client.get(f"/api/v1/reports/students/{dev['student_id']}/report-card", headers=student_headers).status_code == 200
+
+    assert client.get("/api/v1/reports/classes/missing/report-cards", headers=headers).status_code == 404
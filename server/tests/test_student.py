@@ -0,0 +1,190 @@
+"""
+tests/test_student.py
+Student endpoints, and the local backend's PostgREST semantics they rely on
+"""
+import asyncio
+from datetime import datetime
+from app.db.supabase import SupabaseQueries, get_supabase_client, run_query
+
+
+def _student(name, class_id=None):
+    return {"name": name, "dob": "2012-03-04", "email": f"{name.lower()}@example.com", "class_id": class_id}
+
+
+def test_create_student(client, db, admin_headers):
+    school_class = db.seed("classes", [{"class_name": "Grade 5", "section": "A"}])[0]
+
+    response = client.post("/api/v1/students/", json=_student("Asha", school_class["class_id"]), headers=admin_headers)
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body["class_name"] == "Grade 5"
+    assert db.select_rows("users", {"email": "asha@example.com"})[0]["role"] == "student"
+
+
+def test_create_student_requires_admin(client, auth_headers):
+    response = client.post("/api/v1/students/", json=_student("Asha"), headers=auth_headers("t1", "teacher"))
+    assert response.status_code == 403
+
+
+def test_list_students_paginates_with_cursor(client, db, admin_headers):
+    school_class = db.seed("classes", [{"class_name": "Grade 5", "section": "A"}])[0]
+    db.seed("students", [_student(name, school_class["class_id"]) for name in ["Dev", "Asha", "Chen", "Bo", "Eli"]])
+
+    response = client.get("/api/v1/students/", params={"page_size": 2}, headers=admin_headers)
+    assert response.status_code == 200
+    assert [s["name"] for s in response.json()] == ["Asha", "Bo"]
+    assert response.json()[0]["class_name"] == "Grade 5 - A"
+    assert response.headers["X-Total-Count"] == "5"
+
+    names = []
+    cursor = response.headers.get("X-Next-Cursor")
+    while cursor:
+        response = client.get("/api/v1/students/", params={"page_size": 2, "cursor": cursor}, headers=admin_headers)
+        names += [s["name"] for s in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+    assert names == ["Chen", "Dev", "Eli"]
+
+
+def test_update_and_delete_student(client, db, admin_headers):
+    student = db.seed("students", [_student("Asha")])[0]
+    url = f"/api/v1/students/{student['student_id']}"
+
+    response = client.put(url, json={"phone": "555-0100"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["phone"] == "555-0100"
+
+    assert client.delete(url, headers=admin_headers).status_code == 204
+    assert client.get(url, headers=admin_headers).status_code == 404
+
+
+def test_import_students_csv_reports_row_errors(client, db, admin_headers):
+    db.seed("classes", [{"class_name": "Grade 5", "section": "A"}, {"class_name": "Grade 5", "section": "B"}])
+    db.seed("users", [{"email": "taken@example.com", "role": "student", "is_active": True}])
+    csv_data = "\n".join([
+        "Name,Date of Birth,Email,Class,Section",
+        "Asha,2012-03-04,asha@example.com,Grade 5,A",
+        "Bo,2012-05-06,Bo@Example.com,Grade 5,B",
+        "Chen,2012-07-08,asha@example.com,Grade 5,A",
+        "Dev,not-a-date,dev@example.com,Grade 5,A",
+        "Eli,2012-09-10,Taken@Example.com,Grade 5,A",  # existing user, other case
+        "Fay,2012-11-12,fay@example.com,Grade 5,",
+    ])
+
+    response = client.post(
+        "/api/v1/students/import",
+        files={"file": ("intake.csv", csv_data.encode(), "text/csv")},
+        params={"batch_size": 4},
+        headers=admin_headers
+    )
+
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["total_rows"], report["created_count"], report["error_count"]) == (6, 2, 4)
+    assert {e["row"]: e["errors"][0].split(":")[0] for e in report["errors"]} == {
+        4: "email", 5: "dob", 6: "email", 7: "class_name"
+    }
+    students = {s["name"]: s for s in db.rows("students")}
+    assert set(students) == {"Asha", "Bo"}
+    user = db.select_rows("users", {"user_id": students["Asha"]["user_id"]})[0]
+    assert user["email"] == "asha@example.com" and user["password_hash"].startswith("$2")
+    # Stored as written (EmailStr lowercases the domain only), like POST /students,
+    # so the login matches the spelling from the file
+    assert db.select_rows("users", {"user_id": students["Bo"]["user_id"]})[0]["email"] == "Bo@example.com"
+    response = client.post("/api/v1/auth/login", json={"email": "Bo@Example.com", "password": "2012-05-06"})
+    assert response.status_code == 200, response.text
+
+
+def test_import_students_xlsx(client, db, admin_headers):
+    from openpyxl import Workbook
+    import io
+
+    school_class = db.seed("classes", [{"class_name": "Grade 6", "section": "A"}])[0]
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["name", "dob", "email", "phone", "class_id"])
+    sheet.append(["Gia", datetime(2011, 1, 2), "gia@example.com", 9876543210, school_class["class_id"]])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+
+    response = client.post(
+        "/api/v1/students/import",
+        files={"file": ("intake.xlsx", buffer.getvalue(), "application/octet-stream")},
+        headers=admin_headers
+    )
+
+    assert response.json()["created_count"] == 1
+    student = db.rows("students")[0]
+    assert (student["dob"], student["phone"], student["class_id"]) == ("2011-01-02", "9876543210", school_class["class_id"])
+
+
+def test_local_backend_query_semantics(db):
+    school_class = db.seed("classes", [{"class_name": "Grade 5", "section": "A"}])[0]
+    db.seed("students", [
+        _student("Asha", school_class["class_id"]),
+        _student("Bo", school_class["class_id"]),
+        _student("Chen"),
+    ])
+    supabase = get_supabase_client()
+    queries = SupabaseQueries(supabase)
+
+    async def scenario():
+        embedded = await run_query(
+            supabase.table("students").select("name, classes(class_name)").order("name", desc=True)
+        )
+        filtered = await run_query(
+            supabase.table("students").select("name").in_("name", ["Bo", "Chen", "Dev"]).not_.is_("class_id", "null")
+        )
+        counted = await run_query(supabase.table("students").select("name", count="exact").limit(1))
+        return embedded, filtered, counted, await queries.count("students", {"class_id": school_class["class_id"]})
+
+    embedded, filtered, counted, count = asyncio.run(scenario())
+
+    assert embedded.data[0] == {"name": "Chen", "classes": None}
+    assert embedded.data[1] == {"name": "Bo", "classes": {"class_name": "Grade 5"}}
+    assert [r["name"] for r in filtered.data] == ["Bo"]
+    assert (len(counted.data), counted.count) == (1, 3)
+    assert count == 2
+
+
+def test_select_in_chunks_preserve_order_and_window(db):
+    students = db.seed("students", [_student(name) for name in ["Eli", "Asha", "Dev", "Bo", "Chen", "Fay"]])
+    queries = SupabaseQueries(get_supabase_client())
+    ids = [s["student_id"] for s in students]
+
+    rows = asyncio.run(queries.select_in(
+        "students", "student_id", ids + ids[:2],
+        columns="name", order_by="name", limit=3, offset=1, chunk_size=2
+    ))
+    assert [r["name"] for r in rows] == ["Bo", "Chen", "Dev"]
+
+    rows = asyncio.run(queries.select_in(
+        "students", "student_id", ids,
+        columns="name", order_by="name", ascending=False, chunk_size=4,
+        refine=lambda q: q.neq("name", "Fay")
+    ))
+    assert [r["name"] for r in rows] == ["Eli", "Dev", "Chen", "Bo", "Asha"]
+
+
+def test_aggregate_groups_in_database(db):
+    students = db.seed("students", [_student("Asha"), _student("Bo")])
+    db.seed("fees", [
+        {"student_id": students[0]["student_id"], "status": "paid", "amount": 100, "amount_paid": 100},
+        {"student_id": students[0]["student_id"], "status": "pending", "amount": 80, "amount_paid": None},
+        {"student_id": students[1]["student_id"], "status": "paid", "amount": 50, "amount_paid": 50},
+    ])
+    queries = SupabaseQueries(get_supabase_client())
+
+    groups = asyncio.run(queries.aggregate(
+        "fees", group_by=["status"],
+        metrics={"count": "count", "expected": "sum:amount", "collected": "sum:amount_paid"}
+    ))
+    assert sorted(groups, key=lambda g: g["status"]) == [
+        {"status": "paid", "count": 2, "expected": 150, "collected": 150},
+        {"status": "pending", "count": 1, "expected": 80, "collected": None},
+    ]
+
+    totals = asyncio.run(queries.aggregate(
+        "fees", filters={"student_id": [students[1]["student_id"]]}, conditions=[("amount", "gte", 60)]
+    ))
+    assert totals == [{"count": 0}]